@@ -0,0 +1,142 @@
+"""Caché de respuestas (listado y detalle) de catálogos que casi no cambian.
+
+Cada modelo tiene una versión en la caché de Django (Redis,
+``cache-version:<app.modelo>``) con la hora en milisegundos de su último
+cambio; ``post_save``/``post_delete`` la actualizan al confirmarse la
+transacción. Cada app llama a ``watch`` en su ``AppConfig.ready`` para que
+las señales estén conectadas en todos los procesos, no solo en el servidor.
+La respuesta se guarda por URL y formato junto con su ``ETag``, que se
+calcula a partir de las versiones de los modelos de los que depende
+(``If-None-Match`` tiene prioridad sobre ``If-Modified-Since``, que solo
+tiene resolución de segundos).
+
+Una petición repetida hace un solo ``MGET`` (versiones + respuesta guardada):
+si el cliente manda ``If-None-Match``/``If-Modified-Since`` vigentes recibe un
+304, y si no, el cuerpo guardado. Los ``QuerySet.update()`` y ``bulk_create``
+no envían señales; tras usarlos hay que llamar a ``bump_version``.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+VERSION_PREFIX = "cache-version:"
+RESPONSE_PREFIX = "cache-response:"
+RESPONSE_TIMEOUT = 3600
+_watched = set()
+
+
+def version_key(model):
+    return f"{VERSION_PREFIX}{model._meta.label_lower}"
+
+
+def bump_version(model):
+    """Marca ``model`` como cambiado ahora (invalida sus respuestas guardadas)."""
+    key = version_key(model)
+    try:
+        now = time.time_ns() // 1_000_000
+        cache.set(key, max(now, (cache.get(key) or 0) + 1), None)
+    except Exception as e:
+        print(f"Error bumping cache version of {model._meta.label}: {e}")
+
+
+def _on_change(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(sender))
+
+
+def watch(model):
+    """Conecta las señales que actualizan la versión de ``model`` (una vez por modelo)."""
+    if model in _watched:
+        return
+    _watched.add(model)
+    post_save.connect(_on_change, sender=model, dispatch_uid=f"cache-version-save-{model._meta.label_lower}")
+    post_delete.connect(_on_change, sender=model, dispatch_uid=f"cache-version-delete-{model._meta.label_lower}")
+
+
+def _versions(found, models):
+    versions = []
+    for model in models:
+        key = version_key(model)
+        version = found.get(key)
+        if version is None:
+            # Versión perdida (o primer uso): se inicia ahora
+            cache.add(key, time.time_ns() // 1_000_000, None)
+            version = cache.get(key) or 0
+        versions.append(version)
+    return versions
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+    return since is not None and last_modified <= since
+
+
+class CachedReadMixin:
+    """``list`` y ``retrieve`` servidos desde la caché, con ETag y Last-Modified.
+
+    ``cache_models`` son los modelos cuyos cambios invalidan la respuesta (por
+    defecto el del ``queryset``; hay que añadir los de los serializers anidados)
+    y deben estar registrados con ``watch``.
+    Las respuestas no pueden depender del usuario: la clave es solo la URL.
+    """
+    cache_models = ()
+    cache_timeout = RESPONSE_TIMEOUT
+
+    @classmethod
+    def get_cache_models(cls):
+        if cls.cache_models:
+            return cls.cache_models
+        queryset = getattr(cls, "queryset", None)
+        return (queryset.model,) if queryset is not None else ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def cached_response(self, request, view, *args, **kwargs):
+        models = self.get_cache_models()
+        variant = f"{request.get_full_path()}|{request.accepted_media_type}"
+        response_key = RESPONSE_PREFIX + hashlib.sha1(variant.encode()).hexdigest()
+        try:
+            found = cache.get_many([version_key(model) for model in models] + [response_key])
+            versions = _versions(found, models)
+        except Exception as e:
+            print(f"Error reading response cache: {e}")
+            return view(request, *args, **kwargs)
+
+        digest = hashlib.sha1(f"{variant}|{versions}".encode()).hexdigest()
+        etag = quote_etag(digest)
+        last_modified = max(versions) // 1000 if versions else 0
+        headers = {"ETag": etag, "Last-Modified": http_date(last_modified)}
+
+        if _not_modified(request, etag, last_modified):
+            return HttpResponseNotModified(headers=headers)
+        stored = found.get(response_key)
+        if stored is not None and stored[0] == etag:
+            content, content_type = stored[1], stored[2]
+            return HttpResponse(content, content_type=content_type, headers=headers)
+
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        # Se renderiza aquí para guardar los bytes; DRF ya no lo vuelve a hacer
+        response.accepted_renderer = request.accepted_renderer
+        response.accepted_media_type = request.accepted_media_type
+        response.renderer_context = self.get_renderer_context()
+        response.render()
+        for name, value in headers.items():
+            response[name] = value
+        try:
+            cache.set(response_key, (etag, response.content, response["Content-Type"]), self.cache_timeout)
+        except Exception as e:
+            print(f"Error writing response cache: {e}")
+        return response
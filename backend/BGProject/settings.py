@@ -203,3 +203,38 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# Réplicas del subscriber MQTT (ingesta horizontal)
+# MQTT_SHARE_GROUP: si se define, cada réplica se suscribe a
+# $share/<grupo>/Biogestor/# y el broker reparte los mensajes entre ellas.
+# Si no, con INGEST_REPLICAS > 1 cada réplica procesa solo los topics cuyo
+# hash (crc32) cae en su INGEST_REPLICA_INDEX.
+MQTT_SHARE_GROUP = os.getenv('MQTT_SHARE_GROUP', '')
+INGEST_REPLICAS = int(os.getenv('INGEST_REPLICAS', '1'))
+INGEST_REPLICA_INDEX = int(os.getenv('INGEST_REPLICA_INDEX', '0'))
+
+# Buffer de lecturas en Redis: 'list' (historial de 30 por topic) o
+# 'stream' (además XADD a un Redis Stream que el persistidor consume con
+# XREADGROUP/XACK para guardar todas las lecturas).
+SENSOR_BUFFER_MODE = os.getenv('SENSOR_BUFFER_MODE', 'list')
+SENSOR_STREAM_MAXLEN = int(os.getenv('SENSOR_STREAM_MAXLEN', '100000'))
+
+# Frecuencia máxima (Hz) de difusión de lecturas por WebSocket
+WS_BROADCAST_HZ = float(os.getenv('WS_BROADCAST_HZ', '4'))
+
+# Clientes WebSocket lentos: cada conexión guarda como máximo WS_SEND_QUEUE
+# frames pendientes de enviar. Al llenarse, 'coalesce' los descarta y en su
+# lugar envía un snapshot (el estado más reciente); 'drop_oldest' descarta
+# solo el más antiguo. La conexión que se desborda WS_SLOW_MAX_OVERFLOWS veces
+# en WS_SLOW_WINDOW segundos se cierra con el código 4008.
+WS_SEND_QUEUE = int(os.getenv('WS_SEND_QUEUE', '32'))
+WS_SEND_OVERFLOW = os.getenv('WS_SEND_OVERFLOW', 'coalesce')
+WS_SLOW_MAX_OVERFLOWS = int(os.getenv('WS_SLOW_MAX_OVERFLOWS', '5'))
+WS_SLOW_WINDOW = float(os.getenv('WS_SLOW_WINDOW', '60'))
+
+# Meses de lecturas de sensores a conservar (0 = todo). Lo aplica
+# `manage.py manage_data_partitions` borrando particiones mensuales viejas.
+SENSOR_DATA_RETENTION_MONTHS = int(os.getenv('SENSOR_DATA_RETENTION_MONTHS', '0'))
+
+# Libros .xlsx de llenados generados en segundo plano (GET /api/Fill/{id}/export/)
+FILL_EXPORT_DIR = os.getenv('FILL_EXPORT_DIR', os.path.join(MEDIA_ROOT, 'exports'))
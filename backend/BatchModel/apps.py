@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class BatchmodelConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'BatchModel'
+
+    def ready(self):
+        from BGProject.caching import watch
+        from .models import BasicParams
+        watch(BasicParams)
@@ -2,11 +2,12 @@ from django.shortcuts import render
 from rest_framework import viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from BGProject.caching import CachedReadMixin
 from .models import BasicParams
 from .serializers import BasicParamsSerializer, BatchModelSerializer
 from .mathModel import simulation
 
-class BasicParamsViewSet(viewsets.ModelViewSet):
+class BasicParamsViewSet(CachedReadMixin, viewsets.ModelViewSet):
     queryset = BasicParams.objects.all()
     serializer_class = BasicParamsSerializer
 
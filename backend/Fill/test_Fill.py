@@ -44,3 +44,127 @@ class FillModelTest(TestCase):
 		)
 		self.assertEqual(fill.prediction, pred)
 		self.assertEqual(fill.filling_mass, 50.0)
+
+class InlineThread:
+	"""Ejecuta el trabajo de exportación en el hilo del test (misma transacción)."""
+	def __init__(self, target, args=(), **kwargs):
+		self.target, self.args = target, args
+
+	def start(self):
+		self.target(*self.args)
+
+class FakeRedis:
+	"""Lo mínimo de redis-py que usa ``ExportJobs`` (get/set NX/exists/delete)."""
+	def __init__(self):
+		self.data = {}
+
+	def get(self, key):
+		value = self.data.get(key)
+		return value.encode() if isinstance(value, str) else value
+
+	def set(self, key, value, nx=False, ex=None):
+		if nx and key in self.data:
+			return None
+		self.data[key] = value
+		return True
+
+	def exists(self, key):
+		return int(key in self.data)
+
+	def delete(self, key):
+		return int(self.data.pop(key, None) is not None)
+
+class FillWorkbookExportTest(TestCase):
+	def setUp(self):
+		import tempfile
+		from datetime import date, datetime, timedelta, timezone as dt_timezone
+		from unittest.mock import patch
+		from django.test import override_settings
+		from dataSensor.models import Data, MeasuredVariable, Sensor
+		tmp = tempfile.TemporaryDirectory()
+		self.addCleanup(tmp.cleanup)
+		export_settings = override_settings(FILL_EXPORT_DIR=tmp.name)
+		export_settings.enable()
+		self.addCleanup(export_settings.disable)
+		for patcher in (patch('Fill.workbook.threading.Thread', InlineThread),
+						patch('Fill.workbook.redis_client', FakeRedis()),
+						patch('Fill.workbook.connections')):
+			patcher.start()
+			self.addCleanup(patcher.stop)
+		self.export_dir = tmp.name
+		pred = FillPrediction.objects.create(
+			total_solids=10.0, total_volatile_solids=5.0, potencial_production=20.0, max_mu=1.5,
+			solvent_volume=100.0, initial_concentration=2.0, specific_mu=0.8,
+			cumulative_production=[1.0, 2.0, 3.0], derivative_production=[0.1, 0.2, 0.3])
+		self.fill = Fill.objects.create(filling_mass=50.0, approx_density=1.2, added_watter=10.0, type_material=1.0,
+										filling_moisture=0.5, delay_time=2.0, prediction=pred)
+		mv = MeasuredVariable.objects.create(name="Temp")
+		self.sensors = [Sensor.objects.create(name=name, mqtt_code=code, measured_variable=mv,
+											  suscription_date=date.today(), min_range=0.0, max_range=100.0)
+						for name, code in (("Temperatura", "temp"), ("Presión", "pres"))]
+		start = datetime(2024, 3, 1, tzinfo=dt_timezone.utc)
+		for i in range(4):
+			for sensor in self.sensors:
+				Data.objects.create(sensor=sensor, value=float(i), date=start + timedelta(minutes=i), fill=self.fill)
+		Data.objects.create(sensor=self.sensors[0], value=99.0, date=start)  # otro llenado
+
+	def _patch_build(self):
+		from unittest.mock import patch
+		from . import workbook
+		return patch('Fill.workbook.build_workbook', side_effect=workbook.build_workbook)
+
+	def _load(self, path):
+		from openpyxl import load_workbook
+		return load_workbook(path, read_only=True)
+
+	def test_workbook_has_prediction_and_one_sheet_per_sensor(self):
+		import os
+		from .workbook import build_workbook
+		path = build_workbook(self.fill, os.path.join(self.export_dir, 'test.xlsx'), chunk_size=3)
+		workbook = self._load(path)
+		self.assertEqual(workbook.sheetnames, ['Predicción', 'Temperatura (temp)', 'Presión (pres)'])
+		rows = list(workbook['Temperatura (temp)'].values)
+		self.assertEqual(rows[0], ('date', 'value'))
+		self.assertEqual([row[1] for row in rows[1:]], [0.0, 1.0, 2.0, 3.0])
+		prediction = list(workbook['Predicción'].values)
+		self.assertIn(('total_solids', 10), prediction)
+		self.assertEqual(prediction[-1], (2, 3, 0.3))
+
+	def test_export_endpoint_builds_once_per_last_data_id(self):
+		import os
+		from rest_framework.test import APIClient
+		from dataSensor.models import Data
+		client = APIClient()
+		with self._patch_build() as build:
+			self.assertEqual(client.post(f'/api/Fill/{self.fill.id}/export/').status_code, 202)
+			response = client.get(f'/api/Fill/{self.fill.id}/export/')
+			self.assertEqual(response.status_code, 200)
+			self.assertIn('llenado-', response['Content-Disposition'])
+			b''.join(response.streaming_content)
+			self.assertEqual(build.call_count, 1)
+
+			# Una lectura nueva invalida el libro anterior
+			Data.objects.create(sensor=self.sensors[0], value=4.0, fill=self.fill)
+			client.get(f'/api/Fill/{self.fill.id}/export/')
+			self.assertEqual(build.call_count, 2)
+		self.assertEqual(len(os.listdir(self.export_dir)), 1)
+
+	def test_running_job_is_not_started_twice(self):
+		from unittest.mock import patch
+		from . import workbook
+		workbook.redis_client.set(workbook.JOB_PREFIX + f'fill-{self.fill.id}-0.xlsx', 1)
+		with patch('Fill.workbook.last_data_id', return_value=0), self._patch_build() as build:
+			self.assertEqual(workbook.get_jobs().status(self.fill.id)[0], 'pending')
+		build.assert_not_called()
+
+	def test_failed_job_is_reported_and_retried_on_post(self):
+		from unittest.mock import patch
+		from rest_framework.test import APIClient
+		client = APIClient()
+		with patch('Fill.workbook.build_workbook', side_effect=OSError('disco lleno')):
+			self.assertEqual(client.get(f'/api/Fill/{self.fill.id}/export/').status_code, 202)
+			response = client.get(f'/api/Fill/{self.fill.id}/export/')
+		self.assertEqual(response.status_code, 500)
+		self.assertEqual(response.json(), {'status': 'failed', 'error': 'disco lleno'})
+		self.assertEqual(client.post(f'/api/Fill/{self.fill.id}/export/').status_code, 202)
+		self.assertEqual(client.get(f'/api/Fill/{self.fill.id}/export/').status_code, 200)
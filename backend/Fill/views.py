@@ -1,10 +1,14 @@
 from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework import status
+from django.http import FileResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from dataSensor.exports import stream_response
 from .models import Fill
 from .serializers import FillSerializer
+from .workbook import get_jobs
 
 
 class FillViewSet(viewsets.ModelViewSet):
@@ -20,3 +24,22 @@ class FillViewSet(viewsets.ModelViewSet):
         serializer = FillSerializer(active_fill)
 
         return Response (serializer.data)
+
+    @action(detail=True, methods=['get', 'post'])
+    def export(self, request, pk=None):
+        """Libro .xlsx del llenado, generado en segundo plano.
+
+        Devuelve 202 con ``{"status": "pending"}`` mientras se genera y el fichero
+        cuando está listo; POST reintenta un trabajo que haya fallado.
+        """
+        fill = self.get_object()
+        jobs = get_jobs()
+        state, path = jobs.retry(fill.id) if request.method == 'POST' else jobs.status(fill.id)
+        if state == 'failed':
+            return Response({'status': state, 'error': jobs.error(path)},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if state == 'pending' or request.method == 'POST':
+            code = status.HTTP_200_OK if state == 'ready' else status.HTTP_202_ACCEPTED
+            return Response({'status': state}, status=code)
+        response = FileResponse(open(path, 'rb'), as_attachment=True, filename=f'llenado-{fill.id}.xlsx')
+        return stream_response(request, response)
@@ -0,0 +1,164 @@
+"""Libro Excel (.xlsx) de un llenado: hoja de predicción y una hoja por sensor.
+
+Se escribe con el modo ``write_only`` de openpyxl (cada hoja va a disco según
+se añaden filas) leyendo las lecturas con ``.iterator(chunk_size=...)`` en
+orden (sensor, fecha), que es el índice ``data_fill_sensor_date_idx``. Así la
+memoria no depende del tamaño del llenado.
+
+El fichero se genera en un hilo de fondo y se guarda en ``FILL_EXPORT_DIR``
+con el id de la última lectura en el nombre: mientras no lleguen lecturas
+nuevas se reutiliza, y al llegar una se genera otro y se borra el anterior.
+
+El estado del trabajo vive en Redis, compartido por todos los procesos: una
+clave ``SET NX`` con caducidad reserva la generación (un solo proceso genera
+cada libro) y otra guarda el último error durante ``ERROR_TTL`` segundos. Si
+el proceso muere a mitad, la reserva caduca y la siguiente petición lo relanza.
+"""
+import os
+import threading
+
+import redis
+from django.conf import settings
+from django.db import connections
+from openpyxl import Workbook
+
+from .models import Fill
+
+redis_client = redis.Redis(host='redis', port=6379, db=0)
+JOB_PREFIX = "Fill:export-job:"
+ERROR_PREFIX = "Fill:export-error:"
+JOB_TTL = 900      # tiempo máximo de una generación antes de poder relanzarla
+ERROR_TTL = 3600
+
+CHUNK_SIZE = 2000
+SHEET_TITLE_MAX = 31
+PREDICTION_FIELDS = ("total_solids", "total_volatile_solids", "potencial_production", "max_mu",
+                     "solvent_volume", "initial_concentration", "specific_mu")
+FILL_FIELDS = ("first_day", "last_day", "people_involved", "filling_mass", "approx_density",
+               "added_watter", "type_material", "filling_moisture", "delay_time")
+
+
+def export_dir():
+    return getattr(settings, "FILL_EXPORT_DIR", os.path.join(settings.MEDIA_ROOT, "exports"))
+
+
+def last_data_id(fill_id):
+    from dataSensor.models import Data
+    return Data.objects.filter(fill_id=fill_id).order_by("-id").values_list("id", flat=True).first() or 0
+
+
+def export_path(fill_id, last_id):
+    return os.path.join(export_dir(), f"fill-{fill_id}-{last_id}.xlsx")
+
+
+def _sheet_title(name, used):
+    # Excel limita los títulos a 31 caracteres sin []:*?/\ y sin repetir
+    title = "".join("_" if c in "[]:*?/\\" else c for c in name)[:SHEET_TITLE_MAX] or "Sensor"
+    base, n = title, 2
+    while title in used:
+        suffix = f" ({n})"
+        title, n = base[:SHEET_TITLE_MAX - len(suffix)] + suffix, n + 1
+    used.add(title)
+    return title
+
+
+def _write_prediction(workbook, fill):
+    sheet = workbook.create_sheet("Predicción")
+    sheet.append(["Llenado", fill.id])
+    for field in FILL_FIELDS:
+        sheet.append([field, getattr(fill, field)])
+    prediction = fill.prediction
+    if prediction is None:
+        return
+    sheet.append([])
+    for field in PREDICTION_FIELDS:
+        sheet.append([field, getattr(prediction, field)])
+    sheet.append([])
+    sheet.append(["día", "cumulative_production", "derivative_production"])
+    cumulative = prediction.cumulative_production or []
+    derivative = prediction.derivative_production or []
+    for day in range(max(len(cumulative), len(derivative))):
+        sheet.append([day,
+                      cumulative[day] if day < len(cumulative) else None,
+                      derivative[day] if day < len(derivative) else None])
+
+
+def _write_sensors(workbook, fill_id, chunk_size):
+    from dataSensor.models import Data
+    rows = (Data.objects.filter(fill_id=fill_id).order_by("sensor_id", "date", "id")
+            .values_list("sensor_id", "sensor__name", "sensor__mqtt_code", "date", "value")
+            .iterator(chunk_size=chunk_size))
+    used, sheet, current = {"Predicción"}, None, None
+    for sensor_id, name, mqtt_code, date, value in rows:
+        if sensor_id != current:
+            current = sensor_id
+            sheet = workbook.create_sheet(_sheet_title(f"{name} ({mqtt_code})", used))
+            sheet.append(["date", "value"])
+        # Excel no admite fechas con zona horaria; se guardan en UTC
+        sheet.append([date.replace(tzinfo=None), value])
+
+
+def build_workbook(fill, path, chunk_size=CHUNK_SIZE):
+    """Escribe el libro en ``path`` (primero a un temporal, luego ``os.replace``)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    workbook = Workbook(write_only=True)
+    _write_prediction(workbook, fill)
+    _write_sensors(workbook, fill.id, chunk_size)
+    tmp_path = f"{path}.tmp"
+    workbook.save(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _remove_stale(fill_id, keep):
+    prefix = f"fill-{fill_id}-"
+    for name in os.listdir(export_dir()):
+        path = os.path.join(export_dir(), name)
+        if name.startswith(prefix) and name.endswith(".xlsx") and path != keep:
+            os.remove(path)
+
+
+class ExportJobs:
+    """Genera los libros en hilos de fondo, uno por (llenado, última lectura)."""
+
+    def status(self, fill_id):
+        """(estado, ruta): ``ready``, ``pending`` o ``failed``; arranca el trabajo si hace falta."""
+        path = export_path(fill_id, last_data_id(fill_id))
+        if os.path.exists(path):
+            return "ready", path
+        name = os.path.basename(path)
+        if redis_client.exists(ERROR_PREFIX + name):
+            return "failed", path
+        # Solo el proceso que consigue la reserva genera el libro
+        if redis_client.set(JOB_PREFIX + name, os.getpid(), nx=True, ex=JOB_TTL):
+            threading.Thread(target=self._run, args=(fill_id, path), daemon=True,
+                             name=f"Fill-export-{fill_id}").start()
+        return "pending", path
+
+    def error(self, path):
+        message = redis_client.get(ERROR_PREFIX + os.path.basename(path))
+        return message.decode() if message else None
+
+    def retry(self, fill_id):
+        redis_client.delete(ERROR_PREFIX + os.path.basename(export_path(fill_id, last_data_id(fill_id))))
+        return self.status(fill_id)
+
+    def _run(self, fill_id, path):
+        name = os.path.basename(path)
+        try:
+            fill = Fill.objects.select_related("prediction").get(id=fill_id)
+            build_workbook(fill, path)
+            _remove_stale(fill_id, keep=path)
+        except Exception as e:
+            print(f"Error exporting fill {fill_id}: {e}")
+            redis_client.set(ERROR_PREFIX + name, str(e), ex=ERROR_TTL)
+        finally:
+            redis_client.delete(JOB_PREFIX + name)
+            connections.close_all()
+
+
+_jobs = ExportJobs()
+
+
+def get_jobs():
+    return _jobs
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CalibrationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'calibrations'
+
+    def ready(self):
+        from BGProject.caching import watch
+        from .models import Calibration
+        watch(Calibration)
@@ -33,3 +33,21 @@ def test_str_fields():
 	assert isinstance(calibration.params, str)
 	assert isinstance(calibration.note, str)
 	assert isinstance(calibration.result, str)
+
+@pytest.mark.django_db
+def test_list_is_cached_until_a_calibration_changes(django_capture_on_commit_callbacks):
+	from unittest.mock import patch
+	from django.core.cache import cache
+	from rest_framework.test import APIClient
+	cache.clear()
+	client = APIClient()
+	first = client.get('/api/calibration/')
+	assert first.status_code == 200
+	assert client.get('/api/calibration/', HTTP_IF_NONE_MATCH=first['ETag']).status_code == 304
+	# El registro de sensores también escucha Calibration; su Redis se simula
+	with patch('dataSensor.registry.redis_client'), django_capture_on_commit_callbacks(execute=True):
+		Calibration.objects.create(userId=1.0, sensorId=2.0, date=timezone.now().date(),
+								   params='{}', note='', result='ok')
+	changed = client.get('/api/calibration/', HTTP_IF_NONE_MATCH=first['ETag'])
+	assert changed.status_code == 200
+	assert len(changed.json()) == 1
@@ -1,7 +1,8 @@
 from rest_framework import viewsets
+from BGProject.caching import CachedReadMixin
 from .models import Calibration
 from .serializers import CalibrationSerializer
 
-class CalibrationViewSet(viewsets.ModelViewSet):
+class CalibrationViewSet(CachedReadMixin, viewsets.ModelViewSet):
     queryset = Calibration.objects.all()
     serializer_class = CalibrationSerializer
\ No newline at end of file
@@ -1,36 +1,51 @@
 import paho.mqtt.client as mqtt
 import redis
 
+from .ingestBuffer import IngestBuffer
+from . import sharding
+
 redis_client = redis.Redis(host='redis', port=6379, db=0)
 
-def send_ws_update():
-    """Send WebSocket update to connected clients."""
-    from .websocketService import send_sensors_data
-    send_sensors_data()
+# Límites del lote de ingesta: lo que ocurra primero
+batch_size = 500
+flush_interval = 0.02  # segundos
+history_length = 30
+
+def send_ws_update(batch):
+    """Mark the batch topics for the next (rate-limited) WebSocket broadcast."""
+    from .websocketService import get_broadcaster
+    get_broadcaster().mark_dirty(batch)
 
 def start_save_data_thread():
     """Start the data saving thread."""
     from .views import start_save_data_thread as _start
     return _start()
 
+ingest_buffer = IngestBuffer(
+    redis_client,
+    max_batch=batch_size,
+    max_delay=flush_interval,
+    history=history_length,
+    on_flush=send_ws_update,
+)
+
 def on_connect(client, userdata, flags, reason_code, properties):
     # Suscribirse a TODOS los topics bajo Biogestor/ usando wildcard
-    # Esto permite agregar nuevos sensores sin reiniciar el subscriber
-    client.subscribe("Biogestor/#")
-    print("Suscrito a Biogestor/# (todos los sensores)")
+    # Esto permite agregar nuevos sensores sin reiniciar el subscriber.
+    # Con MQTT_SHARE_GROUP la suscripción es compartida entre réplicas.
+    topic = sharding.subscription_topic()
+    client.subscribe(topic)
+    print(f"Suscrito a {topic} (todos los sensores)")
 
 def on_message(client, userdata, msg):
-    print(msg.topic+" "+str(msg.payload))
-    
-    # Guardar el mensaje en Redis usando el topic como clave
-    redis_client.rpush(msg.topic, msg.payload)
-    redis_client.ltrim(msg.topic, -30, -1)
-
-    send_ws_update()
+    if not sharding.owns_topic(msg.topic):
+        return
+    # Se acumula en el buffer; Redis se escribe por lotes en un solo pipeline
+    ingest_buffer.add(msg.topic, msg.payload)
 
 try:
     mqttc = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)  # type: ignore[attr-defined]
 except Exception:
     mqttc = mqtt.Client()
 mqttc.on_connect = on_connect
-mqttc.on_message = on_message
\ No newline at end of file
+mqttc.on_message = on_message
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Data, MeasuredVariable, Sensor
+from .models import Data, DataRollup, MeasuredVariable, Sensor
 
 
 @admin.register(MeasuredVariable)
@@ -19,3 +19,9 @@ class SensorAdmin(admin.ModelAdmin):
 class DataAdmin(admin.ModelAdmin):
     list_display = ("sensor", "value", "date")
     search_fields = ("sensor__name",)
+
+
+@admin.register(DataRollup)
+class DataRollupAdmin(admin.ModelAdmin):
+    list_display = ("sensor", "resolution", "bucket", "count", "min_value", "max_value", "avg_value")
+    list_filter = ("resolution",)
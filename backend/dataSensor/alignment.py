@@ -0,0 +1,94 @@
+"""Tabla ancha de varios sensores en una rejilla común (``/api/sensor-data/aligned/``).
+
+Las lecturas de todos los sensores se leen en una sola consulta, se agrupan
+con pandas en cubetas de ``freq`` a partir de ``from`` (media de cada cubeta)
+y se pivotan a una columna por sensor. Los huecos se rellenan con el último
+valor (``ffill``), por interpolación en el tiempo (``interpolate``, solo entre
+lecturas) o se dejan vacíos (``none``).
+
+El resultado se guarda en la caché de Django con la clave (sensores, rango,
+freq, relleno, marca de agua de ``watermark``), así que se recalcula solo
+cuando llegan lecturas que pueden caer en el rango.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+
+from . import watermark
+from .models import Data
+
+FILL_METHODS = ("ffill", "interpolate", "none")
+CACHE_PREFIX = "dataSensor:aligned:"
+CACHE_TTL = 300
+
+
+def parse_freq(value):
+    """``15min``, ``1h``, ``30s``... -> Timedelta; ValueError si no es un intervalo fijo positivo."""
+    freq = pd.to_timedelta(value)
+    if freq < pd.Timedelta(seconds=1):
+        raise ValueError(value)
+    return freq
+
+
+def bucket_count(start, end, freq):
+    return int(np.ceil((end - start) / freq.to_pytimedelta()))
+
+
+def load_frame(sensor_ids, start, end):
+    """Lecturas (sensor_id, date, value) de todos los sensores en una consulta."""
+    rows = (Data.objects.filter(sensor_id__in=sensor_ids, date__gte=start, date__lt=end)
+            .values_list("sensor_id", "date", "value"))
+    frame = pd.DataFrame.from_records(list(rows), columns=["sensor_id", "date", "value"])
+    frame["date"] = pd.to_datetime(frame["date"], utc=True)
+    return frame
+
+
+def align(frame, sensor_ids, start, end, freq, fill="ffill"):
+    """Una columna por sensor (en el orden pedido) y una fila por cubeta de ``freq``."""
+    start = pd.Timestamp(start).tz_convert("UTC")
+    index = pd.date_range(start, periods=bucket_count(start, pd.Timestamp(end), freq), freq=freq)
+    if frame.empty:
+        wide = pd.DataFrame(index=index, columns=sensor_ids, dtype=np.float64)
+    else:
+        frame = frame.assign(bucket=start + ((frame["date"] - start) // freq) * freq)
+        wide = (frame.pivot_table(index="bucket", columns="sensor_id", values="value", aggfunc="mean")
+                .reindex(index=index, columns=sensor_ids))
+    if fill == "ffill":
+        wide = wide.ffill()
+    elif fill == "interpolate":
+        wide = wide.interpolate(method="time", limit_area="inside")
+    return wide
+
+
+def to_payload(wide):
+    values = {}
+    for sensor_id in wide.columns:
+        column = wide[sensor_id].to_numpy(dtype=np.float64)
+        values[str(sensor_id)] = [None if np.isnan(v) else v for v in column.tolist()]
+    dates = np.datetime_as_string(wide.index.to_numpy(dtype="datetime64[ms]"), unit="ms", timezone="UTC")
+    return {"dates": dates.tolist(), "values": values}
+
+
+def _cache_key(sensor_ids, start, end, freq, fill, mark):
+    raw = f"{','.join(map(str, sensor_ids))}|{start.isoformat()}|{end.isoformat()}|{freq.total_seconds()}|{fill}|{mark}"
+    return CACHE_PREFIX + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def aligned(sensor_ids, start, end, freq, fill="ffill"):
+    """(payload, cacheado) con ``dates`` y ``values`` {sensor_id: [...]}."""
+    try:
+        key = _cache_key(sensor_ids, start, end, freq, fill, watermark.for_range(end))
+    except Exception as e:
+        # Sin marca de agua no se puede saber si la caché sigue valiendo
+        print(f"Error reading data watermark: {e}")
+        key = None
+    if key is not None:
+        payload = cache.get(key)
+        if payload is not None:
+            return payload, True
+    payload = to_payload(align(load_frame(sensor_ids, start, end), sensor_ids, start, end, freq, fill))
+    if key is not None:
+        cache.set(key, payload, CACHE_TTL)
+    return payload, False
@@ -4,4 +4,10 @@ from django.apps import AppConfig
 class DatasensorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dataSensor'
-    
\ No newline at end of file
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from BGProject.caching import watch
+        from .models import MeasuredVariable, Sensor
+        watch(MeasuredVariable)
+        watch(Sensor)
@@ -0,0 +1,171 @@
+"""Pipeline de ingesta asyncio: receive -> store -> broadcast / persist.
+
+Cada etapa corre en su propia tarea y se comunica con la siguiente por una
+cola acotada. Si Redis o la base de datos se vuelven lentos, las colas se
+llenan y frenan a la etapa anterior (backpressure) en lugar de bloquear el
+hilo de red MQTT. La difusión por WebSocket solo necesita saber qué topics
+cambiaron, así que si su cola está llena el lote se marca directamente en el
+broadcaster en lugar de esperar (o perderse, lo que dejaría un hueco en los
+deltas sin que cambie ``seq``).
+"""
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+
+from . import metrics, sensorStore, sharding
+
+
+async def drain(queue, max_items, max_delay):
+    """Espera un elemento y luego junta hasta ``max_items`` o ``max_delay`` segundos."""
+    loop = asyncio.get_running_loop()
+    items = [await queue.get()]
+    deadline = loop.time() + max_delay
+    while len(items) < max_items:
+        try:
+            items.append(queue.get_nowait())
+            continue
+        except asyncio.QueueEmpty:
+            pass
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            items.append(await asyncio.wait_for(queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    return items
+
+
+class IngestPipeline:
+    def __init__(self, redis, max_batch=500, max_delay=0.02, history=30, save_interval=5,
+                 store_queue_size=10000, broadcast_queue_size=8, persist_queue_size=64,
+                 broadcast_rate=None):
+        from .websocketService import SensorBroadcaster
+        self.redis = redis
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.history = history
+        self.save_interval = save_interval
+        self.store_queue = asyncio.Queue(maxsize=store_queue_size)
+        self.broadcast_queue = asyncio.Queue(maxsize=broadcast_queue_size)
+        self.persist_queue = asyncio.Queue(maxsize=persist_queue_size)
+        self.latest = {}
+        self.broadcaster = SensorBroadcaster(rate=broadcast_rate)
+        self._next_broadcast = 0.0
+
+    # Etapa 1: MQTT -> store_queue
+    async def receive(self, messages):
+        async for message in messages:
+            topic = str(message.topic)
+            if not sharding.owns_topic(topic):
+                continue
+            await self.store_queue.put((topic, message.payload, time.time()))
+
+    # Etapa 2: store_queue -> Redis (un pipeline por lote) -> broadcast/persist
+    async def store_once(self):
+        batch = await drain(self.store_queue, self.max_batch, self.max_delay)
+        start = time.perf_counter()
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            sensorStore.queue_batch(pipe, batch, self.history)
+            snapshot_us = (await pipe.execute())[-1]
+        except Exception as e:
+            metrics.incr("ingest.flush_errors")
+            metrics.incr("ingest.dropped_messages", len(batch))
+            print(f"Error writing batch to Redis: {e}")
+            return batch
+
+        metrics.incr("ingest.messages", len(batch))
+        metrics.incr("ingest.flushes")
+        metrics.observe("ingest.batch_size", len(batch))
+        metrics.observe("ingest.flush_ms", (time.perf_counter() - start) * 1000.0)
+        metrics.observe("ingest.snapshot_ms", snapshot_us / 1000.0)
+
+        try:
+            self.broadcast_queue.put_nowait(batch)
+        except asyncio.QueueFull:
+            self.broadcaster.mark_dirty(batch)
+            metrics.incr("ingest.broadcast_direct_batches")
+        # En modo stream el persistidor lee del Redis Stream, no de esta cola
+        if not sensorStore.stream_mode():
+            await self.persist_queue.put(batch)
+        return batch
+
+    async def store(self):
+        while True:
+            await self.store_once()
+
+    # Etapa 3: junta los topics de los lotes y difunde como máximo
+    # broadcast_rate frames por segundo, uno por tick con los topics cambiados
+    async def broadcast_once(self):
+        loop = asyncio.get_running_loop()
+        timeout = self._next_broadcast - loop.time()
+        if timeout > 0:
+            try:
+                batch = await asyncio.wait_for(self.broadcast_queue.get(), timeout)
+                self.broadcaster.mark_dirty(batch)
+                return 0
+            except asyncio.TimeoutError:
+                pass
+        self._next_broadcast = loop.time() + 1.0 / self.broadcaster.rate
+        return await sync_to_async(self.broadcaster.flush, thread_sensitive=False)()
+
+    async def broadcast(self):
+        while True:
+            await self.broadcast_once()
+
+    # Etapa 4: guarda la última lectura de cada topic cada save_interval segundos.
+    # En modo stream guarda todas las lecturas leyendo del consumer group.
+    # Con suscripción compartida esta réplica no ve todos los mensajes de un
+    # topic, así que lee la última lectura de Redis y reclama cada sensor.
+    async def persist(self):
+        from .views import save_latest_values, save_data_iteration, save_stream_iteration
+        if sensorStore.stream_mode():
+            while True:
+                try:
+                    await sync_to_async(save_stream_iteration, thread_sensitive=True)()
+                except Exception as e:
+                    print(f"Error saving sensor data: {e}")
+                    await asyncio.sleep(self.save_interval)
+        loop = asyncio.get_running_loop()
+        next_save = loop.time() + self.save_interval
+        while True:
+            timeout = next_save - loop.time()
+            if timeout > 0:
+                try:
+                    batch = await asyncio.wait_for(self.persist_queue.get(), timeout)
+                    for topic, payload, _ts in batch:
+                        self.latest[topic] = payload
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            next_save = loop.time() + self.save_interval
+            if sharding.share_group():
+                save, args = save_data_iteration, ()
+            elif self.latest:
+                save, args = save_latest_values, (dict(self.latest),)
+            else:
+                continue
+            try:
+                await sync_to_async(save, thread_sensitive=True)(*args)
+            except Exception as e:
+                print(f"Error saving sensor data: {e}")
+
+    async def run(self, receive):
+        """Ejecuta las etapas y ``receive`` (la etapa 1) bajo un ``TaskGroup``.
+
+        Si una etapa termina con una excepción se registra, se cancelan las
+        demás y se propaga, en lugar de dejar el pipeline parado en silencio.
+        """
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(self.store(), name="ingest-store")
+                group.create_task(self.broadcast(), name="ingest-broadcast")
+                group.create_task(self.persist(), name="ingest-persist")
+                group.create_task(receive, name="ingest-receive")
+        except* Exception as errors:
+            for error in errors.exceptions:
+                print(f"Ingest stage failed: {error!r}")
+            metrics.incr("ingest.stage_failures", len(errors.exceptions))
+            raise
@@ -0,0 +1,67 @@
+"""Carga masiva de filas de ``Data``.
+
+En PostgreSQL usa ``COPY ... FROM STDIN`` (psycopg2 ``copy_expert``) desde un
+buffer en memoria, sin crear objetos del ORM. En otros motores (SQLite en los
+tests) cae a ``bulk_create``.
+
+Las filas son tuplas ``(sensor_id, value, date, fill_id)``; ``date`` debe
+venir con zona horaria y ``fill_id`` puede ser None.
+"""
+import io
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import watermark
+from .models import Data
+
+COLUMNS = ("sensor_id", "value", "date", "fill_id")
+NULL = "\\N"
+BULK_CREATE_BATCH = 1000
+
+
+def copy_buffer(rows):
+    """Serializa las filas en el formato de texto de COPY (tabuladores, \\N = NULL)."""
+    buffer = io.StringIO()
+    write = buffer.write
+    for sensor_id, value, date, fill_id in rows:
+        write(f"{sensor_id}\t{value!r}\t{date.isoformat()}\t{NULL if fill_id is None else fill_id}\n")
+    buffer.seek(0)
+    return buffer
+
+
+def supports_copy(using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        return hasattr(cursor.cursor, "copy_expert")
+
+
+def copy_rows(rows, using=DEFAULT_DB_ALIAS):
+    rows = list(rows)
+    if not rows:
+        return 0
+    table = connections[using].ops.quote_name(Data._meta.db_table)
+    columns = ", ".join(COLUMNS)
+    with connections[using].cursor() as cursor:
+        cursor.cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", copy_buffer(rows))
+    return len(rows)
+
+
+def bulk_create_rows(rows, using=DEFAULT_DB_ALIAS):
+    objs = [Data(sensor_id=sensor_id, value=value, date=date, fill_id=fill_id)
+            for sensor_id, value, date, fill_id in rows]
+    Data.objects.using(using).bulk_create(objs, batch_size=BULK_CREATE_BATCH)
+    return len(objs)
+
+
+def load_rows(rows, using=DEFAULT_DB_ALIAS):
+    """Inserta las filas con COPY si el motor lo permite, si no con bulk_create.
+
+    Al confirmarse la transacción actualiza la marca de agua (``watermark``).
+    """
+    rows = list(rows)
+    watermark.note_rows(rows)
+    if supports_copy(using):
+        return copy_rows(rows, using)
+    return bulk_create_rows(rows, using)
@@ -0,0 +1,97 @@
+"""Formato binario por columnas (``?format=columns``) para series largas.
+
+Evita el JSON fila a fila: cada columna se copia a un array de NumPy y se
+escribe tal cual (little-endian). Estructura del cuerpo::
+
+    b"BGC1"                   4 bytes, identificador y versión
+    longitud de la cabecera   uint32 little-endian
+    cabecera                  JSON UTF-8, rellenado con espacios hasta múltiplo de 8
+    columnas                  una tras otra, cada una alineada a 8 bytes
+
+La cabecera es ``{"rows": n, "columns": [{"name", "dtype", "offset"}, ...]}``;
+``offset`` cuenta desde el final de la cabecera (``8 + longitud``), así que en
+el navegador basta ``new Float64Array(buffer, 8 + longitud + offset, rows)``
+(o ``BigInt64Array`` para ``<i8``).
+Las fechas van como ``<f8`` en milisegundos epoch UTC (lo que espera
+``new Date``); los ids como ``<i8``, con ``-1`` para nulo si la columna lo indica
+con ``"null": -1``, y los valores como ``<f8`` (``NaN`` si es nulo).
+"""
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b"BGC1"
+MEDIA_TYPE = "application/vnd.biogestor.columns"
+ALIGN = 8
+NULL_ID = -1
+
+# Tipo de cada columna: (dtype, valor nulo, conversión de cada celda)
+KINDS = {
+    "int": ("<i8", None, None),
+    "int?": ("<i8", NULL_ID, None),
+    "float": ("<f8", np.nan, None),
+    "time": ("<f8", np.nan, lambda value: value.timestamp() * 1000.0),
+}
+
+
+def _pad(size):
+    return -size % ALIGN
+
+
+class Frame:
+    """Columnas ``[(nombre, tipo, array)]`` listas para ``encode``."""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.rows = len(columns[0][2]) if columns else 0
+
+    @classmethod
+    def from_rows(cls, rows, spec):
+        """``rows`` son dicts (``.values()``); ``spec`` es ``((campo, tipo), ...)``."""
+        count = len(rows)
+        columns = []
+        for field, kind in spec:
+            dtype, null, convert = KINDS[kind]
+            cells = (row[field] for row in rows)
+            if convert is not None:
+                cells = (null if value is None else convert(value) for value in cells)
+            elif null is not None:
+                cells = (null if value is None else value for value in cells)
+            columns.append((field, kind, np.fromiter(cells, dtype=dtype, count=count)))
+        return cls(columns)
+
+    def header(self):
+        offset = 0
+        columns = []
+        for name, kind, array in self.columns:
+            dtype, null, _convert = KINDS[kind]
+            column = {"name": name, "dtype": dtype, "offset": offset}
+            if kind == "int?":
+                column["null"] = null
+            columns.append(column)
+            offset += array.nbytes + _pad(array.nbytes)
+        return {"rows": self.rows, "columns": columns}
+
+    def encode(self):
+        header = json.dumps(self.header(), separators=(",", ":")).encode()
+        # Las columnas empiezan alineadas a 8 bytes desde el inicio del cuerpo
+        header += b" " * _pad(len(MAGIC) + 4 + len(header))
+        parts = [MAGIC, struct.pack("<I", len(header)), header]
+        for _name, _kind, array in self.columns:
+            parts.append(array.tobytes())
+            parts.append(b"\0" * _pad(array.nbytes))
+        return b"".join(parts)
+
+
+def decode(body):
+    """Inverso de ``Frame.encode``: ({nombre: array}, cabecera). Para pruebas y clientes Python."""
+    if body[:len(MAGIC)] != MAGIC:
+        raise ValueError("No es un cuerpo BGC1")
+    (length,) = struct.unpack_from("<I", body, len(MAGIC))
+    start = len(MAGIC) + 4 + length
+    header = json.loads(body[len(MAGIC) + 4:start])
+    columns = {column["name"]: np.frombuffer(body, dtype=column["dtype"], count=header["rows"],
+                                             offset=start + column["offset"])
+               for column in header["columns"]}
+    return columns, header
@@ -1,41 +1,251 @@
-from channels.generic.websocket import WebsocketConsumer
-from asgiref.sync import async_to_sync
-import redis
+from channels.generic.websocket import AsyncWebsocketConsumer
+from collections import deque
+from django.conf import settings
+from fnmatch import fnmatchcase
+from urllib.parse import parse_qs
+import asyncio
+import redis.asyncio as aioredis
 import json
+import msgpack
+import time
+import weakref
 
-redis_client = redis.Redis(host='redis', port=6379, db=0)
+from . import metrics, sensorStore
+from .websocketService import ALL_GROUPS, BINARY_SUBPROTOCOL, TOPICS_GROUP, float_history, pack, topic_group
+
+# Un pool compartido por todas las conexiones del proceso: si se agota, las
+# peticiones esperan un hueco en lugar de abrir una conexión nueva a Redis
+redis_client = aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool(
+    host='redis', port=6379, db=0, max_connections=50, timeout=5))
+max_patterns = 100
+# Cierre de las conexiones que no dan abasto (rango 4000-4999 de la aplicación)
+SLOW_CLOSE_CODE = 4008
+# Marca en la cola de envío: enviar un snapshot en lugar de los frames descartados
+SNAPSHOT = object()
+_connections = weakref.WeakSet()
+
+
+def protocol_version(scope):
+    """Versión del protocolo pedida con ?v=2 (por defecto 1)."""
+    query = parse_qs(scope.get("query_string", b"").decode())
+    try:
+        return int(query.get("v", ["1"])[0])
+    except ValueError:
+        return 1
+
+
+def binary_subprotocol(scope):
+    """Frames binarios: subprotocolo a aceptar ("" con ?format=msgpack); ``None`` = texto JSON."""
+    if BINARY_SUBPROTOCOL in scope.get("subprotocols", []):
+        return BINARY_SUBPROTOCOL
+    query = parse_qs(scope.get("query_string", b"").decode())
+    return "" if query.get("format", [""])[0] == "msgpack" else None
+
+
+def connection_stats():
+    """Frames pendientes y descartados de cada conexión abierta en este proceso."""
+    return [{"channel": consumer.channel_name, "client": consumer.scope.get("client"),
+             "queued": len(consumer.outbox), "dropped": consumer.dropped}
+            for consumer in list(_connections)]
+
+
+class dataSensorConsumer(AsyncWebsocketConsumer):
+    # v1: historial completo de los topics cambiados en cada frame.
+    # v2: un snapshot al conectar y luego solo deltas con número de secuencia.
+    # Es asíncrono: un socket inactivo no ocupa un hilo del pool de Daphne.
+    #
+    # Sin suscripción se reciben todos los topics (grupo común). Tras
+    # {"action": "subscribe", "topics": ["Biogestor/temp*"]} el socket pasa a
+    # los grupos de cada topic que coincide con algún patrón (fnmatch) y solo
+    # recibe esos; los topics nuevos que coincidan se añaden al aparecer.
+    #
+    # Con el subprotocolo "biogestor.msgpack" (o ?format=msgpack) los frames
+    # son binarios en MessagePack, con los valores como float. El broadcaster
+    # ya los manda codificados en el evento, así que aquí no se codifica nada.
+    #
+    # Los frames difundidos no se escriben al socket desde el evento: van a una
+    # cola acotada (WS_SEND_QUEUE) que vacía otra tarea. Así el canal de la
+    # capa de channels se vacía aunque el cliente vaya lento, y es la cola de
+    # esta conexión la que descarta frames (ver WS_SEND_OVERFLOW).
+    async def connect(self):
+        self.protocol = protocol_version(self.scope)
+        subprotocol = binary_subprotocol(self.scope)
+        self.binary = subprotocol is not None
+        self.patterns = None  # None = todos los topics
+        self.topics = set()
+        await self.channel_layer.group_add(self.all_group(), self.channel_name)
+        await self.accept(subprotocol=subprotocol or None)
 
-class dataSensorConsumer(WebsocketConsumer):
-    def connect(self):
-        async_to_sync(self.channel_layer.group_add)(
-            "sensors_data",
-            self.channel_name
-        )
-        self.accept()
-        
         # Enviar datos actuales al conectar
-        self.send_current_data()
+        await self.send_current_data()
+
+        self.queue_size = getattr(settings, "WS_SEND_QUEUE", 32)
+        self.coalesce = getattr(settings, "WS_SEND_OVERFLOW", "coalesce") == "coalesce"
+        self.outbox = deque()
+        self.pending = asyncio.Event()
+        self.dropped = 0
+        self.overflows = deque()  # momentos de los últimos desbordes
+        self.closing = False
+        self.writer = asyncio.create_task(self.write_outbox())
+        _connections.add(self)
+
+    def all_group(self):
+        return ALL_GROUPS[2 if self.protocol == 2 else 1]
+
+    def topic_group(self, topic):
+        return topic_group(2 if self.protocol == 2 else 1, topic)
 
-    def send_current_data(self):
-        """Enviar datos actuales de Redis al cliente cuando se conecta."""
-        data = {}
+    async def send_current_data(self):
+        """Enviar el snapshot de Redis (de los topics suscritos, si los hay)."""
         try:
-            # Solo obtener claves de sensores (Biogestor/*)
-            for key in redis_client.keys("Biogestor/*"):
-                if redis_client.type(key) == b'list':
-                    values = redis_client.lrange(key, 0, -1)
-                    data[key.decode()] = [v.decode() for v in values]
+            # Un solo round trip: el snapshot lo mantiene la ingesta ya en JSON
+            if self.protocol == 2:
+                blob, raw_seqs = await sensorStore.aread_snapshot(redis_client, seqs=True)
+            else:
+                blob, raw_seqs = await sensorStore.aread_snapshot(redis_client), {}
         except Exception as e:
             print(f"Error reading Redis data: {e}")
-        
-        if data:
-            self.send(text_data=json.dumps(data))
-
-    def send_data(self, event):
-        self.send(text_data=event["text"])
-
-    def disconnect(self,code):
-        async_to_sync(self.channel_layer.group_discard)(
-        "sensors_data",
-        self.channel_name
-    )
\ No newline at end of file
+            blob, raw_seqs = "{}", {}
+        seq = sensorStore.parse_delta_seqs(raw_seqs, None if self.patterns is None else self.topics)
+
+        if self.patterns is None and not self.binary:
+            # Todos los topics en JSON: se envía sin decodificar el snapshot
+            if self.protocol == 2:
+                await self.send(text_data=f'{{"type": "snapshot", "seq": {json.dumps(seq)}, "data": {blob}}}')
+            elif blob != "{}":
+                await self.send(text_data=blob)
+            return
+
+        data = json.loads(blob)
+        if self.patterns is not None:
+            data = {topic: values for topic, values in data.items() if topic in self.topics}
+        if self.binary:
+            data = float_history(data)
+        if self.protocol == 2:
+            await self.send_frame({"type": "snapshot", "seq": seq, "data": data})
+        elif data:
+            await self.send_frame(data)
+
+    async def send_frame(self, frame):
+        if self.binary:
+            await self.send(bytes_data=pack(frame))
+        else:
+            await self.send(text_data=json.dumps(frame))
+
+    async def receive(self, text_data=None, bytes_data=None):
+        # Los mensajes del cliente pueden ir en JSON o, en modo binario, en MessagePack
+        try:
+            if text_data:
+                message = json.loads(text_data)
+            elif bytes_data:
+                message = msgpack.unpackb(bytes_data)
+            else:
+                return
+        except ValueError:
+            return
+        if not isinstance(message, dict):
+            return
+        action = message.get("action")
+        if action in ("subscribe", "unsubscribe"):
+            patterns = message.get("topics")
+            if isinstance(patterns, list) and all(isinstance(p, str) for p in patterns):
+                await self.update_subscription(action, patterns)
+        # v2: el cliente pide un snapshot nuevo si detecta un hueco en el seq de un origen
+        elif action == "resync" and self.protocol == 2:
+            await self.send_current_data()
+
+    async def update_subscription(self, action, patterns):
+        if self.patterns is None:
+            # Primera suscripción: deja de recibir todos los topics
+            self.patterns = set()
+            await self.channel_layer.group_discard(self.all_group(), self.channel_name)
+            await self.channel_layer.group_add(TOPICS_GROUP, self.channel_name)
+        if action == "subscribe":
+            self.patterns.update(patterns[:max_patterns - len(self.patterns)])
+        else:
+            self.patterns.difference_update(patterns)
+
+        try:
+            known = {topic.decode() for topic in await redis_client.smembers(sensorStore.TOPICS_KEY)}
+        except Exception as e:
+            print(f"Error reading Redis topics: {e}")
+            known = set()
+        wanted = {topic for topic in known | self.topics if self.matches(topic)}
+        added = wanted - self.topics
+        for topic in self.topics - wanted:
+            await self.channel_layer.group_discard(self.topic_group(topic), self.channel_name)
+        for topic in added:
+            await self.channel_layer.group_add(self.topic_group(topic), self.channel_name)
+        self.topics = wanted
+        await self.send_frame({"type": "subscribed", "patterns": sorted(self.patterns), "topics": sorted(self.topics)})
+        if added:
+            await self.send_current_data()
+
+    def matches(self, topic):
+        return any(fnmatchcase(topic, pattern) for pattern in self.patterns)
+
+    async def topic_added(self, event):
+        # Topic nuevo anunciado por el broadcaster
+        topic = event["text"]
+        if self.patterns and topic not in self.topics and self.matches(topic):
+            self.topics.add(topic)
+            await self.channel_layer.group_add(self.topic_group(topic), self.channel_name)
+
+    async def send_data(self, event):
+        if self.closing:
+            return
+        if len(self.outbox) >= self.queue_size and self.overflow():
+            metrics.incr("ws.slow_disconnects")
+            print(f"Closing slow WebSocket client {self.scope.get('client')}: {self.dropped} frames dropped")
+            self.closing = True
+            await self.close(code=SLOW_CLOSE_CODE)
+            return
+        self.outbox.append(event["bytes"] if self.binary and "bytes" in event else event["text"])
+        self.pending.set()
+
+    def overflow(self):
+        """Hace sitio en la cola llena; True si el cliente se desborda de forma crónica."""
+        if self.coalesce:
+            # Un snapshot sustituye a todos los frames pendientes
+            dropped = sum(1 for frame in self.outbox if frame is not SNAPSHOT)
+            self.outbox.clear()
+            self.outbox.append(SNAPSHOT)
+        else:
+            self.outbox.popleft()
+            dropped = 1
+        self.dropped += dropped
+        metrics.incr("ws.dropped_frames", dropped)
+
+        now = time.monotonic()
+        self.overflows.append(now)
+        while now - self.overflows[0] > getattr(settings, "WS_SLOW_WINDOW", 60):
+            self.overflows.popleft()
+        return len(self.overflows) >= getattr(settings, "WS_SLOW_MAX_OVERFLOWS", 5)
+
+    async def write_outbox(self):
+        try:
+            while True:
+                await self.pending.wait()
+                self.pending.clear()
+                while self.outbox:
+                    frame = self.outbox.popleft()
+                    if frame is SNAPSHOT:
+                        await self.send_current_data()
+                    elif isinstance(frame, bytes):
+                        await self.send(bytes_data=frame)
+                    else:
+                        await self.send(text_data=frame)
+        except Exception as e:
+            print(f"Error sending WebSocket frames: {e}")
+
+    async def disconnect(self, code):
+        writer = getattr(self, "writer", None)
+        if writer is not None:
+            writer.cancel()
+            _connections.discard(self)
+            if self.dropped:
+                print(f"WebSocket client {self.scope.get('client')} disconnected: {self.dropped} frames dropped")
+        groups = [self.all_group()] if self.patterns is None else [TOPICS_GROUP]
+        groups += [self.topic_group(topic) for topic in self.topics]
+        for group in groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
@@ -0,0 +1,155 @@
+"""Reducción de series para gráficas (``/api/sensor-data/downsample/``).
+
+Las series se leen como arrays de NumPy (x = segundos epoch, y = valor) y se
+reducen a ``points`` puntos con LTTB (Largest-Triangle-Three-Buckets, conserva
+la forma) o con el mínimo y máximo de cada cubeta (conserva los picos).
+
+Para rangos largos se parte de ``DataRollup`` en vez de los datos crudos: se
+usa la resolución más gruesa que aún da al menos ``points`` cubetas, así que
+el coste no depende del rango. Si los rollups no cubren el principio o el
+final del rango (histórico anterior a los rollups), ese tramo se completa con
+los datos crudos.
+"""
+from datetime import timedelta
+
+import numpy as np
+
+from .models import Data, DataRollup
+from .rollups import RESOLUTIONS
+
+METHODS = ("lttb", "minmax")
+
+
+def lttb(x, y, threshold):
+    """Índices de los ``threshold`` puntos que elige LTTB (siempre el primero y el último)."""
+    n = len(x)
+    if threshold >= n or n < 3:
+        return np.arange(n)
+    threshold = max(threshold, 3)
+    # threshold - 2 cubetas entre el primer y el último punto
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    edges = np.append(edges, n)
+    indices = np.empty(threshold, dtype=np.intp)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2]
+        xc, yc = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        xs, ys = x[start:end], y[start:end]
+        areas = np.abs((x[a] - xc) * (ys - y[a]) - (x[a] - xs) * (yc - y[a]))
+        a = start + int(areas.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def minmax(x, y, threshold):
+    """Índices del mínimo y el máximo de cada una de ``threshold // 2`` cubetas."""
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    buckets = max(threshold // 2, 1)
+    edges = np.linspace(0, n, buckets + 1).astype(np.intp)
+    picked = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            chunk = y[start:end]
+            picked += [start + int(chunk.argmin()), start + int(chunk.argmax())]
+    return np.unique(np.array(picked, dtype=np.intp))
+
+
+def reduce_series(x, y, threshold, method="lttb"):
+    if method == "minmax":
+        index = minmax(x, y, threshold)
+    else:
+        index = lttb(x, y, threshold)
+    return x[index], y[index]
+
+
+def rollup_resolution(start, end, points):
+    """Resolución más gruesa con al menos ``points`` cubetas, o None si basta con los datos crudos."""
+    span = end - start
+    for resolution, step in sorted(RESOLUTIONS.items(), key=lambda item: item[1], reverse=True):
+        if span / step >= points:
+            return resolution
+    return None
+
+
+def _epoch(dates):
+    return np.array([d.timestamp() for d in dates], dtype=np.float64)
+
+
+def raw_series(sensor_id, start, end):
+    rows = (Data.objects.filter(sensor_id=sensor_id, date__gte=start, date__lt=end)
+            .order_by("date").values_list("date", "value"))
+    dates, values = zip(*rows) if rows else ((), ())
+    return _epoch(dates), np.array(values, dtype=np.float64)
+
+
+def rollup_series(sensor_id, start, end, resolution, method="lttb"):
+    """(x, y, cubiertos) a partir de los rollups; ``cubiertos`` es (inicio, fin) o None.
+
+    Con ``minmax`` cada cubeta aporta su mínimo y su máximo.
+    """
+    rows = (DataRollup.objects.filter(sensor_id=sensor_id, resolution=resolution,
+                                      bucket__gte=start, bucket__lt=end)
+            .order_by("bucket").values_list("bucket", "avg_value", "min_value", "max_value"))
+    if not rows:
+        return np.empty(0), np.empty(0), None
+    buckets, avg, low, high = zip(*rows)
+    step = RESOLUTIONS[resolution]
+    covered = (buckets[0], buckets[-1] + step)
+    x = _epoch(buckets)
+    if method == "minmax":
+        half = step.total_seconds() / 2
+        return (np.column_stack((x, x + half)).ravel(),
+                np.column_stack((low, high)).ravel().astype(np.float64), covered)
+    return x, np.array(avg, dtype=np.float64), covered
+
+
+def _share(points, part, total):
+    # Puntos de un tramo en proporción a su duración
+    return max(3, int(round(points * (part / total)))) if total else points
+
+
+def downsample(sensor_id, start, end, points=1000, method="lttb"):
+    """(source, x, y) con como mucho ~``points`` puntos.
+
+    ``source`` es ``raw``, la resolución (``1m``, ``1h``, ``1d``) o, si parte
+    del rango no tiene rollups, la resolución seguida de ``+raw``.
+    """
+    resolution = rollup_resolution(start, end, points)
+    covered = None
+    if resolution is not None:
+        x, y, covered = rollup_series(sensor_id, start, end, resolution, method)
+    if covered is None:
+        x, y = raw_series(sensor_id, start, end)
+        x, y = reduce_series(x, y, points, method)
+        return "raw", x, y
+
+    # Tramos sin rollups al principio o al final: se leen crudos
+    parts = [(covered[0], covered[1], x, y)]
+    if start < covered[0]:
+        parts.insert(0, (start, covered[0]) + raw_series(sensor_id, start, covered[0]))
+    if covered[1] < end:
+        parts.append((covered[1], end) + raw_series(sensor_id, covered[1], end))
+    raw_rows = sum(len(part[2]) for part in parts) - len(x)
+    total = (end - start).total_seconds()
+    xs, ys = [], []
+    for part_start, part_end, px, py in parts:
+        px, py = reduce_series(px, py, _share(points, (part_end - part_start).total_seconds(), total), method)
+        xs.append(px)
+        ys.append(py)
+    source = f"{resolution}+raw" if raw_rows else resolution
+    return source, np.concatenate(xs), np.concatenate(ys)
+
+
+def iso_dates(x):
+    """Segundos epoch -> ISO 8601 UTC con milisegundos."""
+    return np.datetime_as_string(np.round(x * 1000).astype("int64").astype("datetime64[ms]"),
+                                 unit="ms", timezone="UTC").tolist()
+
+
+def default_range(start, end, now):
+    end = end or now
+    return start or end - timedelta(days=7), end
@@ -0,0 +1,100 @@
+"""Exportación en streaming de lecturas (CSV y NDJSON).
+
+Las filas se leen con ``.iterator(chunk_size=...)`` (cursor de servidor en
+PostgreSQL) y se emiten por trozos, así que la memoria no depende del número
+de filas y la descarga empieza con el primer trozo. El CSV usa las mismas
+columnas que ``import_sensor_data`` (``sensor`` = mqtt_code).
+"""
+import csv
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+FIELDS = ("sensor", "value", "date", "fill")
+CHUNK_SIZE = 2000
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def filter_data(queryset, sensor_id=None, fill_id=None, date_from=None, date_to=None):
+    """Filtros comunes de la API y la exportación (índices sensor/fecha y llenado/sensor/fecha)."""
+    if sensor_id is not None:
+        queryset = queryset.filter(sensor_id=sensor_id)
+    if fill_id is not None:
+        queryset = queryset.filter(fill_id=fill_id)
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lt=date_to)
+    return queryset
+
+
+def export_rows(queryset, chunk_size=CHUNK_SIZE):
+    """(mqtt_code, value, date, fill_id) en orden de fecha con cursor de servidor."""
+    return (queryset.order_by("date", "id")
+            .values_list("sensor__mqtt_code", "value", "date", "fill_id")
+            .iterator(chunk_size=chunk_size))
+
+
+def _chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv(rows, chunk_size=CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    yield buffer.getvalue()
+    for chunk in _chunks(rows, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows((code, repr(value), date.isoformat(), "" if fill_id is None else fill_id)
+                         for code, value, date, fill_id in chunk)
+        yield buffer.getvalue()
+
+
+def iter_ndjson(rows, chunk_size=CHUNK_SIZE):
+    dumps = json.dumps
+    for chunk in _chunks(rows, chunk_size):
+        yield "".join(dumps({"sensor": code, "value": value, "date": date.isoformat(), "fill": fill_id}) + "\n"
+                      for code, value, date, fill_id in chunk)
+
+
+ENCODERS = {"csv": iter_csv, "ndjson": iter_ndjson}
+
+
+def iter_export(queryset, fmt="csv", chunk_size=CHUNK_SIZE):
+    return ENCODERS[fmt](export_rows(queryset, chunk_size), chunk_size)
+
+
+async def aiter_sync(iterator):
+    """Consume un iterador síncrono (con acceso a la BD) desde ASGI trozo a trozo.
+
+    Django consume de golpe los iteradores síncronos de ``StreamingHttpResponse``
+    bajo ASGI; así cada ``next`` corre en el hilo síncrono de la conexión.
+    """
+    iterator = iter(iterator)
+    step = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await step(iterator, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def stream_response(request, response):
+    """Bajo ASGI sirve el contenido síncrono de una respuesta en streaming con ``aiter_sync``."""
+    if isinstance(getattr(request, "_request", request), ASGIRequest):
+        response.streaming_content = aiter_sync(response.streaming_content)
+    return response
@@ -0,0 +1,85 @@
+"""Buffer de ingesta: agrupa mensajes MQTT y los escribe en Redis por lotes."""
+import threading
+import time
+
+from . import metrics, sensorStore
+
+
+class IngestBuffer:
+    """Acumula (topic, payload) y los envía a Redis en un único pipeline.
+
+    Se vacía cuando se alcanzan ``max_batch`` mensajes o cuando el mensaje
+    más antiguo lleva ``max_delay`` segundos esperando, lo que ocurra primero.
+    """
+
+    def __init__(self, client, max_batch=500, max_delay=0.02, history=30, on_flush=None):
+        self.client = client
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.history = history
+        self.on_flush = on_flush
+        self._pending = []
+        self._first_at = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def add(self, topic, payload):
+        with self._lock:
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.append((topic, payload, time.time()))
+            due = len(self._pending) >= self.max_batch
+        if due:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        with self._lock:
+            due = bool(self._pending) and time.monotonic() - self._first_at >= self.max_delay
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Escribe el lote pendiente en Redis. Devuelve el número de mensajes."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._first_at = None
+            if not batch:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                pipe = self.client.pipeline(transaction=False)
+                sensorStore.queue_batch(pipe, batch, self.history)
+                snapshot_us = pipe.execute()[-1]
+            except Exception as e:
+                metrics.incr("ingest.flush_errors")
+                metrics.incr("ingest.dropped_messages", len(batch))
+                print(f"Error writing batch to Redis: {e}")
+                return 0
+
+            metrics.incr("ingest.messages", len(batch))
+            metrics.incr("ingest.flushes")
+            metrics.observe("ingest.batch_size", len(batch))
+            metrics.observe("ingest.flush_ms", (time.perf_counter() - start) * 1000.0)
+            metrics.observe("ingest.snapshot_ms", snapshot_us / 1000.0)
+
+        if self.on_flush:
+            self.on_flush(batch)
+        return len(batch)
+
+    def start(self):
+        """Inicia un hilo que vacía el buffer por tiempo aunque no lleguen mensajes."""
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        self._thread = threading.Thread(target=self._run, daemon=True, name="dataSensor-ingest-flush")
+        self._thread.start()
+        return self._thread
+
+    def _run(self):
+        while True:
+            time.sleep(self.max_delay)
+            self.flush_if_due()
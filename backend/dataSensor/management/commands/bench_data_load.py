@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from dataSensor import bulkLoader
+from dataSensor.models import Data, MeasuredVariable, Sensor
+
+
+class Command(BaseCommand):
+    help = ("Compara filas/s de Data.objects.create, bulk_create y COPY. "
+            "Todo se ejecuta dentro de una transacción que se revierte.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        count = options["rows"]
+        methods = [
+            ("create", self._create),
+            ("bulk_create", bulkLoader.bulk_create_rows),
+        ]
+        if bulkLoader.supports_copy():
+            methods.append(("copy", bulkLoader.copy_rows))
+        else:
+            self.stdout.write(f"COPY no disponible en {connection.vendor}; se omite")
+
+        for name, load in methods:
+            with transaction.atomic():
+                variable = MeasuredVariable.objects.create(name="bench")
+                sensor = Sensor.objects.create(name="bench", mqtt_code="bench", measured_variable=variable,
+                                               min_range=0, max_range=100)
+                now = timezone.now()
+                rows = [(sensor.id, float(i % 100), now, None) for i in range(count)]
+                start = time.perf_counter()
+                load(rows)
+                elapsed = time.perf_counter() - start
+                transaction.set_rollback(True)
+            self.stdout.write(f"{name:12s} {count:>8d} filas  {elapsed:8.3f} s  {count / elapsed:12.0f} filas/s")
+
+    def _create(self, rows):
+        for sensor_id, value, date, fill_id in rows:
+            Data.objects.create(sensor_id=sensor_id, value=value, date=date, fill_id=fill_id)
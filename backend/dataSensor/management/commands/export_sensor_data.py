@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from dataSensor import exports
+from dataSensor.models import Data
+from dataSensor.views import parse_date_range
+
+
+class Command(BaseCommand):
+    help = ("Exporta lecturas en CSV (columnas de import_sensor_data) o NDJSON "
+            "sin cargarlas en memoria.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sensor", type=int)
+        parser.add_argument("--fill", type=int)
+        parser.add_argument("--from", dest="date_from", help="Inicio incluido (ISO 8601)")
+        parser.add_argument("--to", dest="date_to", help="Fin excluido (ISO 8601)")
+        parser.add_argument("--format", choices=sorted(exports.ENCODERS), default="csv")
+        parser.add_argument("--output", "-o", help="Fichero de salida (por defecto stdout)")
+        parser.add_argument("--chunk-size", type=int, default=exports.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            date_from, date_to = parse_date_range({"from": options["date_from"], "to": options["date_to"]})
+        except ValidationError as e:
+            raise CommandError(e.detail)
+        queryset = exports.filter_data(Data.objects.all(), options["sensor"], options["fill"], date_from, date_to)
+        chunks = exports.iter_export(queryset, options["format"], options["chunk_size"])
+        if not options["output"]:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        with open(options["output"], "w", newline="") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        self.stderr.write(f"Exportado a {options['output']}")
@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from dataSensor import partitions
+
+
+class Command(BaseCommand):
+    help = ("Crea las particiones mensuales futuras de dataSensor_data y separa o "
+            "borra las que superan la retención (solo PostgreSQL).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int, default=3)
+        parser.add_argument("--retention-months", type=int,
+                            default=getattr(settings, "SENSOR_DATA_RETENTION_MONTHS", 0),
+                            help="0 conserva todo el historial")
+        parser.add_argument("--detach", action="store_true",
+                            help="Separar las particiones vencidas en lugar de borrarlas")
+        parser.add_argument("--interval", type=float, default=0,
+                            help="Repetir cada N segundos (0 ejecuta una sola vez)")
+
+    def handle(self, *args, **options):
+        if not partitions.is_partitioned():
+            self.stdout.write("dataSensor_data no está particionada en este motor; nada que hacer")
+            return
+
+        while True:
+            try:
+                self.maintain(options)
+            except Exception as e:
+                if not options["interval"]:
+                    raise
+                self.stderr.write(f"Error maintaining partitions: {e}")
+            if not options["interval"]:
+                return
+            connections.close_all()
+            time.sleep(options["interval"])
+
+    def maintain(self, options):
+        today = timezone.now().date()
+        existing = set(partitions.existing_partitions())
+        # Meses futuros más los que hayan caído en DEFAULT, sin los ya vencidos
+        wanted = partitions.wanted_months(today, options["months_ahead"], options["retention_months"],
+                                          partitions.default_partition_months())
+        for month in wanted:
+            if partitions.partition_name(month) not in existing:
+                partitions.create_partition(month)
+                self.stdout.write(f"Creada {partitions.partition_name(month)}")
+
+        for name in partitions.expired(sorted(partitions.existing_partitions()), today,
+                                       options["retention_months"]):
+            partitions.drop_partition(name, detach_only=options["detach"])
+            self.stdout.write(f"{'Separada' if options['detach'] else 'Borrada'} {name}")
@@ -0,0 +1,65 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from dataSensor import rollups
+from dataSensor.models import Data, DataRollup
+
+
+class Command(BaseCommand):
+    help = ("Recalcula DataRollup (1 min / 1 h / 1 día) desde los datos crudos. "
+            "El rango se amplía a días completos.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", help="YYYY-MM-DD (por defecto, el primer dato)")
+        parser.add_argument("--to", dest="date_to", help="YYYY-MM-DD incluido (por defecto, hoy)")
+        parser.add_argument("--sensor", type=int, action="append", dest="sensors")
+        parser.add_argument("--chunk-size", type=int, default=20000)
+
+    def _day(self, value, default):
+        if not value:
+            return default
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Fecha inválida: {value}")
+        return day
+
+    def handle(self, *args, **options):
+        data = Data.objects.all()
+        if options["sensors"]:
+            data = data.filter(sensor_id__in=options["sensors"])
+        first = data.order_by("date").values_list("date", flat=True).first()
+        if first is None:
+            self.stdout.write("No hay datos")
+            return
+
+        day_from = self._day(options["date_from"], first.date())
+        day_to = self._day(options["date_to"], timezone.now().date())
+        start = datetime.combine(day_from, time.min, tzinfo=dt_timezone.utc)
+        end = datetime.combine(day_to + timedelta(days=1), time.min, tzinfo=dt_timezone.utc)
+
+        rows = (data.filter(date__gte=start, date__lt=end)
+                .order_by("date")
+                .values_list("sensor_id", "value", "date"))
+        with transaction.atomic():
+            existing = DataRollup.objects.filter(bucket__gte=start, bucket__lt=end)
+            if options["sensors"]:
+                existing = existing.filter(sensor_id__in=options["sensors"])
+            deleted, _ = existing.delete()
+
+            total, chunk = 0, []
+            for row in rows.iterator(chunk_size=options["chunk_size"]):
+                chunk.append(row)
+                if len(chunk) >= options["chunk_size"]:
+                    rollups.apply_rows(chunk)
+                    total += len(chunk)
+                    chunk = []
+            if chunk:
+                rollups.apply_rows(chunk)
+                total += len(chunk)
+
+        self.stdout.write(f"Borradas {deleted} cubetas; recalculadas desde {total} lecturas "
+                          f"({day_from} a {day_to})")
@@ -0,0 +1,65 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dataSensor import MqttSub, sharding
+
+
+class Command(BaseCommand):
+    help = "Ejecuta el subscriber MQTT asyncio (receive -> store -> broadcast/persist)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mqtt-host", default="mosquitto")
+        parser.add_argument("--mqtt-port", type=int, default=1883)
+        parser.add_argument("--batch-size", type=int, default=MqttSub.batch_size)
+        parser.add_argument("--flush-interval", type=float, default=MqttSub.flush_interval)
+        parser.add_argument("--reconnect-delay", type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        try:
+            asyncio.run(self.run(options))
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            # Sale con error para que docker reinicie el servicio
+            raise CommandError(f"Ingest pipeline stopped: {e!r}") from e
+
+    async def run(self, options):
+        import redis as syncredis
+        import redis.asyncio as aioredis
+        from dataSensor.sensorStore import rebuild_topic_registry
+        from dataSensor.asyncIngest import IngestPipeline
+        from dataSensor.views import save_time
+
+        # Topics creados antes de que existiera el registro
+        sync_redis = syncredis.Redis(host='redis', port=6379, db=0)
+        count = await asyncio.to_thread(rebuild_topic_registry, sync_redis)
+        sync_redis.close()
+        self.stdout.write(f"Registered {count} existing sensor topics")
+
+        redis = aioredis.Redis(host='redis', port=6379, db=0)
+        pipeline = IngestPipeline(
+            redis,
+            max_batch=options["batch_size"],
+            max_delay=options["flush_interval"],
+            history=MqttSub.history_length,
+            save_interval=save_time,
+        )
+        try:
+            await pipeline.run(self.consume(pipeline, options))
+        finally:
+            await redis.aclose()
+
+    async def consume(self, pipeline, options):
+        import aiomqtt
+
+        while True:
+            try:
+                async with aiomqtt.Client(options["mqtt_host"], options["mqtt_port"]) as client:
+                    topic = sharding.subscription_topic()
+                    await client.subscribe(topic)
+                    self.stdout.write(f"Suscrito a {topic} (todos los sensores)")
+                    await pipeline.receive(client.messages)
+            except aiomqtt.MqttError as e:
+                self.stderr.write(f"MQTT connection lost ({e}); reconnecting in {options['reconnect_delay']}s")
+                await asyncio.sleep(options["reconnect_delay"])
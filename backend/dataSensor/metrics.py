@@ -0,0 +1,50 @@
+"""Contadores y tiempos en memoria del proceso para el pipeline de sensores."""
+import threading
+import time
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_counters = {}
+_timings = {}
+
+
+def incr(name, amount=1):
+    """Incrementa un contador."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def observe(name, value):
+    """Registra una observación (tamaño de lote, latencia en ms, etc.)."""
+    with _lock:
+        stats = _timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+        stats["count"] += 1
+        stats["total"] += value
+        stats["last"] = value
+        if value > stats["max"]:
+            stats["max"] = value
+
+
+@contextmanager
+def timer(name):
+    """Mide en milisegundos el bloque envuelto y lo registra con observe()."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - start) * 1000.0)
+
+
+def snapshot():
+    """Devuelve una copia de contadores y observaciones (con promedio)."""
+    with _lock:
+        timings = {}
+        for name, stats in _timings.items():
+            timings[name] = dict(stats, avg=stats["total"] / stats["count"] if stats["count"] else 0.0)
+        return {"counters": dict(_counters), "timings": timings}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timings.clear()
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataSensor', '0003_data_fill'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='data',
+            name='date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations
+
+
+# Convierte dataSensor_data en una tabla particionada por rango mensual de
+# `date` (solo PostgreSQL). Las filas existentes quedan en la partición
+# DEFAULT; `manage_data_partitions` crea las particiones mensuales y las
+# mueve allí. En otros motores (SQLite en los tests) no hace nada.
+FORWARD_SQL = [
+    'ALTER TABLE "dataSensor_data" RENAME TO "dataSensor_data_unpartitioned"',
+    '''
+    CREATE TABLE "dataSensor_data" (
+        "id" bigint GENERATED BY DEFAULT AS IDENTITY,
+        "value" double precision NOT NULL,
+        "date" timestamp with time zone NOT NULL,
+        "fill_id" bigint NULL REFERENCES "Fill_fill" ("id") DEFERRABLE INITIALLY DEFERRED,
+        "sensor_id" bigint NOT NULL REFERENCES "dataSensor_sensor" ("id") DEFERRABLE INITIALLY DEFERRED,
+        PRIMARY KEY ("id", "date")
+    ) PARTITION BY RANGE ("date")
+    ''',
+    'CREATE INDEX "dataSensor_data_fill_id_part" ON "dataSensor_data" ("fill_id")',
+    'CREATE INDEX "dataSensor_data_sensor_id_part" ON "dataSensor_data" ("sensor_id")',
+    'CREATE TABLE "dataSensor_data_default" PARTITION OF "dataSensor_data" DEFAULT',
+    '''
+    INSERT INTO "dataSensor_data" ("id", "value", "date", "fill_id", "sensor_id")
+    SELECT "id", "value", "date", "fill_id", "sensor_id" FROM "dataSensor_data_unpartitioned"
+    ''',
+    '''
+    SELECT setval(pg_get_serial_sequence('"dataSensor_data"', 'id'),
+                  COALESCE((SELECT MAX("id") FROM "dataSensor_data"), 0) + 1, false)
+    ''',
+    'DROP TABLE "dataSensor_data_unpartitioned"',
+]
+
+
+def partition_data_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for statement in FORWARD_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataSensor', '0004_data_date_default'),
+        ('Fill', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_data_table, migrations.RunPython.noop),
+    ]
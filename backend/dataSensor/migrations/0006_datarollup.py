@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataSensor', '0005_partition_data_by_month'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('1m', '1 minuto'), ('1h', '1 hora'), ('1d', '1 día')], max_length=2)),
+                ('bucket', models.DateTimeField()),
+                ('count', models.IntegerField()),
+                ('sum_value', models.FloatField()),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('avg_value', models.FloatField()),
+                ('first_value', models.FloatField()),
+                ('first_date', models.DateTimeField()),
+                ('last_value', models.FloatField()),
+                ('last_date', models.DateTimeField()),
+                ('sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dataSensor.sensor')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('sensor', 'resolution', 'bucket'), name='unique_data_rollup_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Fill', '0001_initial'),
+        ('dataSensor', '0006_datarollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='data',
+            index=models.Index(fields=['sensor', 'date'], name='data_sensor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='data',
+            index=models.Index(fields=['fill', 'sensor', 'date'], name='data_fill_sensor_date_idx'),
+        ),
+    ]
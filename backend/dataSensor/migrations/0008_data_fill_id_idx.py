@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Fill', '0001_initial'),
+        ('dataSensor', '0007_data_time_range_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='data',
+            index=models.Index(fields=['fill', 'id'], name='data_fill_id_idx'),
+        ),
+    ]
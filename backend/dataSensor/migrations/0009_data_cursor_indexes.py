@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Fill', '0001_initial'),
+        ('dataSensor', '0008_data_fill_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='data',
+            index=models.Index(fields=['date', 'id'], name='data_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='data',
+            index=models.Index(fields=['fill', 'date', 'id'], name='data_fill_date_id_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from Fill.models import Fill
 
 class MeasuredVariable (models.Model):
@@ -18,5 +19,42 @@ class Sensor (models.Model):
 class Data (models.Model):
     sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE)
     value = models.FloatField()
-    date = models.DateTimeField(auto_now_add=True)
-    fill = models.ForeignKey(Fill, on_delete = models.CASCADE, null = True, blank = True)
\ No newline at end of file
+    date = models.DateTimeField(default=timezone.now)
+    fill = models.ForeignKey(Fill, on_delete = models.CASCADE, null = True, blank = True)
+
+    class Meta:
+        # Historial por sensor ordenado por fecha y por llenado/sensor
+        indexes = [
+            models.Index(fields=['sensor', 'date'], name='data_sensor_date_idx'),
+            models.Index(fields=['fill', 'sensor', 'date'], name='data_fill_sensor_date_idx'),
+            # Orden del cursor de /api/sensor-data/ (date, id) sin filtro y por llenado
+            models.Index(fields=['date', 'id'], name='data_date_id_idx'),
+            models.Index(fields=['fill', 'date', 'id'], name='data_fill_date_id_idx'),
+            # Última lectura de un llenado (clave de caché del libro Excel)
+            models.Index(fields=['fill', 'id'], name='data_fill_id_idx'),
+        ]
+
+class DataRollup (models.Model):
+    """Agregados de `Data` por sensor y cubeta de tiempo (1 min / 1 h / 1 día)."""
+    RESOLUTIONS = [
+        ('1m', '1 minuto'),
+        ('1h', '1 hora'),
+        ('1d', '1 día'),
+    ]
+    sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE)
+    resolution = models.CharField(max_length=2, choices=RESOLUTIONS)
+    bucket = models.DateTimeField()
+    count = models.IntegerField()
+    sum_value = models.FloatField()
+    min_value = models.FloatField()
+    max_value = models.FloatField()
+    avg_value = models.FloatField()
+    first_value = models.FloatField()
+    first_date = models.DateTimeField()
+    last_value = models.FloatField()
+    last_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['sensor', 'resolution', 'bucket'], name='unique_data_rollup_bucket'),
+        ]
@@ -0,0 +1,18 @@
+from rest_framework.pagination import CursorPagination
+
+
+class DataCursorPagination(CursorPagination):
+    """Paginación por keyset sobre (date, id): cada página es una consulta por
+    índice sin OFFSET, así que cuesta lo mismo al principio que al final."""
+    ordering = ('date', 'id')
+    page_size = 500
+    page_size_query_param = 'page_size'
+    max_page_size = 5000
+
+
+class RollupCursorPagination(CursorPagination):
+    """Cubetas de un sensor en orden de tiempo (índice único sensor/resolución/cubeta)."""
+    ordering = ('bucket',)
+    page_size = 1000
+    page_size_query_param = 'page_size'
+    max_page_size = 10000
@@ -0,0 +1,129 @@
+"""Particiones mensuales de ``dataSensor_data`` (solo PostgreSQL).
+
+La migración 0005 convierte la tabla en ``PARTITION BY RANGE (date)`` con una
+partición DEFAULT. Este módulo crea las particiones ``dataSensor_data_pYYYYMM``
+y separa o borra las que quedan fuera del periodo de retención; lo usa el
+comando ``manage_data_partitions``, que el servicio ``data_partitions`` de
+docker-compose ejecuta periódicamente (``--interval``) para que siempre haya
+particiones por delante de la fecha actual.
+"""
+import re
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from .models import Data
+
+PARENT = Data._meta.db_table
+DEFAULT_PARTITION = f"{PARENT}_default"
+_NAME_RE = re.compile(rf"^{re.escape(PARENT)}_p(\d{{4}})(\d{{2}})$")
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def partition_name(month):
+    return f"{PARENT}_p{month.year:04d}{month.month:02d}"
+
+
+def partition_month(name):
+    match = _NAME_RE.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def months_to_create(today, months_ahead):
+    """Meses desde el actual hasta ``months_ahead`` meses después (incluidos)."""
+    first = month_start(today)
+    return [add_months(first, i) for i in range(months_ahead + 1)]
+
+
+def retention_cutoff(today, retention_months):
+    """Primer mes que se conserva, o None si se conserva todo el historial."""
+    if not retention_months:
+        return None
+    return add_months(month_start(today), -retention_months)
+
+
+def wanted_months(today, months_ahead, retention_months, default_months=()):
+    """Meses futuros más los que tienen filas en DEFAULT, sin los ya vencidos.
+
+    Crear la partición de un mes vencido solo para borrarla a continuación
+    movería sus filas de DEFAULT sin motivo.
+    """
+    cutoff = retention_cutoff(today, retention_months)
+    months = set(months_to_create(today, months_ahead)) | set(default_months)
+    return sorted(month for month in months if cutoff is None or month >= cutoff)
+
+
+def expired(names, today, retention_months):
+    """Particiones cuyo mes completo es anterior a la ventana de retención."""
+    cutoff = retention_cutoff(today, retention_months)
+    if cutoff is None:
+        return []
+    return [name for name in names if (partition_month(name) or cutoff) < cutoff]
+
+
+def _bound(month):
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc).isoformat()
+
+
+def is_partitioned():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+                       "WHERE c.relname = %s", [PARENT])
+        return cursor.fetchone() is not None
+
+
+def existing_partitions():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT c.relname FROM pg_inherits i "
+                       "JOIN pg_class c ON c.oid = i.inhrelid "
+                       "JOIN pg_class p ON p.oid = i.inhparent "
+                       "WHERE p.relname = %s", [PARENT])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_partition(month):
+    """Crea la partición del mes moviendo las filas que hubieran caído en DEFAULT."""
+    qn = connection.ops.quote_name
+    start, end = _bound(month), _bound(add_months(month, 1))
+    parent, default, name = qn(PARENT), qn(DEFAULT_PARTITION), qn(partition_name(month))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SELECT 1 FROM {default} WHERE date >= %s AND date < %s LIMIT 1", [start, end])
+        has_rows = cursor.fetchone() is not None
+        if has_rows:
+            cursor.execute(f"ALTER TABLE {parent} DETACH PARTITION {default}")
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF {parent} FOR VALUES FROM (%s) TO (%s)", [start, end])
+        if has_rows:
+            cursor.execute(f"INSERT INTO {parent} SELECT * FROM {default} WHERE date >= %s AND date < %s",
+                           [start, end])
+            cursor.execute(f"DELETE FROM {default} WHERE date >= %s AND date < %s", [start, end])
+            cursor.execute(f"ALTER TABLE {parent} ATTACH PARTITION {default} DEFAULT")
+
+
+def default_partition_months():
+    """Meses que tienen filas en la partición DEFAULT."""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT date_trunc('month', date AT TIME ZONE 'UTC') "
+                       f"FROM {qn(DEFAULT_PARTITION)}")
+        return sorted(month_start(row[0]) for row in cursor.fetchall())
+
+
+def drop_partition(name, detach_only=False):
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if detach_only:
+            cursor.execute(f"ALTER TABLE {qn(PARENT)} DETACH PARTITION {qn(name)}")
+        else:
+            cursor.execute(f"DROP TABLE {qn(name)}")
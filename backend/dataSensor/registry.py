@@ -0,0 +1,109 @@
+"""Caché en memoria de los metadatos que usan ingesta y persistencia.
+
+Mapea ``mqtt_code`` a los datos del sensor (id, rangos, última calibración) y
+guarda el llenado activo, para que el camino caliente no consulte Postgres.
+
+Se invalida localmente con las señales ``post_save``/``post_delete`` de
+``Sensor``, ``Fill`` y ``Calibration`` (ver ``signals.py``); al confirmarse la
+transacción se incrementa una versión en Redis que el resto de procesos
+comprueba como mucho una vez cada ``check_interval`` segundos.
+"""
+import threading
+import time
+from collections import namedtuple
+
+import redis
+
+from . import metrics
+
+redis_client = redis.Redis(host='redis', port=6379, db=0)
+VERSION_KEY = "dataSensor:registry-version"
+
+SensorInfo = namedtuple(
+    "SensorInfo",
+    "id mqtt_code name measured_variable_id min_range max_range calibration_id",
+)
+# Lo cargado en una misma recarga; se sustituye entero para que un lector
+# nunca vea los sensores de una carga y el llenado de otra (o None tras invalidate)
+Snapshot = namedtuple("Snapshot", "sensors active_fill_id version")
+
+
+class SensorRegistry:
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._checked_at = 0.0
+
+    def _remote_version(self):
+        try:
+            return int(redis_client.get(VERSION_KEY) or 0)
+        except Exception as e:
+            print(f"Error reading registry version: {e}")
+            snapshot = self._snapshot
+            return snapshot.version if snapshot else None
+
+    def _ensure_fresh(self):
+        """Snapshot vigente, recargándolo si la versión en Redis ha cambiado."""
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at < self.check_interval:
+            return snapshot
+        version = self._remote_version()
+        self._checked_at = now
+        if snapshot is not None and version == snapshot.version:
+            return snapshot
+        return self._load(version)
+
+    def _load(self, version):
+        from calibrations.models import Calibration
+        from Fill.models import Fill
+        from .models import Sensor
+
+        # Última calibración por sensor (Calibration.sensorId es numérico)
+        calibrations = {}
+        for sensor_id, calibration_id in Calibration.objects.order_by("date", "id").values_list("sensorId", "id"):
+            calibrations[int(sensor_id)] = calibration_id
+
+        sensors = {}
+        rows = Sensor.objects.values_list("id", "mqtt_code", "name", "measured_variable_id", "min_range", "max_range")
+        for sensor_id, mqtt_code, name, variable_id, min_range, max_range in rows:
+            sensors[mqtt_code] = SensorInfo(sensor_id, mqtt_code, name, variable_id, min_range, max_range,
+                                            calibrations.get(sensor_id))
+        active_fill_id = Fill.objects.filter(last_day=None).values_list("id", flat=True).first()
+
+        snapshot = Snapshot(sensors, active_fill_id, version)
+        with self._lock:
+            self._snapshot = snapshot
+        metrics.incr("registry.reloads")
+        return snapshot
+
+    def sensors(self):
+        """{mqtt_code: SensorInfo} de todos los sensores."""
+        return self._ensure_fresh().sensors
+
+    def sensor(self, mqtt_code):
+        return self.sensors().get(mqtt_code)
+
+    def active_fill_id(self):
+        """Id del llenado abierto (``last_day`` nulo) o None."""
+        return self._ensure_fresh().active_fill_id
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+
+def bump_version():
+    """Avisa al resto de procesos que recarguen el registro."""
+    try:
+        redis_client.incr(VERSION_KEY)
+    except Exception as e:
+        print(f"Error bumping registry version: {e}")
+
+
+_registry = SensorRegistry()
+
+
+def get_registry():
+    return _registry
@@ -0,0 +1,44 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+from . import columnar
+
+
+class StreamRenderer(BaseRenderer):
+    """Negocia el formato (``Accept`` o ``?format=``) de respuestas que la vista
+    ya devuelve como ``StreamingHttpResponse``; solo renderiza los errores."""
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Los errores (400, 404...) salen como JSON, no con el tipo del formato pedido
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return json.dumps(data).encode(self.charset)
+
+
+class CSVRenderer(StreamRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(StreamRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class ColumnarRenderer(BaseRenderer):
+    """Listados como columnas binarias (ver ``columnar``); la vista entrega un ``Frame``."""
+    media_type = columnar.MEDIA_TYPE
+    format = 'columns'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, columnar.Frame):
+            return data.encode()
+        # Errores en JSON, igual que StreamRenderer
+        return StreamRenderer().render(data, accepted_media_type, renderer_context)
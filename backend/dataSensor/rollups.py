@@ -0,0 +1,169 @@
+"""Mantenimiento incremental de ``DataRollup``.
+
+El persistidor llama a ``apply_rows`` con las filas que acaba de insertar; se
+agregan en memoria por (sensor, resolución, cubeta) y se fusionan con las
+cubetas existentes. En PostgreSQL es un único ``INSERT ... ON CONFLICT DO
+UPDATE`` por lote (la suma la hace la base de datos, atómica aunque varias
+réplicas toquen la misma cubeta). En otros motores (SQLite en los tests) se
+leen las cubetas con ``select_for_update`` y se actualizan con ``bulk_update``.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, connection, transaction
+
+from .models import DataRollup
+
+RESOLUTIONS = {
+    "1m": timedelta(minutes=1),
+    "1h": timedelta(hours=1),
+    "1d": timedelta(days=1),
+}
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def bucket_start(date, resolution):
+    step = RESOLUTIONS[resolution]
+    return _EPOCH + ((date - _EPOCH) // step) * step
+
+
+class Aggregate:
+    __slots__ = ("count", "sum_value", "min_value", "max_value",
+                 "first_value", "first_date", "last_value", "last_date")
+
+    def __init__(self, value, date):
+        self.count = 1
+        self.sum_value = self.min_value = self.max_value = value
+        self.first_value = self.last_value = value
+        self.first_date = self.last_date = date
+
+    def add(self, value, date):
+        self.count += 1
+        self.sum_value += value
+        self.min_value = min(self.min_value, value)
+        self.max_value = max(self.max_value, value)
+        if date < self.first_date:
+            self.first_value, self.first_date = value, date
+        if date >= self.last_date:
+            self.last_value, self.last_date = value, date
+
+    def merge_into(self, rollup):
+        """Suma este agregado a una fila ``DataRollup`` existente."""
+        rollup.count += self.count
+        rollup.sum_value += self.sum_value
+        rollup.min_value = min(rollup.min_value, self.min_value)
+        rollup.max_value = max(rollup.max_value, self.max_value)
+        rollup.avg_value = rollup.sum_value / rollup.count
+        if self.first_date < rollup.first_date:
+            rollup.first_value, rollup.first_date = self.first_value, self.first_date
+        if self.last_date >= rollup.last_date:
+            rollup.last_value, rollup.last_date = self.last_value, self.last_date
+
+    def to_rollup(self, sensor_id, resolution, bucket):
+        return DataRollup(
+            sensor_id=sensor_id, resolution=resolution, bucket=bucket,
+            count=self.count, sum_value=self.sum_value,
+            min_value=self.min_value, max_value=self.max_value,
+            avg_value=self.sum_value / self.count,
+            first_value=self.first_value, first_date=self.first_date,
+            last_value=self.last_value, last_date=self.last_date,
+        )
+
+
+def aggregate(rows):
+    """{(sensor_id, resolution, bucket): Aggregate} a partir de (sensor_id, value, date, ...)."""
+    buckets = {}
+    for sensor_id, value, date, *_rest in rows:
+        for resolution in RESOLUTIONS:
+            key = (sensor_id, resolution, bucket_start(date, resolution))
+            agg = buckets.get(key)
+            if agg is None:
+                buckets[key] = Aggregate(value, date)
+            else:
+                agg.add(value, date)
+    return buckets
+
+
+UPSERT_COLUMNS = ("sensor_id", "resolution", "bucket", "count", "sum_value", "min_value", "max_value",
+                  "avg_value", "first_value", "first_date", "last_value", "last_date")
+UPSERT_BATCH = 2000  # filas por sentencia (12 parámetros por fila)
+UPSERT_SET = """
+    count = t.count + EXCLUDED.count,
+    sum_value = t.sum_value + EXCLUDED.sum_value,
+    min_value = LEAST(t.min_value, EXCLUDED.min_value),
+    max_value = GREATEST(t.max_value, EXCLUDED.max_value),
+    avg_value = (t.sum_value + EXCLUDED.sum_value) / (t.count + EXCLUDED.count),
+    first_value = CASE WHEN EXCLUDED.first_date < t.first_date THEN EXCLUDED.first_value ELSE t.first_value END,
+    first_date = LEAST(t.first_date, EXCLUDED.first_date),
+    last_value = CASE WHEN EXCLUDED.last_date >= t.last_date THEN EXCLUDED.last_value ELSE t.last_value END,
+    last_date = GREATEST(t.last_date, EXCLUDED.last_date)
+"""
+
+
+def upsert_sql(rows):
+    """INSERT ... ON CONFLICT (sensor_id, resolution, bucket) DO UPDATE para ``rows`` filas."""
+    qn = connection.ops.quote_name
+    columns = ", ".join(qn(column) for column in UPSERT_COLUMNS)
+    values = ", ".join(["(" + ", ".join(["%s"] * len(UPSERT_COLUMNS)) + ")"] * rows)
+    return (f"INSERT INTO {qn(DataRollup._meta.db_table)} AS t ({columns}) VALUES {values} "
+            f"ON CONFLICT (sensor_id, resolution, bucket) DO UPDATE SET {UPSERT_SET}")
+
+
+def _upsert(buckets):
+    # Orden fijo de claves: dos réplicas bloquean las cubetas en el mismo orden
+    items = sorted(buckets.items())
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(items), UPSERT_BATCH):
+            chunk = items[start:start + UPSERT_BATCH]
+            params = []
+            for (sensor_id, resolution, bucket), agg in chunk:
+                params += [sensor_id, resolution, bucket, agg.count, agg.sum_value, agg.min_value,
+                           agg.max_value, agg.sum_value / agg.count, agg.first_value, agg.first_date,
+                           agg.last_value, agg.last_date]
+            cursor.execute(upsert_sql(len(chunk)), params)
+
+
+def _merge(buckets):
+    with transaction.atomic():
+        existing = {}
+        for resolution in RESOLUTIONS:
+            keys = [key for key in buckets if key[1] == resolution]
+            if not keys:
+                continue
+            rollups = DataRollup.objects.select_for_update().filter(
+                resolution=resolution,
+                sensor_id__in={key[0] for key in keys},
+                bucket__in={key[2] for key in keys},
+            )
+            for rollup in rollups:
+                existing[(rollup.sensor_id, rollup.resolution, rollup.bucket)] = rollup
+
+        to_update, to_create = [], []
+        for key, agg in buckets.items():
+            rollup = existing.get(key)
+            if rollup is None:
+                to_create.append(agg.to_rollup(*key))
+            else:
+                agg.merge_into(rollup)
+                to_update.append(rollup)
+        if to_update:
+            DataRollup.objects.bulk_update(to_update, [
+                "count", "sum_value", "min_value", "max_value", "avg_value",
+                "first_value", "first_date", "last_value", "last_date",
+            ])
+        DataRollup.objects.bulk_create(to_create)
+
+
+def apply_rows(rows):
+    """Actualiza las cubetas de 1 min, 1 h y 1 día con las filas nuevas."""
+    buckets = aggregate(rows)
+    if not buckets:
+        return 0
+    if connection.vendor == "postgresql":
+        _upsert(buckets)
+        return len(buckets)
+    try:
+        _merge(buckets)
+    except IntegrityError:
+        # Otra réplica creó una de las cubetas a la vez; ahora ya existe
+        _merge(buckets)
+    return len(buckets)
@@ -0,0 +1,190 @@
+"""Estructura de las lecturas de sensores en Redis.
+
+* ``Biogestor/<mqtt_code>``: lista con las últimas ``history`` lecturas (WebSocket).
+* ``dataSensor:topics``: set con los topics activos, para leer todos los
+  historiales sin ``KEYS``.
+* ``dataSensor:stream``: en modo ``stream``, un Redis Stream con todas las
+  lecturas (campos ``topic``, ``value``, ``ts``), acotado con MAXLEN
+  aproximado, del que el persistidor lee con un consumer group.
+* ``dataSensor:delta-seqs``: hash ``{origen: seq}`` con el último número de
+  secuencia de los frames delta (protocolo WebSocket v2) de cada proceso que
+  difunde. Cada réplica numera sus propios frames, porque los envía de forma
+  independiente y un contador común no garantizaría el orden de llegada.
+  Los campos ``<origen>|<topic>`` numeran los frames de un solo topic, que
+  reciben los clientes suscritos a topics concretos.
+* ``dataSensor:snapshot``: JSON ``{topic: [valores]}`` con el historial de
+  todos los topics (el último valor es el más reciente), listo para enviar.
+  Lo mantiene la ingesta con ``UPDATE_SNAPSHOT_LUA`` en el mismo pipeline que
+  cada lote, así que al conectar o difundir basta un ``GET``.
+
+Las funciones ``queue_*`` solo encolan comandos en un pipeline, así que sirven
+tanto para ``redis.Redis`` como para ``redis.asyncio.Redis``.
+"""
+import json
+import os
+import socket
+
+from django.conf import settings
+
+STREAM_KEY = "dataSensor:stream"
+STREAM_GROUP = "dataSensor-persist"
+DELTA_SEQ_KEY = "dataSensor:delta-seqs"
+TOPICS_KEY = "dataSensor:topics"
+SNAPSHOT_KEY = "dataSensor:snapshot"
+
+# Devuelve [topic1, historial1, topic2, historial2, ...] en una sola llamada
+READ_HISTORIES_LUA = """
+local out = {}
+for _, topic in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    local values = redis.call('LRANGE', topic, 0, -1)
+    if #values > 0 then
+        out[#out + 1] = topic
+        out[#out + 1] = values
+    end
+end
+return out
+"""
+
+# Actualiza en el snapshot los topics de ARGV (o lo rehace entero si no
+# existe) y devuelve los microsegundos que ha tardado
+UPDATE_SNAPSHOT_LUA = """
+local started = redis.call('TIME')
+local blob = redis.call('GET', KEYS[1])
+local snapshot = {}
+local topics = ARGV
+if blob then
+    snapshot = cjson.decode(blob)
+else
+    topics = redis.call('SMEMBERS', KEYS[2])
+end
+for _, topic in ipairs(topics) do
+    local values = redis.call('LRANGE', topic, 0, -1)
+    if #values > 0 then
+        snapshot[topic] = values
+    end
+end
+redis.call('SET', KEYS[1], cjson.encode(snapshot))
+local finished = redis.call('TIME')
+return (finished[1] - started[1]) * 1000000 + (finished[2] - started[2])
+"""
+
+
+def stream_mode():
+    return getattr(settings, "SENSOR_BUFFER_MODE", "list") == "stream"
+
+
+def consumer_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def topic_seq_field(source, topic):
+    return f"{source}|{topic}"
+
+
+def parse_delta_seqs(reply, topics=None):
+    """{origen: seq} de los frames completos a partir del ``HGETALL`` de las secuencias.
+
+    Con ``topics`` devuelve {origen: {topic: seq}} de los frames de esos topics.
+    """
+    seqs = {}
+    for field, seq in reply.items():
+        source, _sep, topic = field.decode().partition("|")
+        if topics is None and not topic:
+            seqs[source] = int(seq)
+        elif topics is not None and topic in topics:
+            seqs.setdefault(source, {})[topic] = int(seq)
+    return seqs
+
+
+def queue_batch(pipe, batch, history=30):
+    """Encola en ``pipe`` la escritura de un lote de (topic, payload, ts).
+
+    El último comando actualiza el snapshot; su respuesta es el tiempo que
+    tardó en microsegundos.
+    """
+    stream = stream_mode()
+    maxlen = getattr(settings, "SENSOR_STREAM_MAXLEN", 100000)
+    for topic, payload, ts in batch:
+        pipe.rpush(topic, payload)
+        if stream:
+            pipe.xadd(STREAM_KEY, {"topic": topic, "value": payload, "ts": repr(ts)},
+                      maxlen=maxlen, approximate=True)
+    # Un solo LTRIM por topic aunque el lote traiga varios mensajes
+    topics = list(dict.fromkeys(topic for topic, _p, _ts in batch))
+    for topic in topics:
+        pipe.ltrim(topic, -history, -1)
+    pipe.sadd(TOPICS_KEY, *topics)
+    # EVAL y no un Script registrado: el Script de redis.asyncio es una
+    # corrutina y aquí solo se encolan comandos
+    pipe.eval(UPDATE_SNAPSHOT_LUA, 2, SNAPSHOT_KEY, TOPICS_KEY, *topics)
+    return pipe
+
+
+def parse_histories(reply):
+    """Convierte la respuesta de READ_HISTORIES_LUA en {topic: [valores]}."""
+    data = {}
+    for topic, values in zip(reply[::2], reply[1::2]):
+        data[topic.decode()] = [v.decode() for v in values]
+    return data
+
+
+def read_histories(client):
+    """Historial de todos los topics registrados en un solo round trip."""
+    return parse_histories(client.register_script(READ_HISTORIES_LUA)(keys=[TOPICS_KEY]))
+
+
+async def aread_histories(client):
+    """``read_histories`` con un cliente ``redis.asyncio``."""
+    return parse_histories(await client.register_script(READ_HISTORIES_LUA)(keys=[TOPICS_KEY]))
+
+
+def read_snapshot(client):
+    """Snapshot JSON (``str``) de todos los topics en un ``GET``.
+
+    Si aún no existe (ninguna ingesta desde el despliegue) se arma con los
+    historiales.
+    """
+    blob = client.get(SNAPSHOT_KEY)
+    if blob is None:
+        return json.dumps(read_histories(client))
+    return blob.decode()
+
+
+async def aread_snapshot(client, seqs=False):
+    """``read_snapshot`` con un cliente ``redis.asyncio``.
+
+    Con ``seqs`` devuelve (snapshot, respuesta de ``HGETALL`` de las
+    secuencias) leídos en el mismo round trip; las secuencias se leen antes
+    para que un delta posterior pueda repetir lecturas del snapshot, pero
+    nunca falte ninguna.
+    """
+    pipe = client.pipeline(transaction=False)
+    if seqs:
+        pipe.hgetall(DELTA_SEQ_KEY)
+    pipe.get(SNAPSHOT_KEY)
+    *raw_seqs, blob = await pipe.execute()
+    if blob is None:
+        blob = json.dumps(await aread_histories(client))
+    else:
+        blob = blob.decode()
+    return (blob, raw_seqs[0]) if seqs else blob
+
+
+def rebuild_topic_registry(client, pattern="Biogestor/*"):
+    """Registra los topics que ya existían antes del registro (SCAN, no KEYS)."""
+    topics = [key for key in client.scan_iter(match=pattern, count=1000, _type="list")]
+    if topics:
+        client.sadd(TOPICS_KEY, *topics)
+        # El próximo lote lo rehace con todos los topics registrados
+        client.delete(SNAPSHOT_KEY)
+    return len(topics)
+
+
+def ensure_group(client):
+    """Crea el consumer group del stream si no existe."""
+    import redis
+    try:
+        client.xgroup_create(STREAM_KEY, STREAM_GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from Fill.serializers import FillSerializer
-from Fill.models import Fill
-from .models import MeasuredVariable, Sensor, Data
+from .registry import get_registry
+from .models import MeasuredVariable, Sensor, Data, DataRollup
 
 class MeasuredVariableSerializer(serializers.ModelSerializer):
     class Meta:
@@ -30,9 +30,35 @@ class DataSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
 
-        actual_fill = Fill.objects.filter(last_day=None).first()
+        actual_fill_id = get_registry().active_fill_id()
 
-        if actual_fill:
-            validated_data['fill'] = actual_fill
+        if actual_fill_id:
+            validated_data['fill_id'] = actual_fill_id
 
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+class DataFlatSerializer(serializers.ModelSerializer):
+    """Lectura plana (ids en vez de objetos anidados).
+
+    ``expand`` (``sensor``, ``fill``) añade los objetos completos; la vista debe
+    hacer el ``select_related`` correspondiente.
+    """
+    EXPANDABLE = {
+        'sensor': lambda: SensorSerializer(read_only=True),
+        'fill': lambda: FillSerializer(read_only=True),
+    }
+
+    class Meta:
+        model = Data
+        fields = ('id', 'sensor_id', 'value', 'date', 'fill_id')
+
+    def __init__(self, *args, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in expand:
+            self.fields[name] = self.EXPANDABLE[name]()
+
+class DataRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DataRollup
+        fields = ('id', 'sensor', 'resolution', 'bucket', 'count', 'min_value', 'max_value', 'avg_value',
+                  'first_value', 'first_date', 'last_value', 'last_date')
@@ -0,0 +1,67 @@
+"""Reparto de topics y de la persistencia entre réplicas del subscriber MQTT.
+
+Dos modos, según ``settings``:
+
+* ``MQTT_SHARE_GROUP``: suscripción compartida ``$share/<grupo>/Biogestor/#``.
+  El broker entrega cada mensaje a una sola réplica, así que Redis se escribe
+  una vez. Como cualquier réplica puede recibir cualquier topic, la lectura
+  que se guarda en la DB se reclama por sensor y por ventana de guardado
+  (``SET NX``) para que solo una réplica cree la fila ``Data``.
+* ``INGEST_REPLICAS`` > 1 sin grupo: todas las réplicas reciben todo y cada
+  una procesa solo los topics con ``crc32(topic) % INGEST_REPLICAS`` igual a
+  su ``INGEST_REPLICA_INDEX``; los conjuntos son disjuntos y no hace falta
+  reclamar nada.
+"""
+import time
+import zlib
+
+from django.conf import settings
+
+TOPIC_FILTER = "Biogestor/#"
+CLAIM_PREFIX = "dataSensor:persist-claim:"
+
+
+def share_group():
+    return getattr(settings, "MQTT_SHARE_GROUP", "")
+
+
+def replicas():
+    return max(1, getattr(settings, "INGEST_REPLICAS", 1))
+
+
+def replica_index():
+    return getattr(settings, "INGEST_REPLICA_INDEX", 0)
+
+
+def subscription_topic():
+    group = share_group()
+    if group:
+        return f"$share/{group}/{TOPIC_FILTER}"
+    return TOPIC_FILTER
+
+
+def replica_for(topic, count):
+    return zlib.crc32(topic.encode()) % count
+
+
+def owns_topic(topic):
+    """True si esta réplica debe procesar ``topic`` (siempre en modo compartido)."""
+    if share_group() or replicas() == 1:
+        return True
+    return replica_for(topic, replicas()) == replica_index()
+
+
+def claim_persistence(client, codes, interval):
+    """Reclama la ventana de guardado actual para cada mqtt_code.
+
+    Devuelve el subconjunto de ``codes`` que esta réplica debe persistir. Sin
+    suscripción compartida devuelve ``codes`` sin tocar Redis.
+    """
+    codes = list(codes)
+    if not share_group() or not codes:
+        return set(codes)
+    window = int(time.time() // interval)
+    pipe = client.pipeline(transaction=False)
+    for code in codes:
+        pipe.set(f"{CLAIM_PREFIX}{code}:{window}", 1, nx=True, ex=max(1, int(interval * 2)))
+    return {code for code, won in zip(codes, pipe.execute()) if won}
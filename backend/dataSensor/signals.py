@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from calibrations.models import Calibration
+from Fill.models import Fill
+from . import watermark
+from .models import Data, Sensor
+from .registry import bump_version, get_registry
+
+
+@receiver([post_save, post_delete], sender=Sensor)
+@receiver([post_save, post_delete], sender=Fill)
+@receiver([post_save, post_delete], sender=Calibration)
+def invalidate_sensor_registry(sender, **kwargs):
+    get_registry().invalidate()
+    # Los demás procesos recargan cuando el cambio ya es visible
+    transaction.on_commit(bump_version)
+
+
+@receiver([post_save, post_delete], sender=Data)
+def bump_data_watermark(sender, **kwargs):
+    # Altas y cambios por la API pueden tocar cualquier fecha
+    transaction.on_commit(watermark.bump)
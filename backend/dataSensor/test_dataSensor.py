@@ -2,7 +2,24 @@ from django.test import TestCase
 from .models import Sensor, Data, MeasuredVariable
 import redis
 import json
-from unittest.mock import patch
+from unittest.mock import call, patch
+
+def make_sensor(code="sensorA", name=None):
+	"""Sensor de prueba (rango 0-100) de la variable compartida "Temp"."""
+	from datetime import date
+	mv, _ = MeasuredVariable.objects.get_or_create(name="Temp")
+	return Sensor.objects.create(name=name or code, mqtt_code=code, measured_variable=mv,
+								 suscription_date=date.today(), min_range=0.0, max_range=100.0)
+
+class RegistryIsolationMixin:
+	"""Registro de sensores vacío y versión en Redis simulada en cada test."""
+	def setUp(self):
+		super().setUp()
+		from .registry import get_registry
+		patcher = patch('dataSensor.registry.redis_client')
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		get_registry().invalidate()
 
 class SensorModelTest(TestCase):
 	def test_create_sensor(self):
@@ -19,6 +36,40 @@ class SensorModelTest(TestCase):
 		self.assertEqual(sensor.name, "SensorA")
 		self.assertEqual(sensor.mqtt_code, "sensorA")
 
+class CachedCatalogTest(RegistryIsolationMixin, TestCase):
+	def setUp(self):
+		from django.core.cache import cache
+		super().setUp()
+		cache.clear()
+		self.sensor = make_sensor()
+
+	def _get(self, url='/api/sensors/', **headers):
+		from rest_framework.test import APIClient
+		return APIClient().get(url, **headers)
+
+	def test_repeat_load_is_served_from_cache(self):
+		first = self._get()
+		self.assertEqual(first.status_code, 200)
+		with self.assertNumQueries(0):
+			second = self._get()
+		self.assertEqual(second.json(), first.json())
+		self.assertEqual(second['ETag'], first['ETag'])
+		with self.assertNumQueries(0):
+			self.assertEqual(self._get(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+			self.assertEqual(self._get(HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+		self.assertEqual(self._get(f'/api/sensors/{self.sensor.id}/').json()['mqtt_code'], 'sensorA')
+
+	def test_nested_model_change_invalidates(self):
+		first = self._get()
+		with self.captureOnCommitCallbacks(execute=True):
+			MeasuredVariable.objects.filter(name="Temp").first().save()
+		changed = self._get(HTTP_IF_NONE_MATCH=first['ETag'])
+		self.assertEqual(changed.status_code, 200)
+		self.assertNotEqual(changed['ETag'], first['ETag'])
+		with self.captureOnCommitCallbacks(execute=True):
+			make_sensor("sensorB")
+		self.assertEqual(len(self._get().json()), 2)
+
 class DataModelTest(TestCase):
 	def test_create_data(self):
 		from datetime import date
@@ -53,18 +104,63 @@ class RedisCacheTest(TestCase):
 		self.assertEqual([v.decode() for v in values], ['12.3', '13.4'])
 
 class MQTTProcessingTest(TestCase):
-	@patch('dataSensor.websocketService.send_sensors_data')
-	@patch('redis.Redis')
-	def test_on_message_processing(self, mock_redis, mock_send):
-		from .MqttSub import on_message
-		mock_instance = mock_redis.return_value
-		mock_instance.rpush.return_value = None
-		mock_instance.ltrim.return_value = None
+	def test_on_message_processing(self):
+		from . import MqttSub
 		msg = type('msg', (), {'topic': 'Biogestor/sensorA', 'payload': b'15.6'})
-		on_message(None, None, msg)
-		mock_instance.rpush.assert_called_with('Biogestor/sensorA', b'15.6')
-		mock_instance.ltrim.assert_called_with('Biogestor/sensorA', -30, -1)
-		mock_send.assert_called()
+		with patch.object(MqttSub, 'ingest_buffer') as mock_buffer:
+			MqttSub.on_message(None, None, msg)
+		mock_buffer.add.assert_called_with('Biogestor/sensorA', b'15.6')
+
+class IngestBufferTest(TestCase):
+	def setUp(self):
+		from . import metrics
+		metrics.reset()
+
+	def test_flush_on_batch_size_uses_single_pipeline(self):
+		from unittest.mock import MagicMock
+		from .ingestBuffer import IngestBuffer
+		from . import metrics, sensorStore
+		client = MagicMock()
+		client.pipeline.return_value.execute.return_value = [1, 2, 1, True, True, 1, 250]
+		flushed = []
+		buffer = IngestBuffer(client, max_batch=3, max_delay=60, history=30, on_flush=flushed.append)
+
+		buffer.add('Biogestor/sensorA', b'1.0')
+		buffer.add('Biogestor/sensorB', b'2.0')
+		client.pipeline.assert_not_called()
+		buffer.add('Biogestor/sensorA', b'3.0')
+
+		client.pipeline.assert_called_once_with(transaction=False)
+		pipe = client.pipeline.return_value
+		self.assertEqual(pipe.rpush.call_count, 3)
+		pipe.rpush.assert_any_call('Biogestor/sensorA', b'3.0')
+		# Un LTRIM por topic, no por mensaje
+		self.assertEqual(pipe.ltrim.call_count, 2)
+		pipe.ltrim.assert_any_call('Biogestor/sensorA', -30, -1)
+		# El snapshot se actualiza en el mismo pipeline, con los topics del lote
+		self.assertEqual(pipe.eval.call_args.args[1:], (2, sensorStore.SNAPSHOT_KEY, sensorStore.TOPICS_KEY,
+														 'Biogestor/sensorA', 'Biogestor/sensorB'))
+		pipe.execute.assert_called_once()
+		self.assertEqual(len(flushed), 1)
+		self.assertEqual([t for t, _p, _ts in flushed[0]], ['Biogestor/sensorA', 'Biogestor/sensorB', 'Biogestor/sensorA'])
+
+		stats = metrics.snapshot()
+		self.assertEqual(stats['counters']['ingest.messages'], 3)
+		self.assertEqual(stats['timings']['ingest.batch_size']['last'], 3)
+		self.assertIn('ingest.flush_ms', stats['timings'])
+		self.assertEqual(stats['timings']['ingest.snapshot_ms']['last'], 0.25)
+
+	def test_flush_on_time_limit(self):
+		from unittest.mock import MagicMock
+		from .ingestBuffer import IngestBuffer
+		client = MagicMock()
+		client.pipeline.return_value.execute.return_value = [1, 1, 1, 40]
+		buffer = IngestBuffer(client, max_batch=500, max_delay=0.0)
+
+		buffer.add('Biogestor/sensorA', b'1.0')
+
+		client.pipeline.return_value.execute.assert_called_once()
+		self.assertEqual(buffer.flush(), 0)
 
 class WebSocketServiceTest(TestCase):
 	@patch('channels.layers.get_channel_layer')
@@ -80,25 +176,15 @@ class WebSocketServiceTest(TestCase):
 		mock_channel_layer.return_value.group_send = async_mock
 		send_sensors_data()
 
-class SaveDataProcessTest(TestCase):
+class SaveDataProcessTest(RegistryIsolationMixin, TestCase):
 	@patch('dataSensor.views.redis_client')
 	def test_save_data_iteration(self, mock_redis_client):
 		from dataSensor.views import save_data_iteration
-		from datetime import date
-		mv = MeasuredVariable.objects.create(name="Temp")
-		s1 = Sensor.objects.create(name="S1", mqtt_code="sensorA", measured_variable=mv,
-								   suscription_date=date.today(), min_range=0.0, max_range=100.0)
-		s2 = Sensor.objects.create(name="S2", mqtt_code="sensorB", measured_variable=mv,
-								   suscription_date=date.today(), min_range=0.0, max_range=100.0)
-
-		def lindex_side_effect(key, idx):
-			if key == f"Biogestor/{s1.mqtt_code}":
-				return b"12.5"
-			if key == f"Biogestor/{s2.mqtt_code}":
-				return b"8.75"
-			return None
+		s1 = make_sensor("sensorA", name="S1")
+		s2 = make_sensor("sensorB", name="S2")
 
-		mock_redis_client.lindex.side_effect = lindex_side_effect
+		# Un solo pipeline con un LINDEX por sensor
+		mock_redis_client.pipeline.return_value.execute.return_value = [b"12.5", b"8.75"]
 
 		save_data_iteration()
 
@@ -106,6 +192,32 @@ class SaveDataProcessTest(TestCase):
 		self.assertEqual(Data.objects.filter(sensor=s2).count(), 1)
 		self.assertAlmostEqual(Data.objects.filter(sensor=s1).first().value, 12.5)
 		self.assertAlmostEqual(Data.objects.filter(sensor=s2).first().value, 8.75)
+		pipe = mock_redis_client.pipeline.return_value
+		pipe.lindex.assert_any_call(f"Biogestor/{s1.mqtt_code}", -1)
+		pipe.execute.assert_called_once()
+		mock_redis_client.lindex.assert_not_called()
+
+	@patch('dataSensor.views.redis_client')
+	def test_save_data_iteration_bulk_inserts_with_active_fill(self, mock_redis_client):
+		from dataSensor.views import save_data_iteration
+		from dataSensor import metrics
+		from Fill.models import Fill
+		from django.db import connection
+		from django.test.utils import CaptureQueriesContext
+		metrics.reset()
+		for i in range(5):
+			make_sensor(f"sensor{i}", name=f"S{i}")
+		fill = Fill.objects.create(filling_mass=1, approx_density=1, added_watter=1, type_material=1,
+								   filling_moisture=1, delay_time=1)
+		mock_redis_client.pipeline.return_value.execute.return_value = [b"1.0", None, b"bad", b"4.0", b"5.0"]
+
+		with CaptureQueriesContext(connection) as queries:
+			self.assertEqual(save_data_iteration(), 3)
+
+		inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "dataSensor_data" ')]
+		self.assertEqual(len(inserts), 1)
+		self.assertEqual(Data.objects.filter(fill=fill).count(), 3)
+		self.assertIn('persist.tick_ms', metrics.snapshot()['timings'])
 
 class WebSocketServiceMultiSensorsTest(TestCase):
 	@patch('dataSensor.websocketService.redis_client')
@@ -113,17 +225,11 @@ class WebSocketServiceMultiSensorsTest(TestCase):
 		from dataSensor.websocketService import send_sensors_data
 		import asyncio, json
 
-		# Mock redis client with two sensors
-		mock_redis_client.keys.return_value = [b'Biogestor/sensorA', b'Biogestor/sensorB']
-
-		def lrange_side_effect(key, start, end):
-			if key == b'Biogestor/sensorA':
-				return [b'10.1', b'10.2']
-			if key == b'Biogestor/sensorB':
-				return [b'20.1', b'20.2']
-			return []
-
-		mock_redis_client.lrange.side_effect = lrange_side_effect
+		# Mock redis client with two sensors (snapshot mantenido por la ingesta)
+		mock_redis_client.get.return_value = json.dumps({
+			'Biogestor/sensorA': ['10.1', '10.2'],
+			'Biogestor/sensorB': ['20.1', '20.2'],
+		}).encode()
 
 		# Capture group_send payload by patching channel_layer directly
 		from dataSensor import websocketService as ws
@@ -147,3 +253,1235 @@ class WebSocketServiceMultiSensorsTest(TestCase):
 		self.assertIn('Biogestor/sensorB', data)
 		self.assertEqual(data['Biogestor/sensorA'], ['10.1', '10.2'])
 		self.assertEqual(data['Biogestor/sensorB'], ['20.1', '20.2'])
+		mock_redis_client.keys.assert_not_called()
+		mock_redis_client.get.assert_called_once_with('dataSensor:snapshot')
+
+class AsyncIngestPipelineTest(RegistryIsolationMixin, TestCase):
+	def _redis(self):
+		from unittest.mock import MagicMock, AsyncMock
+		redis = MagicMock()
+		redis.pipeline.return_value.execute = AsyncMock(return_value=[1, 1, 1, 40])
+		return redis
+
+	def test_store_once_writes_batch_and_forwards(self):
+		import asyncio
+		from .asyncIngest import IngestPipeline
+
+		async def scenario():
+			redis = self._redis()
+			pipeline = IngestPipeline(redis, max_batch=10, max_delay=0)
+			await pipeline.store_queue.put(('Biogestor/sensorA', b'1.0', 0.0))
+			await pipeline.store_queue.put(('Biogestor/sensorA', b'2.0', 0.0))
+			batch = await pipeline.store_once()
+			return redis, pipeline, batch
+
+		redis, pipeline, batch = asyncio.run(scenario())
+		pipe = redis.pipeline.return_value
+		self.assertEqual(pipe.rpush.call_count, 2)
+		pipe.ltrim.assert_called_once_with('Biogestor/sensorA', -30, -1)
+		self.assertEqual(len(batch), 2)
+		self.assertEqual(pipeline.broadcast_queue.qsize(), 1)
+		self.assertEqual(pipeline.persist_queue.qsize(), 1)
+
+	def test_full_broadcast_queue_marks_broadcaster_directly(self):
+		import asyncio
+		from .asyncIngest import IngestPipeline
+		from . import metrics
+		metrics.reset()
+
+		async def scenario():
+			pipeline = IngestPipeline(self._redis(), max_batch=10, max_delay=0, broadcast_queue_size=1)
+			for value in (b'1', b'2'):
+				await pipeline.store_queue.put(('Biogestor/sensorA', value, 0.0))
+				await pipeline.store_once()
+			return pipeline
+
+		pipeline = asyncio.run(scenario())
+		self.assertEqual(pipeline.broadcast_queue.qsize(), 1)
+		self.assertEqual(pipeline.persist_queue.qsize(), 2)
+		self.assertEqual(metrics.snapshot()['counters']['ingest.broadcast_direct_batches'], 1)
+		# El segundo lote no se pierde: queda pendiente en el broadcaster
+		self.assertEqual(pipeline.broadcaster._samples, [('Biogestor/sensorA', b'2', 0.0)])
+
+	def test_failing_stage_stops_pipeline(self):
+		import asyncio
+		from unittest.mock import patch
+		from .asyncIngest import IngestPipeline
+		from . import metrics
+		metrics.reset()
+
+		async def scenario():
+			pipeline = IngestPipeline(self._redis(), max_batch=10, max_delay=0)
+			receive = asyncio.Event()
+			with patch.object(pipeline, 'store_once', side_effect=RuntimeError('boom')):
+				await pipeline.store_queue.put(('Biogestor/sensorA', b'1', 0.0))
+				await pipeline.run(receive.wait())
+
+		with self.assertRaises(ExceptionGroup) as caught:
+			asyncio.run(scenario())
+		self.assertIsInstance(caught.exception.exceptions[0], RuntimeError)
+		self.assertEqual(metrics.snapshot()['counters']['ingest.stage_failures'], 1)
+
+	def test_save_latest_values(self):
+		from dataSensor.views import save_latest_values
+		sensor = make_sensor("sensorA", name="S1")
+		save_latest_values({'Biogestor/sensorA': b'21.5', 'Biogestor/unknown': b'1.0'})
+		self.assertEqual(Data.objects.count(), 1)
+		self.assertAlmostEqual(Data.objects.get(sensor=sensor).value, 21.5)
+
+class ShardingTest(RegistryIsolationMixin, TestCase):
+	def test_subscription_topic(self):
+		from django.test import override_settings
+		from . import sharding
+		with override_settings(MQTT_SHARE_GROUP=''):
+			self.assertEqual(sharding.subscription_topic(), 'Biogestor/#')
+		with override_settings(MQTT_SHARE_GROUP='ingest'):
+			self.assertEqual(sharding.subscription_topic(), '$share/ingest/Biogestor/#')
+
+	def test_topic_hashing_partitions_topics(self):
+		from django.test import override_settings
+		from . import sharding
+		topics = [f'Biogestor/sensor{i}' for i in range(50)]
+		owners = []
+		for index in range(3):
+			with override_settings(MQTT_SHARE_GROUP='', INGEST_REPLICAS=3, INGEST_REPLICA_INDEX=index):
+				owners.append({t for t in topics if sharding.owns_topic(t)})
+		# Cada topic pertenece exactamente a una réplica
+		self.assertEqual(sum(len(o) for o in owners), len(topics))
+		self.assertEqual(set().union(*owners), set(topics))
+
+	def test_shared_subscription_claims_each_sensor_once(self):
+		from django.test import override_settings
+		from unittest.mock import MagicMock
+		from . import sharding
+		client = MagicMock()
+		client.pipeline.return_value.execute.return_value = [True, None]
+		with override_settings(MQTT_SHARE_GROUP='ingest'):
+			claimed = sharding.claim_persistence(client, ['sensorA', 'sensorB'], 5)
+		self.assertEqual(claimed, {'sensorA'})
+		self.assertEqual(client.pipeline.return_value.set.call_count, 2)
+		_args, kwargs = client.pipeline.return_value.set.call_args
+		self.assertTrue(kwargs['nx'])
+
+	@patch('dataSensor.views.redis_client')
+	def test_save_data_iteration_skips_sensors_claimed_elsewhere(self, mock_redis_client):
+		from django.test import override_settings
+		from dataSensor.views import save_data_iteration
+		s1 = make_sensor("sensorA", name="S1")
+		make_sensor("sensorB", name="S2")
+		# Primero el SET NX de las reclamaciones, luego los LINDEX
+		mock_redis_client.pipeline.return_value.execute.side_effect = [[True, None], [b"3.5"]]
+		with override_settings(MQTT_SHARE_GROUP='ingest'):
+			save_data_iteration()
+		self.assertEqual(list(Data.objects.values_list('sensor_id', flat=True)), [s1.id])
+
+class StreamBufferTest(RegistryIsolationMixin, TestCase):
+	def test_queue_batch_adds_to_stream_in_stream_mode(self):
+		from django.test import override_settings
+		from unittest.mock import MagicMock
+		from . import sensorStore
+		pipe = MagicMock()
+		with override_settings(SENSOR_BUFFER_MODE='stream', SENSOR_STREAM_MAXLEN=1000):
+			sensorStore.queue_batch(pipe, [('Biogestor/sensorA', b'1.5', 1700000000.25)])
+		pipe.rpush.assert_called_once_with('Biogestor/sensorA', b'1.5')
+		args, kwargs = pipe.xadd.call_args
+		self.assertEqual(args[0], sensorStore.STREAM_KEY)
+		self.assertEqual(args[1]['topic'], 'Biogestor/sensorA')
+		self.assertEqual(kwargs, {'maxlen': 1000, 'approximate': True})
+
+	def test_queue_batch_list_mode_has_no_stream(self):
+		from unittest.mock import MagicMock
+		from . import sensorStore
+		pipe = MagicMock()
+		sensorStore.queue_batch(pipe, [('Biogestor/sensorA', b'1.5', 0.0)])
+		pipe.xadd.assert_not_called()
+
+	def _entries(self):
+		return [
+			(b'1-0', {b'topic': b'Biogestor/sensorA', b'value': b'10.5', b'ts': b'1700000000.0'}),
+			(b'2-0', {b'topic': b'Biogestor/sensorA', b'value': b'11.5', b'ts': b'1700000001.0'}),
+			(b'3-0', {b'topic': b'Biogestor/unknown', b'value': b'1.0', b'ts': b'1700000001.0'}),
+			(b'4-0', None),
+		]
+
+	@patch('dataSensor.views.redis_client')
+	def test_save_stream_iteration_persists_every_sample_then_acks(self, mock_redis_client):
+		from dataSensor.views import save_stream_iteration
+		from dataSensor import sensorStore
+		sensor = make_sensor()
+		mock_redis_client.xautoclaim.return_value = [b'0-0', [], []]
+		mock_redis_client.xreadgroup.side_effect = lambda group, consumer, streams, **kw: (
+			[[sensorStore.STREAM_KEY.encode(), self._entries()]] if streams[sensorStore.STREAM_KEY] == '>' else [])
+
+		self.assertEqual(save_stream_iteration(block_ms=0), 2)
+
+		values = list(Data.objects.filter(sensor=sensor).order_by('date').values_list('value', flat=True))
+		self.assertEqual(values, [10.5, 11.5])
+		self.assertEqual(Data.objects.first().date.timestamp(), 1700000000.0)
+		mock_redis_client.xack.assert_called_once_with(
+			sensorStore.STREAM_KEY, sensorStore.STREAM_GROUP, b'1-0', b'2-0', b'3-0', b'4-0')
+
+	@patch('dataSensor.views.redis_client')
+	def test_save_stream_iteration_does_not_ack_on_db_error(self, mock_redis_client):
+		from dataSensor.views import save_stream_iteration
+		make_sensor()
+		mock_redis_client.xautoclaim.return_value = [b'0-0', self._entries(), []]
+		with patch('dataSensor.views.load_rows', side_effect=RuntimeError('db down')):
+			with self.assertRaises(RuntimeError):
+				save_stream_iteration(block_ms=0)
+		mock_redis_client.xack.assert_not_called()
+
+	@patch('dataSensor.views.redis_client')
+	def test_save_stream_iteration_recreates_lost_group(self, mock_redis_client):
+		from dataSensor.views import save_stream_iteration
+		make_sensor()
+		mock_redis_client.xautoclaim.side_effect = [
+			redis.ResponseError("NOGROUP No such key 'dataSensor:stream' or consumer group"),
+			[b'0-0', self._entries(), []],
+		]
+		with patch('dataSensor.views._stream_group_ready', True):
+			self.assertEqual(save_stream_iteration(block_ms=0), 2)
+		mock_redis_client.xgroup_create.assert_called_once()
+		mock_redis_client.xack.assert_called_once()
+
+	def test_save_thread_survives_errors_and_backs_off(self):
+		from django.test import override_settings
+		from dataSensor import views
+
+		class Stop(BaseException):
+			pass
+
+		with override_settings(SENSOR_BUFFER_MODE='stream'), \
+				patch('dataSensor.views.save_stream_iteration', side_effect=[RuntimeError('db down'), 1, Stop()]) as save, \
+				patch('dataSensor.views.time.sleep') as sleep:
+			with self.assertRaises(Stop):
+				views.save_data_process()
+		self.assertEqual(save.call_count, 3)
+		sleep.assert_called_once_with(views.save_time)
+
+class SensorBroadcasterTest(TestCase):
+	def test_coalesces_batches_into_one_frame_per_tick(self):
+		from .websocketService import SensorBroadcaster
+		sent = []
+		broadcaster = SensorBroadcaster(rate=4, send=lambda topics, samples: sent.append(topics))
+		broadcaster.mark_dirty([('Biogestor/sensorA', b'1', 0.0), ('Biogestor/sensorB', b'2', 0.0)])
+		broadcaster.mark_dirty([('Biogestor/sensorA', b'3', 0.0)])
+
+		self.assertEqual(broadcaster.flush(), 2)
+		self.assertEqual(sent, [{'Biogestor/sensorA', 'Biogestor/sensorB'}])
+		# Sin cambios nuevos no se envía nada
+		self.assertEqual(broadcaster.flush(), 0)
+		self.assertEqual(len(sent), 1)
+
+	@patch('dataSensor.websocketService.redis_client')
+	def test_send_topics_data_only_sends_dirty_topics(self, mock_redis_client):
+		from dataSensor import websocketService as ws
+		# Cuerpo con "\/" como lo codifica cjson en Redis
+		mock_redis_client.get.return_value = b'{"Biogestor\\/sensorA":["10.1","10.2"],"Biogestor\\/sensorB":["1"]}'
+		sent = []
+		async def group_send_mock(group, message):
+			sent.append((group, json.loads(message['text'])))
+
+		with patch.object(ws.channel_layer, 'group_send', group_send_mock):
+			ws.send_topics_data({'Biogestor/sensorA'})
+
+		# Un solo GET del snapshot, sin leer las listas
+		mock_redis_client.get.assert_called_once_with('dataSensor:snapshot')
+		mock_redis_client.pipeline.assert_not_called()
+		# Un frame para los clientes sin suscripción y otro para los suscritos al topic
+		history = {'Biogestor/sensorA': ['10.1', '10.2']}
+		self.assertEqual(sent, [('sensors_data', history), ('sensors.v1.sensorA', history)])
+
+	def test_ingest_flush_marks_topics_dirty(self):
+		from . import MqttSub
+		with patch('dataSensor.websocketService.get_broadcaster') as mock_get:
+			MqttSub.send_ws_update([('Biogestor/sensorA', b'1', 0.0)])
+		mock_get.return_value.mark_dirty.assert_called_once_with([('Biogestor/sensorA', b'1', 0.0)])
+
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+def mock_snapshot(client, snapshot, seqs=None):
+	"""Simula el pipeline de ``aread_snapshot``: HGETALL de las secuencias (si se pide) y GET."""
+	from unittest.mock import MagicMock
+	def pipeline(transaction=True):
+		pipe = MagicMock()
+		async def execute():
+			return ([seqs or {}] if pipe.hgetall.called else []) + [json.dumps(snapshot).encode()]
+		pipe.execute = execute
+		return pipe
+	client.pipeline = MagicMock(side_effect=pipeline)
+
+class DeltaProtocolTest(TestCase):
+	@patch('dataSensor.websocketService.redis_client')
+	def test_send_delta_frame_carries_sequence_and_new_samples(self, mock_redis_client):
+		from dataSensor import websocketService as ws
+		from dataSensor import sensorStore
+		pipe = mock_redis_client.pipeline.return_value
+		pipe.execute.return_value = [7, 3]
+		sent = []
+		async def group_send_mock(group, message):
+			sent.append((group, json.loads(message['text'])))
+
+		with patch.object(ws.channel_layer, 'group_send', group_send_mock), \
+			 patch.object(sensorStore, 'consumer_name', return_value='ingest-1'):
+			ws.send_delta_frame([('Biogestor/sensorA', b'10.5', 1700000000.1234), ('Biogestor/sensorB', b'nan?', 0.0)])
+
+		# Cada proceso numera sus frames en su propio campo del hash, y los de cada topic aparte
+		self.assertEqual(pipe.hincrby.call_args_list, [
+			call(sensorStore.DELTA_SEQ_KEY, 'ingest-1', 1),
+			call(sensorStore.DELTA_SEQ_KEY, 'ingest-1|Biogestor/sensorA', 1)])
+		samples = [['Biogestor/sensorA', 10.5, 1700000000.123]]
+		self.assertEqual(sent, [
+			('sensors_delta', {'type': 'delta', 'source': 'ingest-1', 'seq': 7, 'samples': samples}),
+			('sensors.v2.sensorA', {'type': 'delta', 'source': 'ingest-1', 'topic': 'Biogestor/sensorA',
+									'seq': 3, 'samples': samples})])
+
+	@patch('dataSensor.consumers.redis_client')
+	def test_v2_client_gets_snapshot_then_deltas_and_can_resync(self, mock_redis_client):
+		import asyncio
+		from django.test import override_settings
+		from channels.testing import WebsocketCommunicator
+		from channels.layers import get_channel_layer
+		from .consumers import dataSensorConsumer
+		mock_snapshot(mock_redis_client, {'Biogestor/sensorA': ['10.1', '10.2']}, {b'ingest-1': b'41', b'ingest-2': b'7'})
+
+		async def scenario():
+			communicator = WebsocketCommunicator(dataSensorConsumer.as_asgi(), '/ws/dataSensor/?v=2')
+			connected, _ = await communicator.connect()
+			self.assertTrue(connected)
+			snapshot = await communicator.receive_json_from()
+			self.assertEqual(snapshot, {'type': 'snapshot', 'seq': {'ingest-1': 41, 'ingest-2': 7},
+										'data': {'Biogestor/sensorA': ['10.1', '10.2']}})
+
+			delta = json.dumps({'type': 'delta', 'source': 'ingest-1', 'seq': 42,
+								'samples': [['Biogestor/sensorA', 10.3, 1.0]]})
+			await get_channel_layer().group_send('sensors_delta', {'type': 'send_data', 'text': delta})
+			self.assertEqual(await communicator.receive_from(), delta)
+
+			await communicator.send_json_to({'action': 'resync'})
+			self.assertEqual((await communicator.receive_json_from())['type'], 'snapshot')
+			await communicator.disconnect()
+
+		with override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS):
+			asyncio.run(scenario())
+
+	@patch('dataSensor.consumers.redis_client')
+	def test_v1_client_keeps_plain_history_frames(self, mock_redis_client):
+		import asyncio
+		from django.test import override_settings
+		from channels.testing import WebsocketCommunicator
+		from .consumers import dataSensorConsumer
+		mock_snapshot(mock_redis_client, {'Biogestor/sensorA': ['10.1']})
+
+		async def scenario():
+			communicator = WebsocketCommunicator(dataSensorConsumer.as_asgi(), '/ws/dataSensor/')
+			await communicator.connect()
+			self.assertEqual(await communicator.receive_json_from(), {'Biogestor/sensorA': ['10.1']})
+			await communicator.disconnect()
+
+		with override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS):
+			asyncio.run(scenario())
+
+	@patch('dataSensor.consumers.redis_client')
+	def test_many_sockets_share_one_event_loop(self, mock_redis_client):
+		import asyncio
+		import threading
+		from django.test import override_settings
+		from channels.testing import WebsocketCommunicator
+		from channels.layers import get_channel_layer
+		from .consumers import dataSensorConsumer
+		mock_snapshot(mock_redis_client, {'Biogestor/sensorA': ['1']})
+
+		async def scenario():
+			sockets = [WebsocketCommunicator(dataSensorConsumer.as_asgi(), '/ws/dataSensor/') for _ in range(200)]
+			threads = threading.active_count()
+			await asyncio.gather(*(socket.connect() for socket in sockets))
+			await asyncio.gather(*(socket.receive_from() for socket in sockets))
+			# Conectar no reserva un hilo por socket
+			self.assertLessEqual(threading.active_count(), threads + 1)
+			await get_channel_layer().group_send('sensors_data', {'type': 'send_data', 'text': '{}'})
+			self.assertEqual(set(await asyncio.gather(*(socket.receive_from() for socket in sockets))), {'{}'})
+			await asyncio.gather(*(socket.disconnect() for socket in sockets))
+
+		with override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS):
+			asyncio.run(scenario())
+
+class SlowClientTest(TestCase):
+	"""Cliente cuyo socket no acepta frames mientras ``gate`` está cerrado."""
+
+	def run_slow_client(self, scenario, **ws_settings):
+		import asyncio
+		from django.test import override_settings
+		from channels.testing import WebsocketCommunicator
+		from .consumers import dataSensorConsumer
+
+		class SlowConsumer(dataSensorConsumer):
+			async def send(self, *args, **kwargs):
+				await gate.wait()
+				await super().send(*args, **kwargs)
+
+		async def run():
+			nonlocal gate
+			gate = asyncio.Event()
+			gate.set()
+			communicator = WebsocketCommunicator(SlowConsumer.as_asgi(), '/ws/dataSensor/')
+			await communicator.connect()
+			self.assertEqual(await communicator.receive_json_from(), {'Biogestor/sensorA': ['1']})
+			gate.clear()
+			await scenario(communicator, gate)
+			await communicator.disconnect()
+
+		gate = None
+		with patch('dataSensor.consumers.redis_client') as mock_redis_client, \
+			 override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, **ws_settings):
+			mock_snapshot(mock_redis_client, {'Biogestor/sensorA': ['1']})
+			asyncio.run(run())
+
+	async def broadcast(self, frames):
+		from channels.layers import get_channel_layer
+		for frame in frames:
+			await get_channel_layer().group_send('sensors_data', {'type': 'send_data', 'text': frame})
+
+	def test_drop_oldest_keeps_newest_frames_and_counts_drops(self):
+		from .consumers import connection_stats
+		async def scenario(communicator, gate):
+			await self.broadcast(['1', '2', '3', '4', '5'])
+			# Los eventos se atienden aunque el socket siga bloqueado
+			self.assertTrue(await communicator.receive_nothing())
+			# El 1 ya estaba en el socket; de la cola (2 frames) se pierden 2 y 3
+			self.assertEqual([stats['dropped'] for stats in connection_stats()], [2])
+			gate.set()
+			self.assertEqual([await communicator.receive_from() for _ in range(3)], ['1', '4', '5'])
+
+		self.run_slow_client(scenario, WS_SEND_QUEUE=2, WS_SEND_OVERFLOW='drop_oldest', WS_SLOW_MAX_OVERFLOWS=10)
+
+	def test_coalesce_replaces_pending_frames_with_snapshot(self):
+		from . import metrics
+		metrics.reset()
+		async def scenario(communicator, gate):
+			await self.broadcast(['1', '2', '3', '4'])
+			self.assertTrue(await communicator.receive_nothing())
+			gate.set()
+			self.assertEqual(await communicator.receive_from(), '1')
+			self.assertEqual(await communicator.receive_json_from(), {'Biogestor/sensorA': ['1']})
+			self.assertEqual(await communicator.receive_from(), '4')
+			self.assertTrue(await communicator.receive_nothing())
+
+		self.run_slow_client(scenario, WS_SEND_QUEUE=2, WS_SLOW_MAX_OVERFLOWS=10)
+		self.assertEqual(metrics.snapshot()['counters']['ws.dropped_frames'], 2)
+
+	def test_chronically_slow_client_is_disconnected(self):
+		from . import metrics
+		from .consumers import SLOW_CLOSE_CODE, connection_stats
+		metrics.reset()
+		async def scenario(communicator, gate):
+			await self.broadcast([str(n) for n in range(6)])
+			self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': SLOW_CLOSE_CODE})
+
+		self.run_slow_client(scenario, WS_SEND_QUEUE=1, WS_SEND_OVERFLOW='drop_oldest', WS_SLOW_MAX_OVERFLOWS=3)
+		self.assertEqual(metrics.snapshot()['counters']['ws.slow_disconnects'], 1)
+		self.assertEqual(connection_stats(), [])
+
+class TopicSubscriptionTest(TestCase):
+	def test_topic_group_names_are_valid_and_distinct(self):
+		from .websocketService import topic_group
+		self.assertEqual(topic_group(1, 'Biogestor/sensorA'), 'sensors.v1.sensorA')
+		odd = [topic_group(2, 'Biogestor/tanque 1/pH'), topic_group(2, 'Biogestor/tanque_1/pH'), topic_group(2, 'x' * 200)]
+		for group in odd:
+			self.assertRegex(group, r'^[0-9A-Za-z._-]{1,99}$')
+		self.assertEqual(len(set(odd)), 3)
+
+	@patch('dataSensor.consumers.redis_client')
+	def test_subscribed_client_gets_only_matching_topics(self, mock_redis_client):
+		import asyncio
+		from unittest.mock import AsyncMock
+		from django.test import override_settings
+		from channels.testing import WebsocketCommunicator
+		from channels.layers import get_channel_layer
+		from .consumers import dataSensorConsumer
+		from .websocketService import TOPICS_GROUP, topic_group
+		mock_snapshot(mock_redis_client, {'Biogestor/tempA': ['30'], 'Biogestor/phA': ['7']},
+					  {b'ingest-1': b'41', b'ingest-1|Biogestor/tempA': b'5', b'ingest-1|Biogestor/phA': b'9'})
+		mock_redis_client.smembers = AsyncMock(return_value={b'Biogestor/tempA', b'Biogestor/phA'})
+
+		async def scenario():
+			layer = get_channel_layer()
+			communicator = WebsocketCommunicator(dataSensorConsumer.as_asgi(), '/ws/dataSensor/?v=2')
+			await communicator.connect()
+			self.assertEqual((await communicator.receive_json_from())['seq'], {'ingest-1': 41})
+
+			await communicator.send_json_to({'action': 'subscribe', 'topics': ['Biogestor/temp*']})
+			self.assertEqual(await communicator.receive_json_from(), {
+				'type': 'subscribed', 'patterns': ['Biogestor/temp*'], 'topics': ['Biogestor/tempA']})
+			# Snapshot solo de los topics suscritos, con su seq por topic
+			self.assertEqual(await communicator.receive_json_from(), {
+				'type': 'snapshot', 'seq': {'ingest-1': {'Biogestor/tempA': 5}}, 'data': {'Biogestor/tempA': ['30']}})
+
+			# Ya no recibe el frame común ni los de otros topics
+			await layer.group_send('sensors_delta', {'type': 'send_data', 'text': 'all'})
+			await layer.group_send(topic_group(2, 'Biogestor/phA'), {'type': 'send_data', 'text': 'ph'})
+			await layer.group_send(topic_group(2, 'Biogestor/tempA'), {'type': 'send_data', 'text': 'temp'})
+			self.assertEqual(await communicator.receive_from(), 'temp')
+
+			# Un topic nuevo que coincide con el patrón se añade al anunciarse
+			await layer.group_send(TOPICS_GROUP, {'type': 'topic_added', 'text': 'Biogestor/tempB'})
+			await layer.group_send(TOPICS_GROUP, {'type': 'topic_added', 'text': 'Biogestor/phB'})
+			self.assertTrue(await communicator.receive_nothing())
+			await layer.group_send(topic_group(2, 'Biogestor/phB'), {'type': 'send_data', 'text': 'phB'})
+			await layer.group_send(topic_group(2, 'Biogestor/tempB'), {'type': 'send_data', 'text': 'tempB'})
+			self.assertEqual(await communicator.receive_from(), 'tempB')
+
+			await communicator.send_json_to({'action': 'unsubscribe', 'topics': ['Biogestor/temp*']})
+			self.assertEqual(await communicator.receive_json_from(), {'type': 'subscribed', 'patterns': [], 'topics': []})
+			await layer.group_send(topic_group(2, 'Biogestor/tempA'), {'type': 'send_data', 'text': 'temp'})
+			self.assertTrue(await communicator.receive_nothing())
+			await communicator.disconnect()
+
+		with override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS):
+			asyncio.run(scenario())
+
+	@patch('dataSensor.websocketService.redis_client')
+	def test_broadcast_encodes_msgpack_once_with_float_values(self, mock_redis_client):
+		import msgpack
+		from dataSensor import websocketService as ws
+		mock_redis_client.get.return_value = b'{"Biogestor/sensorA":["10.1","err"]}'
+		events = []
+		async def group_send_mock(group, message):
+			events.append(message)
+
+		with patch.object(ws.channel_layer, 'group_send', group_send_mock), \
+			 patch.object(ws, 'pack', wraps=ws.pack) as pack:
+			ws.send_topics_data({'Biogestor/sensorA'})
+
+		# Un frame por grupo, no por cliente; el JSON sigue con los valores como texto
+		self.assertEqual(pack.call_count, 2)
+		self.assertEqual(json.loads(events[0]['text']), {'Biogestor/sensorA': ['10.1', 'err']})
+		self.assertEqual(msgpack.unpackb(events[0]['bytes']), {'Biogestor/sensorA': [10.1, None]})
+
+	@patch('dataSensor.consumers.redis_client')
+	def test_binary_client_negotiates_msgpack(self, mock_redis_client):
+		import asyncio
+		import msgpack
+		from django.test import override_settings
+		from channels.testing import WebsocketCommunicator
+		from channels.layers import get_channel_layer
+		from .consumers import dataSensorConsumer
+		mock_snapshot(mock_redis_client, {'Biogestor/sensorA': ['10.1']}, {b'ingest-1': b'41'})
+
+		async def scenario():
+			communicator = WebsocketCommunicator(dataSensorConsumer.as_asgi(), '/ws/dataSensor/?v=2',
+												 subprotocols=['biogestor.msgpack'])
+			connected, subprotocol = await communicator.connect()
+			self.assertEqual(subprotocol, 'biogestor.msgpack')
+			self.assertEqual(msgpack.unpackb(await communicator.receive_from()), {
+				'type': 'snapshot', 'seq': {'ingest-1': 41}, 'data': {'Biogestor/sensorA': [10.1]}})
+
+			# Se reenvían los bytes del evento tal cual
+			await get_channel_layer().group_send('sensors_delta', {'type': 'send_data', 'text': '{}', 'bytes': b'\x80'})
+			self.assertEqual(await communicator.receive_from(), b'\x80')
+			await communicator.send_to(bytes_data=msgpack.packb({'action': 'resync'}))
+			self.assertEqual(msgpack.unpackb(await communicator.receive_from())['type'], 'snapshot')
+			await communicator.disconnect()
+
+			# También con ?format=msgpack, sin subprotocolo
+			communicator = WebsocketCommunicator(dataSensorConsumer.as_asgi(), '/ws/dataSensor/?format=msgpack')
+			connected, subprotocol = await communicator.connect()
+			self.assertIsNone(subprotocol)
+			self.assertEqual(msgpack.unpackb(await communicator.receive_from()), {'Biogestor/sensorA': [10.1]})
+			await communicator.disconnect()
+
+		with override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS):
+			asyncio.run(scenario())
+
+	def test_new_topics_are_announced_once(self):
+		from dataSensor import websocketService as ws
+		sent = []
+		with patch.object(ws, '_group_send', lambda group, text, event_type='send_data': sent.append((group, text, event_type))), \
+			 patch.object(ws, '_announced', set()):
+			ws.announce_topics({'Biogestor/sensorA'})
+			ws.announce_topics({'Biogestor/sensorA', 'Biogestor/sensorB'})
+		self.assertEqual(sent, [(ws.TOPICS_GROUP, 'Biogestor/sensorA', 'topic_added'),
+								(ws.TOPICS_GROUP, 'Biogestor/sensorB', 'topic_added')])
+
+class TopicRegistryTest(TestCase):
+	def test_queue_batch_registers_topics_once(self):
+		from unittest.mock import MagicMock
+		from . import sensorStore
+		pipe = MagicMock()
+		sensorStore.queue_batch(pipe, [('Biogestor/sensorA', b'1', 0.0), ('Biogestor/sensorA', b'2', 0.0),
+									   ('Biogestor/sensorB', b'3', 0.0)])
+		pipe.sadd.assert_called_once_with(sensorStore.TOPICS_KEY, 'Biogestor/sensorA', 'Biogestor/sensorB')
+
+	def test_read_histories_uses_registry_script(self):
+		from unittest.mock import MagicMock
+		from . import sensorStore
+		client = MagicMock()
+		client.register_script.return_value.return_value = [b'Biogestor/sensorA', [b'1.5']]
+		self.assertEqual(sensorStore.read_histories(client), {'Biogestor/sensorA': ['1.5']})
+		client.register_script.assert_called_once_with(sensorStore.READ_HISTORIES_LUA)
+		client.register_script.return_value.assert_called_once_with(keys=[sensorStore.TOPICS_KEY])
+		client.keys.assert_not_called()
+
+	def test_rebuild_topic_registry_scans_existing_lists(self):
+		from unittest.mock import MagicMock
+		from . import sensorStore
+		client = MagicMock()
+		client.scan_iter.return_value = iter([b'Biogestor/sensorA'])
+		self.assertEqual(sensorStore.rebuild_topic_registry(client), 1)
+		client.sadd.assert_called_once_with(sensorStore.TOPICS_KEY, b'Biogestor/sensorA')
+
+class SensorRegistryTest(RegistryIsolationMixin, TestCase):
+	def test_steady_state_does_not_query_database(self):
+		from django.db import connection
+		from django.test.utils import CaptureQueriesContext
+		from .registry import get_registry
+		sensor = make_sensor()
+		registry = get_registry()
+		self.assertEqual(registry.sensor("sensorA").id, sensor.id)
+		with CaptureQueriesContext(connection) as queries:
+			registry.sensor("sensorA")
+			registry.active_fill_id()
+		self.assertEqual(len(queries.captured_queries), 0)
+
+	def test_signals_invalidate_on_sensor_fill_and_calibration_changes(self):
+		from django.utils import timezone
+		from calibrations.models import Calibration
+		from Fill.models import Fill
+		from .registry import get_registry
+		registry = get_registry()
+		self.assertIsNone(registry.sensor("sensorA"))
+		sensor = make_sensor()
+		self.assertEqual(registry.sensor("sensorA").max_range, 100.0)
+
+		fill = Fill.objects.create(filling_mass=1, approx_density=1, added_watter=1, type_material=1,
+								   filling_moisture=1, delay_time=1)
+		self.assertEqual(registry.active_fill_id(), fill.id)
+
+		calibration = Calibration.objects.create(userId=1, sensorId=sensor.id, date=timezone.now().date(),
+												 params='{}', note='', result='ok')
+		self.assertEqual(registry.sensor("sensorA").calibration_id, calibration.id)
+
+		sensor.delete()
+		self.assertIsNone(registry.sensor("sensorA"))
+
+	def test_remote_version_bump_triggers_reload(self):
+		from .registry import SensorRegistry
+		from . import registry as registry_module
+		make_sensor()
+		registry = SensorRegistry(check_interval=0)
+		registry_module.redis_client.get.return_value = b'1'
+		registry.sensors()
+		with patch.object(registry, '_load', wraps=registry._load) as load:
+			registry.sensors()
+			load.assert_not_called()
+			registry_module.redis_client.get.return_value = b'2'
+			registry.sensors()
+			load.assert_called_once_with(2)
+
+	def test_concurrent_invalidate_does_not_return_none(self):
+		from .registry import SensorRegistry
+		make_sensor()
+		registry = SensorRegistry(check_interval=0)
+		load = registry._load
+
+		def load_then_invalidate(version):
+			# Una señal invalida el registro justo después de la recarga
+			snapshot = load(version)
+			registry.invalidate()
+			return snapshot
+
+		with patch.object(registry, '_load', side_effect=load_then_invalidate):
+			self.assertIn('sensorA', registry.sensors())
+			self.assertIsNone(registry.active_fill_id())
+
+	def test_commit_bumps_shared_version(self):
+		from . import registry as registry_module
+		with self.captureOnCommitCallbacks(execute=True):
+			make_sensor()
+		registry_module.redis_client.incr.assert_called_with(registry_module.VERSION_KEY)
+
+class BulkLoaderTest(TestCase):
+	def test_copy_buffer_format(self):
+		from datetime import datetime, timezone as dt_timezone
+		from .bulkLoader import copy_buffer
+		date = datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc)
+		buffer = copy_buffer([(1, 12.5, date, None), (2, 0.1, date, 7)])
+		self.assertEqual(buffer.read(),
+						 "1\t12.5\t2024-01-02T03:04:05+00:00\t\\N\n"
+						 "2\t0.1\t2024-01-02T03:04:05+00:00\t7\n")
+
+	def test_load_rows_falls_back_to_bulk_create(self):
+		from django.db import connection
+		from django.utils import timezone
+		from .bulkLoader import load_rows
+		if connection.vendor == 'postgresql':
+			self.skipTest('fallback only applies to non-PostgreSQL backends')
+		sensor = make_sensor()
+		now = timezone.now()
+		self.assertEqual(load_rows([(sensor.id, 1.0, now, None), (sensor.id, 2.0, now, None)]), 2)
+		self.assertEqual(Data.objects.filter(sensor=sensor).count(), 2)
+
+	@patch('dataSensor.watermark.redis_client')
+	def test_load_rows_updates_watermark_on_commit(self, mock_redis_client):
+		from datetime import datetime, timezone as dt_timezone
+		from . import watermark
+		from .bulkLoader import load_rows
+		sensor = make_sensor()
+		old = datetime(2024, 3, 1, tzinfo=dt_timezone.utc)
+		new = datetime(2024, 3, 2, tzinfo=dt_timezone.utc)
+		with self.captureOnCommitCallbacks(execute=True):
+			load_rows([(sensor.id, 1.0, new, None), (sensor.id, 2.0, old, None)])
+			mock_redis_client.register_script.return_value.assert_not_called()
+		mock_redis_client.register_script.return_value.assert_called_once_with(
+			keys=[watermark.VERSION_KEY, watermark.LATEST_KEY], args=[old.timestamp(), new.timestamp(), watermark.MARGIN])
+
+	def test_import_sensor_data_command(self):
+		import io
+		import os
+		import tempfile
+		from django.core.management import call_command
+		from .registry import get_registry
+		sensor = make_sensor()
+		get_registry().invalidate()
+		with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+			f.write("sensor,value,date,fill\nsensorA,10.5,2024-01-01T00:00:00Z,\n"
+					"unknown,1,2024-01-01T00:00:00Z,\nsensorA,2,2024-01-01T00:00:10Z,abc\n")
+		self.addCleanup(os.remove, f.name)
+		out = io.StringIO()
+		with patch('dataSensor.registry.redis_client'):
+			call_command('import_sensor_data', f.name, stdout=out)
+		self.assertEqual(list(Data.objects.filter(sensor=sensor).values_list('value', flat=True)), [10.5])
+		self.assertIn('2 omitidas', out.getvalue())
+		# El histórico importado también tiene rollups
+		from .models import DataRollup
+		self.assertEqual(DataRollup.objects.filter(sensor=sensor).count(), 3)
+
+class DataPartitionsTest(TestCase):
+	def test_months_to_create_crosses_year_boundary(self):
+		from datetime import date
+		from .partitions import months_to_create, partition_name
+		months = months_to_create(date(2024, 11, 15), 3)
+		self.assertEqual(months, [date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1)])
+		self.assertEqual(partition_name(months[2]), 'dataSensor_data_p202501')
+
+	def test_expired_partitions_respect_retention(self):
+		from datetime import date
+		from .partitions import expired
+		names = ['dataSensor_data_p202401', 'dataSensor_data_p202402', 'dataSensor_data_p202403',
+				 'dataSensor_data_default']
+		self.assertEqual(expired(names, date(2024, 5, 10), 2), ['dataSensor_data_p202401', 'dataSensor_data_p202402'])
+		self.assertEqual(expired(names, date(2024, 5, 10), 0), [])
+
+	def test_wanted_months_skip_expired_default_months(self):
+		from datetime import date
+		from .partitions import wanted_months
+		months = wanted_months(date(2024, 5, 10), 1, 2, [date(2023, 12, 1), date(2024, 3, 1)])
+		self.assertEqual(months, [date(2024, 3, 1), date(2024, 5, 1), date(2024, 6, 1)])
+		self.assertIn(date(2023, 12, 1), wanted_months(date(2024, 5, 10), 1, 0, [date(2023, 12, 1)]))
+
+	def test_command_checks_expiry_after_creating(self):
+		from datetime import date, datetime, timezone as dt_timezone
+		from unittest.mock import patch
+		from django.core.management import call_command
+		import io
+		created = []
+		existing = [['dataSensor_data_p202401'], ['dataSensor_data_p202401', 'dataSensor_data_p202403']]
+		with patch('dataSensor.partitions.is_partitioned', return_value=True), \
+			 patch('dataSensor.partitions.existing_partitions', side_effect=existing), \
+			 patch('dataSensor.partitions.default_partition_months', return_value=[date(2024, 1, 1), date(2024, 3, 1)]), \
+			 patch('dataSensor.partitions.create_partition', side_effect=created.append), \
+			 patch('dataSensor.partitions.drop_partition') as drop, \
+			 patch('django.utils.timezone.now', return_value=datetime(2024, 5, 10, tzinfo=dt_timezone.utc)):
+			call_command('manage_data_partitions', months_ahead=0, retention_months=3, stdout=io.StringIO())
+		self.assertEqual(created, [date(2024, 3, 1), date(2024, 5, 1)])
+		drop.assert_called_once_with('dataSensor_data_p202401', detach_only=False)
+
+	def test_command_is_noop_without_postgres_partitioning(self):
+		import io
+		from django.db import connection
+		from django.core.management import call_command
+		if connection.vendor == 'postgresql':
+			self.skipTest('only meaningful on non-partitioned backends')
+		out = io.StringIO()
+		call_command('manage_data_partitions', stdout=out)
+		self.assertIn('nada que hacer', out.getvalue())
+
+class DataRollupTest(TestCase):
+	def _at(self, hour, minute, second=0):
+		from datetime import datetime, timezone as dt_timezone
+		return datetime(2024, 3, 1, hour, minute, second, tzinfo=dt_timezone.utc)
+
+	def test_apply_rows_builds_and_merges_buckets_incrementally(self):
+		from .models import DataRollup
+		from .rollups import apply_rows
+		sensor = make_sensor()
+		apply_rows([(sensor.id, 10.0, self._at(10, 0, 5), None), (sensor.id, 20.0, self._at(10, 0, 30), None)])
+		apply_rows([(sensor.id, 5.0, self._at(10, 0, 50), None), (sensor.id, 7.0, self._at(10, 1, 10), None)])
+
+		minute = DataRollup.objects.get(sensor=sensor, resolution='1m', bucket=self._at(10, 0))
+		self.assertEqual((minute.count, minute.min_value, minute.max_value), (3, 5.0, 20.0))
+		self.assertAlmostEqual(minute.avg_value, 35.0 / 3)
+		self.assertEqual((minute.first_value, minute.last_value), (10.0, 5.0))
+		self.assertEqual(DataRollup.objects.filter(sensor=sensor, resolution='1m').count(), 2)
+
+		hour = DataRollup.objects.get(sensor=sensor, resolution='1h')
+		self.assertEqual((hour.count, hour.first_value, hour.last_value), (4, 10.0, 7.0))
+		self.assertEqual(hour.bucket, self._at(10, 0))
+		day = DataRollup.objects.get(sensor=sensor, resolution='1d')
+		self.assertEqual(day.count, 4)
+		self.assertEqual(day.bucket, self._at(0, 0))
+
+	def test_rebuild_rollups_matches_raw_data(self):
+		import io
+		from django.core.management import call_command
+		from .models import DataRollup
+		sensor = make_sensor()
+		for value, (hour, minute) in zip([1.0, 2.0, 3.0, 4.0], [(8, 0), (8, 20), (8, 40), (9, 0)]):
+			Data.objects.create(sensor=sensor, value=value, date=self._at(hour, minute))
+		DataRollup.objects.create(sensor=sensor, resolution='1h', bucket=self._at(8, 0), count=99, sum_value=0,
+								  min_value=0, max_value=0, avg_value=0, first_value=0, first_date=self._at(8, 0),
+								  last_value=0, last_date=self._at(8, 0))
+
+		call_command('rebuild_rollups', '--from', '2024-03-01', '--to', '2024-03-01', stdout=io.StringIO())
+
+		hours = {r.bucket.hour: r for r in DataRollup.objects.filter(sensor=sensor, resolution='1h')}
+		self.assertEqual(hours[8].count, 3)
+		self.assertEqual(hours[9].count, 1)
+		self.assertEqual(DataRollup.objects.get(sensor=sensor, resolution='1d').avg_value, 2.5)
+
+	def test_rollup_endpoint_filters(self):
+		from rest_framework.test import APIClient
+		from .rollups import apply_rows
+		sensor = make_sensor()
+		other = make_sensor("sensorB")
+		apply_rows([(sensor.id, 1.0, self._at(8, 0), None), (sensor.id, 2.0, self._at(9, 0), None),
+					(other.id, 3.0, self._at(9, 0), None)])
+		response = APIClient().get('/api/sensor-rollups/', {'sensor': sensor.id, 'resolution': '1h',
+															  'from': '2024-03-01T09:00:00Z'})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual([row['avg_value'] for row in response.json()['results']], [2.0])
+		self.assertEqual(APIClient().get('/api/sensor-rollups/', {'sensor': sensor.id, 'from': 'ayer'}).status_code, 400)
+		# Sin sensor o con una resolución desconocida no se lista nada
+		self.assertEqual(APIClient().get('/api/sensor-rollups/').status_code, 400)
+		self.assertEqual(APIClient().get('/api/sensor-rollups/', {'sensor': sensor.id, 'resolution': '5m'}).status_code, 400)
+
+	def test_rollup_endpoint_columnar_format(self):
+		from rest_framework.test import APIClient
+		from . import columnar
+		from .rollups import apply_rows
+		sensor = make_sensor()
+		apply_rows([(sensor.id, 1.0, self._at(8, 0), None), (sensor.id, 3.0, self._at(8, 30), None),
+					(sensor.id, 2.0, self._at(9, 0), None)])
+		response = APIClient().get('/api/sensor-rollups/', {'sensor': sensor.id, 'format': 'columns'})
+		columns, header = columnar.decode(response.content)
+		self.assertEqual(header['rows'], 2)
+		self.assertEqual(columns['avg_value'].tolist(), [2.0, 2.0])
+		self.assertEqual(columns['count'].tolist(), [2, 1])
+		self.assertEqual(columns['bucket'][1] - columns['bucket'][0], 3600 * 1000.0)
+
+	def test_postgres_upsert_statement(self):
+		from datetime import datetime, timezone as dt_timezone
+		from . import rollups
+		sql = rollups.upsert_sql(3)
+		self.assertIn('ON CONFLICT (sensor_id, resolution, bucket) DO UPDATE', sql)
+		self.assertEqual(sql.count('%s'), 3 * len(rollups.UPSERT_COLUMNS))
+		executed = []
+		with patch.object(rollups, 'connection') as mock_connection:
+			mock_connection.vendor = 'postgresql'
+			mock_connection.ops.quote_name = lambda name: f'"{name}"'
+			cursor = mock_connection.cursor.return_value.__enter__.return_value
+			cursor.execute.side_effect = lambda sql, params: executed.append(params)
+			when = datetime(2024, 3, 1, 10, 0, 5, tzinfo=dt_timezone.utc)
+			self.assertEqual(rollups.apply_rows([(1, 10.0, when, None), (1, 20.0, when, None)]), 3)
+		# Una sola sentencia con las tres cubetas (1m, 1h, 1d) ya agregadas
+		self.assertEqual(len(executed), 1)
+		self.assertEqual(len(executed[0]), 3 * len(rollups.UPSERT_COLUMNS))
+		self.assertEqual(executed[0][3:5], [2, 30.0])
+
+	@patch('dataSensor.views.redis_client')
+	def test_persistence_tick_updates_rollups(self, mock_redis_client):
+		from .models import DataRollup
+		from .registry import get_registry
+		from dataSensor.views import save_data_iteration
+		sensor = make_sensor()
+		get_registry().invalidate()
+		mock_redis_client.pipeline.return_value.execute.return_value = [b"12.5"]
+		with patch('dataSensor.registry.redis_client'):
+			save_data_iteration()
+		self.assertEqual(DataRollup.objects.filter(sensor=sensor).count(), 3)
+
+class DataTimeRangeQueryTest(TestCase):
+	def setUp(self):
+		from datetime import datetime, timezone as dt_timezone
+		from Fill.models import Fill
+		self.s1 = make_sensor("sensorA", name="S1")
+		self.s2 = make_sensor("sensorB", name="S2")
+		self.fill = Fill.objects.create(filling_mass=1, approx_density=1, added_watter=1, type_material=1,
+										filling_moisture=1, delay_time=1)
+		for day in (1, 2, 3):
+			when = datetime(2024, 3, day, tzinfo=dt_timezone.utc)
+			Data.objects.create(sensor=self.s1, value=float(day), date=when, fill=self.fill if day > 1 else None)
+			Data.objects.create(sensor=self.s2, value=10.0 + day, date=when)
+
+	def _values(self, params):
+		from rest_framework.test import APIClient
+		response = APIClient().get('/api/sensor-data/', params)
+		self.assertEqual(response.status_code, 200)
+		return [row['value'] for row in response.json()['results']]
+
+	def test_filters_by_sensor_fill_and_time_range(self):
+		self.assertEqual(self._values({'sensor': self.s1.id}), [1.0, 2.0, 3.0])
+		self.assertEqual(self._values({'fill': self.fill.id}), [2.0, 3.0])
+		self.assertEqual(self._values({'sensor': self.s2.id, 'from': '2024-03-02', 'to': '2024-03-03'}), [12.0])
+		self.assertEqual(self._values({'fill': self.fill.id, 'sensor': self.s1.id, 'to': '2024-03-03T00:00:00Z'}), [2.0])
+
+	def test_invalid_filters_return_400(self):
+		from rest_framework.test import APIClient
+		self.assertEqual(APIClient().get('/api/sensor-data/', {'sensor': 'abc'}).status_code, 400)
+		self.assertEqual(APIClient().get('/api/sensor-data/', {'from': 'yesterday'}).status_code, 400)
+
+	def _plan(self, queryset):
+		from django.db import connection
+		if connection.vendor == 'postgresql':
+			# Con tablas pequeñas Postgres prefiere un seq scan; se fuerza el uso de índices
+			with connection.cursor() as cursor:
+				cursor.execute('SET LOCAL enable_seqscan = off')
+		return queryset.explain()
+
+	def _index_names(self, name):
+		"""El índice y, en Postgres particionado, sus copias en cada partición."""
+		from django.db import connection
+		names = {name}
+		if connection.vendor == 'postgresql':
+			with connection.cursor() as cursor:
+				cursor.execute("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+							   "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = %s", [name])
+				names.update(row[0] for row in cursor.fetchall())
+		return names
+
+	def assertPlanUses(self, queryset, index):
+		plan = self._plan(queryset)
+		self.assertTrue(any(name in plan for name in self._index_names(index)), plan)
+		self.assertNotIn('TEMP B-TREE', plan)
+
+	def test_query_plans_use_composite_indexes(self):
+		from datetime import datetime, timezone as dt_timezone
+		start = datetime(2024, 3, 2, tzinfo=dt_timezone.utc)
+		per_sensor = Data.objects.filter(sensor_id=self.s1.id, date__gte=start).order_by('date')
+		self.assertPlanUses(per_sensor, 'data_sensor_date_idx')
+		per_fill = Data.objects.filter(fill_id=self.fill.id, sensor_id=self.s1.id, date__gte=start).order_by('date')
+		self.assertPlanUses(per_fill, 'data_fill_sensor_date_idx')
+
+	def test_cursor_ordering_is_backed_by_indexes(self):
+		# Páginas del cursor (date, id) sin filtro y por llenado, sin ordenar la tabla
+		self.assertPlanUses(Data.objects.order_by('date', 'id')[:500], 'data_date_id_idx')
+		self.assertPlanUses(Data.objects.filter(fill_id=self.fill.id).order_by('date', 'id')[:500],
+							'data_fill_date_id_idx')
+
+class DataCursorPaginationTest(TestCase):
+	def setUp(self):
+		from datetime import datetime, timezone as dt_timezone
+		from Fill.models import Fill, FillPrediction
+		self.sensors = [make_sensor(f"sensor{i}", name=f"S{i}")
+						for i in range(3)]
+		prediction = FillPrediction.objects.create(
+			total_solids=1, total_volatile_solids=1, potencial_production=1, max_mu=1, solvent_volume=1,
+			initial_concentration=1, specific_mu=0.1, cumulative_production=[1.0] * 50,
+			derivative_production=[0.5] * 50)
+		self.fill = Fill.objects.create(filling_mass=1, approx_density=1, added_watter=1, type_material=1,
+										filling_moisture=1, delay_time=1, prediction=prediction)
+		when = datetime(2024, 3, 1, tzinfo=dt_timezone.utc)
+		# Varias lecturas con la misma fecha: el cursor desempata por id
+		for i in range(7):
+			Data.objects.create(sensor=self.sensors[i % 3], value=float(i), date=when, fill=self.fill)
+
+	def _get(self, url, params=None):
+		from rest_framework.test import APIClient
+		response = APIClient().get(url, params)
+		self.assertEqual(response.status_code, 200)
+		return response.json()
+
+	def test_flat_rows(self):
+		page = self._get('/api/sensor-data/', {'page_size': 2})
+		self.assertEqual(set(page), {'next', 'previous', 'results'})
+		self.assertEqual(page['results'][0], {
+			'id': page['results'][0]['id'], 'sensor_id': self.sensors[0].id, 'value': 0.0,
+			'date': '2024-03-01T00:00:00Z', 'fill_id': self.fill.id,
+		})
+
+	def test_cursor_walks_all_rows_once(self):
+		values, url, params = [], '/api/sensor-data/', {'page_size': 3}
+		while url:
+			page = self._get(url, params)
+			values += [row['value'] for row in page['results']]
+			url, params = page['next'], None
+		self.assertEqual(values, [float(i) for i in range(7)])
+
+	def test_expand_uses_constant_queries(self):
+		with self.assertNumQueries(1):
+			page = self._get('/api/sensor-data/', {'expand': 'sensor,fill', 'page_size': 2})
+		with self.assertNumQueries(1):
+			self._get('/api/sensor-data/', {'expand': 'sensor,fill', 'page_size': 7})
+		row = page['results'][0]
+		self.assertEqual(row['sensor']['measured_variable']['name'], 'Temp')
+		self.assertEqual(len(row['fill']['prediction']['cumulative_production']), 50)
+
+	def test_invalid_expand_returns_400(self):
+		from rest_framework.test import APIClient
+		self.assertEqual(APIClient().get('/api/sensor-data/', {'expand': 'calibration'}).status_code, 400)
+
+	def test_columnar_format_walks_pages_through_link_header(self):
+		import re
+		from rest_framework.test import APIClient
+		from . import columnar
+		client, values, ids = APIClient(), [], []
+		url, params = '/api/sensor-data/', {'format': 'columns', 'page_size': 3}
+		while url:
+			response = client.get(url, params)
+			self.assertEqual(response.status_code, 200)
+			self.assertEqual(response['Content-Type'], columnar.MEDIA_TYPE)
+			columns, header = columnar.decode(response.content)
+			self.assertEqual([c['name'] for c in header['columns']], ['id', 'sensor_id', 'date', 'value', 'fill_id'])
+			values += columns['value'].tolist()
+			ids += columns['fill_id'].tolist()
+			self.assertTrue((columns['date'] == 1709251200000.0).all())
+			match = re.search(r'<([^>]+)>; rel="next"', response.get('Link', ''))
+			url, params = (match.group(1) if match else None), None
+		self.assertEqual(values, [float(i) for i in range(7)])
+		self.assertEqual(set(ids), {self.fill.id})
+
+	def test_columnar_format_by_accept_header_and_nulls(self):
+		from rest_framework.test import APIClient
+		from . import columnar
+		Data.objects.update(fill=None)
+		response = APIClient().get('/api/sensor-data/', HTTP_ACCEPT=columnar.MEDIA_TYPE)
+		columns, header = columnar.decode(response.content)
+		self.assertEqual(header['rows'], 7)
+		self.assertEqual(set(columns['fill_id'].tolist()), {columnar.NULL_ID})
+		# Las columnas están alineadas a 8 bytes para Float64Array/BigInt64Array
+		start = 8 + int.from_bytes(response.content[4:8], 'little')
+		self.assertTrue(all((start + c['offset']) % 8 == 0 for c in header['columns']))
+		# Los errores siguen saliendo en JSON
+		error = APIClient().get('/api/sensor-data/', {'format': 'columns', 'sensor': 'x'})
+		self.assertEqual(error.status_code, 400)
+		self.assertEqual(error['Content-Type'], 'application/json')
+
+class DownsamplingTest(TestCase):
+	def setUp(self):
+		self.sensor = make_sensor("sensorA", name="S1")
+
+	def test_lttb_keeps_endpoints_and_peaks(self):
+		import numpy as np
+		from .downsampling import lttb
+		x = np.arange(1000, dtype=float)
+		y = np.zeros(1000)
+		y[437] = 50.0
+		index = lttb(x, y, 20)
+		self.assertEqual(len(index), 20)
+		self.assertEqual((index[0], index[-1]), (0, 999))
+		self.assertIn(437, index)
+		self.assertTrue(np.all(np.diff(index) > 0))
+		self.assertEqual(len(lttb(x[:10], y[:10], 20)), 10)
+
+	def test_minmax_keeps_extremes_of_each_bucket(self):
+		import numpy as np
+		from .downsampling import minmax
+		x = np.arange(100, dtype=float)
+		y = np.sin(x)
+		index = minmax(x, y, 10)
+		self.assertLessEqual(len(index), 10)
+		self.assertIn(int(y.argmax()), index)
+		self.assertIn(int(y.argmin()), index)
+
+	def test_rollup_resolution_depends_on_range(self):
+		from datetime import datetime, timedelta, timezone as dt_timezone
+		from .downsampling import rollup_resolution
+		start = datetime(2024, 3, 1, tzinfo=dt_timezone.utc)
+		self.assertIsNone(rollup_resolution(start, start + timedelta(hours=6), 1000))
+		# 7 días con 1000 puntos: 1 h daría solo 168 puntos
+		self.assertEqual(rollup_resolution(start, start + timedelta(days=7), 1000), '1m')
+		self.assertEqual(rollup_resolution(start, start + timedelta(days=2), 1000), '1m')
+		self.assertEqual(rollup_resolution(start, start + timedelta(days=90), 1000), '1h')
+		self.assertEqual(rollup_resolution(start, start + timedelta(days=3650), 1000), '1d')
+
+	def _get(self, params):
+		from rest_framework.test import APIClient
+		return APIClient().get('/api/sensor-data/downsample/', params)
+
+	def test_endpoint_reads_raw_rows_for_short_ranges(self):
+		from datetime import datetime, timedelta, timezone as dt_timezone
+		start = datetime(2024, 3, 1, tzinfo=dt_timezone.utc)
+		Data.objects.bulk_create([Data(sensor=self.sensor, value=float(i % 7), date=start + timedelta(seconds=5 * i))
+								  for i in range(500)])
+		response = self._get({'sensors': str(self.sensor.id), 'from': '2024-03-01', 'to': '2024-03-01T01:00:00Z',
+							  'points': 50})
+		self.assertEqual(response.status_code, 200)
+		series = response.json()['series'][0]
+		self.assertEqual(series['source'], 'raw')
+		self.assertEqual(len(series['values']), 50)
+		self.assertEqual(series['dates'][0], '2024-03-01T00:00:00.000Z')
+
+	def test_endpoint_uses_rollups_for_long_ranges(self):
+		from datetime import datetime, timedelta, timezone as dt_timezone
+		from . import rollups
+		start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+		rows = [(self.sensor.id, float(i), start + timedelta(hours=i), None) for i in range(24 * 60)]
+		rollups.apply_rows(rows)
+		response = self._get({'sensors': f'{self.sensor.id}', 'from': '2024-01-01', 'to': '2024-03-01',
+							  'points': 500, 'method': 'minmax'})
+		self.assertEqual(response.status_code, 200)
+		series = response.json()['series'][0]
+		self.assertEqual(series['source'], '1h')
+		self.assertLessEqual(len(series['values']), 500)
+		self.assertEqual(max(series['values']), 24 * 60 - 1)
+
+	def test_range_partly_without_rollups_is_filled_from_raw(self):
+		from datetime import datetime, timedelta, timezone as dt_timezone
+		from . import rollups
+		start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+		# Enero solo en crudo (anterior a los rollups), febrero con rollups
+		Data.objects.bulk_create([Data(sensor=self.sensor, value=-1.0, date=start + timedelta(hours=i))
+								  for i in range(24 * 31)])
+		rollups.apply_rows([(self.sensor.id, 1.0, start + timedelta(days=31, hours=i), None) for i in range(24 * 29)])
+		response = self._get({'sensors': str(self.sensor.id), 'from': '2024-01-01', 'to': '2024-03-01',
+							  'points': 500})
+		series = response.json()['series'][0]
+		self.assertEqual(series['source'], '1h+raw')
+		self.assertEqual(series['dates'][0], '2024-01-01T00:00:00.000Z')
+		self.assertEqual(set(series['values']), {-1.0, 1.0})
+		self.assertLessEqual(len(series['values']), 510)
+
+	def test_endpoint_validates_params(self):
+		self.assertEqual(self._get({}).status_code, 400)
+		self.assertEqual(self._get({'sensors': 'a,b'}).status_code, 400)
+		self.assertEqual(self._get({'sensors': '1', 'points': 1}).status_code, 400)
+		response = self._get({'sensors': '1', 'points': 'abc'})
+		self.assertEqual(response.status_code, 400)
+		self.assertIn('entero', response.json()['points'])
+		self.assertEqual(self._get({'sensors': '1', 'method': 'avg'}).status_code, 400)
+
+class AlignedFrameTest(TestCase):
+	def setUp(self):
+		from datetime import datetime, timedelta, timezone as dt_timezone
+		from django.core.cache import cache
+		cache.clear()
+		self.start = datetime(2024, 3, 1, tzinfo=dt_timezone.utc)
+		self.s1 = make_sensor("sensorA")
+		self.s2 = make_sensor("sensorB")
+		# sensorA cada 30 min; sensorB solo a las 00:10 y a las 03:10
+		for i in range(8):
+			Data.objects.create(sensor=self.s1, value=float(i), date=self.start + timedelta(minutes=30 * i))
+		Data.objects.create(sensor=self.s2, value=10.0, date=self.start + timedelta(minutes=10))
+		Data.objects.create(sensor=self.s2, value=40.0, date=self.start + timedelta(hours=3, minutes=10))
+		patcher = patch('dataSensor.watermark.redis_client')
+		self.redis = patcher.start()
+		self.redis.mget.return_value = [b'3', b'0']
+		self.addCleanup(patcher.stop)
+
+	def _get(self, **params):
+		from rest_framework.test import APIClient
+		params = {'sensors': f'{self.s1.id},{self.s2.id}', 'from': '2024-03-01T00:00:00Z',
+				  'to': '2024-03-01T05:00:00Z', 'freq': '1h', **params}
+		return APIClient().get('/api/sensor-data/aligned/', params)
+
+	def test_resamples_pivots_and_fills(self):
+		with self.assertNumQueries(1):
+			body = self._get().json()
+		self.assertEqual(body['dates'][:2], ['2024-03-01T00:00:00.000Z', '2024-03-01T01:00:00.000Z'])
+		self.assertEqual(body['values'][str(self.s1.id)], [0.5, 2.5, 4.5, 6.5, 6.5])
+		self.assertEqual(body['values'][str(self.s2.id)], [10.0, 10.0, 10.0, 40.0, 40.0])
+		interpolated = self._get(fill='interpolate').json()['values'][str(self.s2.id)]
+		self.assertEqual(interpolated, [10.0, 20.0, 30.0, 40.0, None])
+		self.assertEqual(self._get(fill='none').json()['values'][str(self.s2.id)], [10.0, None, None, 40.0, None])
+
+	def test_result_is_cached_until_watermark_changes(self):
+		first = self._get().json()
+		with self.assertNumQueries(0):
+			self.assertEqual(self._get().json(), first)
+		self.redis.mget.return_value = [b'4', b'0']
+		with self.assertNumQueries(1):
+			self._get()
+
+	def test_watermark_ignores_live_writes_for_past_ranges(self):
+		from datetime import timedelta
+		from . import watermark
+		end = self.start + timedelta(hours=5)
+		self.redis.mget.return_value = [b'3', str(end.timestamp() + 3600).encode()]
+		self.assertEqual(watermark.for_range(end), '3')
+		self.redis.mget.return_value = [b'3', str(end.timestamp() + 60).encode()]
+		self.assertNotEqual(watermark.for_range(end), '3')
+
+	def test_invalid_parameters_return_400(self):
+		self.assertEqual(self._get(freq='abc').status_code, 400)
+		self.assertEqual(self._get(freq='1s', to='2024-03-02T00:00:00Z').status_code, 400)
+		self.assertEqual(self._get(fill='bfill').status_code, 400)
+		self.assertEqual(self._get(sensors='').status_code, 400)
+
+class DataExportTest(TestCase):
+	def setUp(self):
+		from datetime import datetime, timedelta, timezone as dt_timezone
+		self.s1 = make_sensor("sensorA", name="S1")
+		self.s2 = make_sensor("sensorB", name="S2")
+		start = datetime(2024, 3, 1, tzinfo=dt_timezone.utc)
+		for i in range(5):
+			Data.objects.create(sensor=self.s1, value=i + 0.5, date=start + timedelta(hours=i))
+			Data.objects.create(sensor=self.s2, value=100.0, date=start + timedelta(hours=i))
+
+	def _download(self, params, **extra):
+		from rest_framework.test import APIClient
+		response = APIClient().get('/api/sensor-data/export/', params, **extra)
+		self.assertEqual(response.status_code, 200)
+		self.assertTrue(response.streaming)
+		return response, b''.join(response.streaming_content).decode()
+
+	def test_csv_export_streams_filtered_rows(self):
+		import csv
+		import io
+		response, body = self._download({'sensor': self.s1.id, 'to': '2024-03-01T03:00:00Z'})
+		self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+		self.assertIn('attachment', response['Content-Disposition'])
+		rows = list(csv.DictReader(io.StringIO(body)))
+		self.assertEqual([row['value'] for row in rows], ['0.5', '1.5', '2.5'])
+		self.assertEqual(rows[0], {'sensor': 'sensorA', 'value': '0.5', 'date': '2024-03-01T00:00:00+00:00', 'fill': ''})
+
+	def test_ndjson_export_by_format_or_accept_header(self):
+		_response, body = self._download({'format': 'ndjson', 'sensor': self.s2.id})
+		lines = [json.loads(line) for line in body.splitlines()]
+		self.assertEqual(len(lines), 5)
+		self.assertEqual(lines[0]['sensor'], 'sensorB')
+		response, _body = self._download({}, HTTP_ACCEPT='application/x-ndjson')
+		self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+	def test_export_errors_are_json(self):
+		from rest_framework.test import APIClient
+		response = APIClient().get('/api/sensor-data/export/', {'format': 'csv', 'from': 'ayer'})
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(response['Content-Type'], 'application/json')
+		self.assertIn('from', json.loads(response.content))
+
+	def test_export_chunks_and_async_iteration(self):
+		from asgiref.sync import async_to_sync
+		from .exports import aiter_sync, iter_export
+		chunks = list(iter_export(Data.objects.all(), 'csv', chunk_size=3))
+		# Cabecera + 10 filas en trozos de 3
+		self.assertEqual(len(chunks), 5)
+
+		async def collect():
+			return [chunk async for chunk in aiter_sync(iter_export(Data.objects.all(), 'ndjson', chunk_size=4))]
+		self.assertEqual(len(async_to_sync(collect)()), 3)
+
+	def test_export_command_round_trips_with_import(self):
+		import io
+		import os
+		import tempfile
+		from django.core.management import call_command
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, 'export.csv')
+			call_command('export_sensor_data', '--sensor', str(self.s1.id), '--output', path, stderr=io.StringIO())
+			Data.objects.filter(sensor=self.s1).delete()
+			with patch('dataSensor.registry.redis_client'):
+				from .registry import get_registry
+				get_registry().invalidate()
+				call_command('import_sensor_data', path, stdout=io.StringIO())
+		self.assertEqual(sorted(Data.objects.filter(sensor=self.s1).values_list('value', flat=True)),
+						 [0.5, 1.5, 2.5, 3.5, 4.5])
@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MeasuredVariableViewSet, SensorViewSet, DataViewSet
+from .views import MeasuredVariableViewSet, SensorViewSet, DataViewSet, DataRollupViewSet
 
 router = DefaultRouter()
 router.register(r'measuredVariables', MeasuredVariableViewSet)
 router.register(r'sensors', SensorViewSet)
 router.register(r'sensor-data', DataViewSet)
+router.register(r'sensor-rollups', DataRollupViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,51 +1,403 @@
 from django.shortcuts import render
+from BGProject.caching import CachedReadMixin
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .models import MeasuredVariable, Sensor, Data
-from .serializers import MeasuredVariableSerializer, SensorSerializer, DataSerializer
+from rest_framework.exceptions import ValidationError
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import MeasuredVariable, Sensor, Data, DataRollup
+from .serializers import MeasuredVariableSerializer, SensorSerializer, DataSerializer, DataFlatSerializer, DataRollupSerializer
+from .pagination import DataCursorPagination, RollupCursorPagination
+from .renderers import ColumnarRenderer, CSVRenderer, NDJSONRenderer
+from django.db import transaction
+from django.utils import timezone
+from datetime import datetime, timezone as dt_timezone
 import threading
 import time
 import redis
+from . import alignment, columnar, downsampling, exports, metrics, rollups, sensorStore, sharding
+from .bulkLoader import load_rows
+from .registry import get_registry
 
 # Configuración global
 
 redis_client = redis.Redis(host='redis', port=6379, db=0)
 save_time = 5
+stream_batch = 1000        # lecturas por XREADGROUP
+stream_block_ms = 1000     # espera máxima por lecturas nuevas
+stream_claim_idle_ms = 60000  # pendientes de consumidores caídos
+_stream_group_ready = False
+downsample_points = 1000      # puntos por serie en /sensor-data/downsample/
+max_downsample_points = 5000
+aligned_freq = '15min'        # rejilla por defecto de /sensor-data/aligned/
+max_aligned_rows = 10000
 
 # Viewset
 
-class MeasuredVariableViewSet(viewsets.ModelViewSet):
+class MeasuredVariableViewSet(CachedReadMixin, viewsets.ModelViewSet):
     queryset = MeasuredVariable.objects.all()
     serializer_class = MeasuredVariableSerializer
 
-class SensorViewSet(viewsets.ModelViewSet):
+class SensorViewSet(CachedReadMixin, viewsets.ModelViewSet):
     queryset = Sensor.objects.all()
     serializer_class = SensorSerializer
+    # SensorSerializer anida la variable medida
+    cache_models = (Sensor, MeasuredVariable)
 
-class DataViewSet(viewsets.ModelViewSet):
+class ColumnarListMixin:
+    """``?format=columns`` (o ``Accept: application/vnd.biogestor.columns``) en el listado.
+
+    Lee solo ``columnar_fields`` con ``.values()`` y los copia a arrays de NumPy
+    sin pasar por el serializer. La paginación es la misma; los enlaces
+    ``next``/``previous`` van en la cabecera ``Link``.
+    """
+    columnar_fields = ()  # ((campo, tipo de columnar.KINDS), ...)
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if self.action == 'list':
+            renderers.append(ColumnarRenderer())
+        return renderers
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != ColumnarRenderer.format:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset.values(*(field for field, _kind in self.columnar_fields)))
+        links = [f'<{url}>; rel="{rel}"' for rel, url in (('next', self.paginator.get_next_link()),
+                                                            ('prev', self.paginator.get_previous_link())) if url]
+        headers = {'Link': ', '.join(links)} if links else None
+        return Response(columnar.Frame.from_rows(page, self.columnar_fields), headers=headers)
+
+class DataViewSet(ColumnarListMixin, viewsets.ModelViewSet):
+    """Lecturas filtrables por ?sensor=&fill=&from=&to= (índices sensor/fecha).
+
+    La lectura devuelve filas planas paginadas por cursor; ``?expand=sensor,fill``
+    añade los objetos anidados con ``select_related`` (sin consultas por fila) y
+    ``?format=columns`` devuelve el listado en columnas binarias.
+    """
     queryset = Data.objects.all()
     serializer_class = DataSerializer
+    pagination_class = DataCursorPagination
+    columnar_fields = (('id', 'int'), ('sensor_id', 'int'), ('date', 'time'), ('value', 'float'),
+                       ('fill_id', 'int?'))
+    # select_related que necesita cada expansión
+    expand_relations = {
+        'sensor': ('sensor__measured_variable',),
+        'fill': ('fill__prediction',),
+    }
 
+    def get_expand(self):
+        value = self.request.query_params.get('expand', '')
+        expand = [name for name in dict.fromkeys(value.split(',')) if name]
+        unknown = [name for name in expand if name not in self.expand_relations]
+        if unknown:
+            raise ValidationError({'expand': f"Valores permitidos: {', '.join(self.expand_relations)}"})
+        return expand
 
-# Ejecuta una iteración de guardado (testable)
-def save_data_iteration():
-    Sensors = Sensor.objects.all()
-    for sensor in Sensors:
-        key = f"Biogestor/{sensor.mqtt_code}"
-        last_value = redis_client.lindex(key, -1)
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve'):
+            kwargs.setdefault('context', self.get_serializer_context())
+            return DataFlatSerializer(*args, expand=self.get_expand(), **kwargs)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            for name in self.get_expand():
+                queryset = queryset.select_related(*self.expand_relations[name])
+        date_from, date_to = parse_date_range(params)
+        queryset = exports.filter_data(queryset, int_param(params, 'sensor'), int_param(params, 'fill'),
+                                       date_from, date_to)
+        return queryset.order_by('date')
+
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """Descarga en streaming con los mismos filtros: ?format=csv|ndjson&sensor=&fill=&from=&to="""
+        fmt = request.accepted_renderer.format
+        response = StreamingHttpResponse(exports.iter_export(self.get_queryset(), fmt),
+                                         content_type=exports.CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="sensor-data.{fmt}"'
+        return exports.stream_response(request, response)
+
+    @action(detail=False, methods=['get'])
+    def downsample(self, request):
+        """Series reducidas para gráficas: ?sensors=1,2&from=&to=&points=1000&method=lttb|minmax
+
+        Sin ``from`` se devuelven los últimos 7 días. Cada serie trae como mucho
+        ~``points`` puntos y ``source`` indica si salió de los datos crudos o de
+        los rollups (``1m``, ``1h``, ``1d``; ``+raw`` si parte del rango no los tiene).
+        """
+        params = request.query_params
+        sensor_ids = int_list_param(params, 'sensors')
+        if not sensor_ids:
+            raise ValidationError({'sensors': 'Indique al menos un sensor'})
+        try:
+            points = int(params.get('points') or downsample_points)
+        except ValueError:
+            points = None
+        if points is None or not 3 <= points <= max_downsample_points:
+            raise ValidationError({'points': f'Debe ser un número entero entre 3 y {max_downsample_points}'})
+        method = params.get('method', 'lttb')
+        if method not in downsampling.METHODS:
+            raise ValidationError({'method': f"Valores permitidos: {', '.join(downsampling.METHODS)}"})
+        date_from, date_to = downsampling.default_range(*parse_date_range(params), timezone.now())
+
+        series = []
+        with metrics.timer("api.downsample_ms"):
+            for sensor_id in sensor_ids:
+                source, x, y = downsampling.downsample(sensor_id, date_from, date_to, points, method)
+                series.append({
+                    'sensor_id': sensor_id,
+                    'source': source,
+                    'dates': downsampling.iso_dates(x),
+                    'values': y.tolist(),
+                })
+        return Response({
+            'from': date_from,
+            'to': date_to,
+            'points': points,
+            'method': method,
+            'series': series,
+        })
+
+    @action(detail=False, methods=['get'])
+    def aligned(self, request):
+        """Varios sensores en una rejilla común: ?sensors=1,2&from=&to=&freq=15min&fill=ffill|interpolate|none
+
+        Sin ``from`` se devuelven los últimos 7 días. Cada fila es la media de
+        la cubeta ``freq``; ``values`` trae una columna por sensor.
+        """
+        params = request.query_params
+        sensor_ids = int_list_param(params, 'sensors')
+        if not sensor_ids:
+            raise ValidationError({'sensors': 'Indique al menos un sensor'})
+        try:
+            freq = alignment.parse_freq(params.get('freq') or aligned_freq)
+        except ValueError:
+            raise ValidationError({'freq': 'Intervalo inválido, use p. ej. 30s, 15min, 1h o 1d'})
+        fill = params.get('fill', 'ffill')
+        if fill not in alignment.FILL_METHODS:
+            raise ValidationError({'fill': f"Valores permitidos: {', '.join(alignment.FILL_METHODS)}"})
+        date_from, date_to = downsampling.default_range(*parse_date_range(params), timezone.now())
+        if date_to <= date_from:
+            raise ValidationError({'to': 'Debe ser posterior a from'})
+        if alignment.bucket_count(date_from, date_to, freq) > max_aligned_rows:
+            raise ValidationError({'freq': f'El rango daría más de {max_aligned_rows} filas; use un intervalo mayor'})
+
+        with metrics.timer("api.aligned_ms"):
+            payload, cached = alignment.aligned(sensor_ids, date_from, date_to, freq, fill)
+        metrics.incr("api.aligned_cache_hits" if cached else "api.aligned_cache_misses")
+        return Response({
+            'from': date_from,
+            'to': date_to,
+            'freq': params.get('freq') or aligned_freq,
+            'fill': fill,
+            'sensors': sensor_ids,
+            **payload,
+        })
+
+class DataRollupViewSet(ColumnarListMixin, viewsets.ReadOnlyModelViewSet):
+    """Agregados de un sensor por cubeta: ?sensor=&resolution=1m|1h|1d&from=&to=
+
+    ``sensor`` es obligatorio en el listado, que se pagina por cursor sobre
+    ``bucket`` (un año de cubetas de 1 min son ~525k filas por sensor).
+    ``?format=columns`` devuelve las mismas filas en columnas binarias.
+    """
+    queryset = DataRollup.objects.all()
+    serializer_class = DataRollupSerializer
+    pagination_class = RollupCursorPagination
+    columnar_fields = (('bucket', 'time'), ('count', 'int'), ('min_value', 'float'), ('max_value', 'float'),
+                       ('avg_value', 'float'), ('first_value', 'float'), ('first_date', 'time'),
+                       ('last_value', 'float'), ('last_date', 'time'))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+        params = self.request.query_params
+        resolution = params.get('resolution', '1h')
+        if resolution not in rollups.RESOLUTIONS:
+            raise ValidationError({'resolution': f"Valores permitidos: {', '.join(rollups.RESOLUTIONS)}"})
+        sensor_id = int_param(params, 'sensor')
+        if sensor_id is None:
+            raise ValidationError({'sensor': 'Indique el sensor'})
+        queryset = queryset.filter(resolution=resolution, sensor_id=sensor_id)
+        date_from, date_to = parse_date_range(params)
+        if date_from:
+            queryset = queryset.filter(bucket__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(bucket__lt=date_to)
+        return queryset.order_by('bucket')
+
+# Lee un id entero de la query string; 400 si no es un número
+def int_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: 'Debe ser un id numérico'})
+
+# Lee una lista de ids separados por comas (?sensors=1,2,3)
+def int_list_param(params, name):
+    value = params.get(name, '')
+    try:
+        return list(dict.fromkeys(int(item) for item in value.split(',') if item.strip()))
+    except ValueError:
+        raise ValidationError({name: 'Debe ser una lista de ids numéricos separados por comas'})
+
+# Lee ?from= y ?to= (ISO 8601, fecha o fecha y hora); 400 si no es válido
+def parse_date_range(params):
+    result = []
+    for name in ('from', 'to'):
+        value = params.get(name)
+        parsed = None
+        if value:
+            parsed = parse_datetime(value)
+            if parsed is None and parse_date(value) is not None:
+                parsed = datetime.combine(parse_date(value), datetime.min.time())
+        if value and parsed is None:
+            raise ValidationError({name: 'Fecha inválida, use ISO 8601'})
+        if parsed is not None and timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        result.append(parsed)
+    return result
+
+
+# Guarda la última lectura de cada sensor a partir de {topic: payload}
+# con una sola carga masiva (COPY en Postgres), asociada al llenado abierto
+def _save_values(sensors, latest):
+    values = []
+    for sensor in sensors:
+        last_value = latest.get(f"Biogestor/{sensor.mqtt_code}")
         if last_value:
             try:
-                float_val = float(last_value.decode('utf-8'))  # type: ignore
-                Data.objects.create(sensor=sensor, value=float_val)
+                if isinstance(last_value, bytes):
+                    last_value = last_value.decode('utf-8')
+                values.append((sensor.id, float(last_value)))  # type: ignore
             except ValueError:
                 pass
+    if values:
+        now = timezone.now()
+        actual_fill_id = get_registry().active_fill_id()
+        rows = [(sensor_id, value, now, actual_fill_id) for sensor_id, value in values]
+        with transaction.atomic():
+            load_rows(rows)
+            rollups.apply_rows(rows)
+    metrics.observe("persist.rows_per_tick", len(values))
+    return len(values)
+
+def save_latest_values(latest):
+    with metrics.timer("persist.tick_ms"):
+        return _save_values(get_registry().sensors().values(), latest)
+
+# Ejecuta una iteración de guardado (testable)
+def save_data_iteration():
+    with metrics.timer("persist.tick_ms"):
+        # Con varias réplicas cada una guarda solo los sensores que le tocan
+        Sensors = [s for s in get_registry().sensors().values() if sharding.owns_topic(f"Biogestor/{s.mqtt_code}")]
+        claimed = sharding.claim_persistence(redis_client, [s.mqtt_code for s in Sensors], save_time)
+        Sensors = [s for s in Sensors if s.mqtt_code in claimed]
+        if not Sensors:
+            return 0
+
+        # Última lectura de todos los sensores en un solo round trip
+        keys = [f"Biogestor/{sensor.mqtt_code}" for sensor in Sensors]
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.lindex(key, -1)
+        latest = dict(zip(keys, pipe.execute()))
+        return _save_values(Sensors, latest)
+
+def _read_stream_entries(count, block_ms):
+    consumer = sensorStore.consumer_name()
+    # 1) lecturas pendientes de consumidores que dejaron de responder
+    _next_id, entries, *_ = redis_client.xautoclaim(
+        sensorStore.STREAM_KEY, sensorStore.STREAM_GROUP, consumer,
+        min_idle_time=stream_claim_idle_ms, start_id="0-0", count=count)
+    if entries:
+        return entries
+    # 2) lecturas propias entregadas pero sin XACK (fallo previo de la DB)
+    # 3) lecturas nuevas
+    for last_id, block in (("0", None), (">", block_ms)):
+        response = redis_client.xreadgroup(
+            sensorStore.STREAM_GROUP, consumer, {sensorStore.STREAM_KEY: last_id},
+            count=count, block=block)
+        entries = response[0][1] if response else []
+        if entries:
+            return entries
+    return []
+
+# Persiste en bloque todas las lecturas del Redis Stream (at-least-once):
+# solo se hace XACK cuando las filas ya están en la DB.
+def save_stream_iteration(count=None, block_ms=None):
+    global _stream_group_ready
+    if not _stream_group_ready:
+        sensorStore.ensure_group(redis_client)
+        _stream_group_ready = True
+
+    count = count or stream_batch
+    block_ms = stream_block_ms if block_ms is None else block_ms
+    try:
+        entries = _read_stream_entries(count, block_ms)
+    except redis.ResponseError as e:
+        if "NOGROUP" not in str(e):
+            raise
+        # Redis perdió el stream o el grupo (reinicio sin persistencia): se recrea
+        print("Stream consumer group missing, recreating it")
+        sensorStore.ensure_group(redis_client)
+        entries = _read_stream_entries(count, block_ms)
+    if not entries:
+        return 0
+
+    samples = []
+    for entry_id, fields in entries:
+        if not fields:  # entrada recortada por MAXLEN antes de procesarse
+            continue
+        try:
+            topic = fields[b"topic"].decode()
+            value = float(fields[b"value"].decode())
+            date = datetime.fromtimestamp(float(fields[b"ts"]), tz=dt_timezone.utc)
+        except (KeyError, ValueError):
+            continue
+        samples.append((topic.removeprefix("Biogestor/"), value, date))
+
+    registry = get_registry()
+    sensors = registry.sensors()
+    actual_fill_id = registry.active_fill_id()
+    rows = [(sensors[code].id, value, date, actual_fill_id)
+            for code, value, date in samples if code in sensors]
+    with metrics.timer("persist.stream_batch_ms"), transaction.atomic():
+        load_rows(rows)
+        rollups.apply_rows(rows)
+    redis_client.xack(sensorStore.STREAM_KEY, sensorStore.STREAM_GROUP,
+                      *[entry_id for entry_id, _fields in entries])
+    return len(rows)
 
-# Guarda una lectura cada n segundos en la DB (hilo)
+# Guarda una lectura cada n segundos en la DB (hilo).
+# En modo stream guarda todas las lecturas según van llegando.
+# Un error (Redis o DB) no detiene el hilo: se espera save_time y se reintenta;
+# en modo stream las lecturas sin XACK se vuelven a leer.
 def save_data_process():
     while True:
-        save_data_iteration()
-        time.sleep(save_time)
+        stream = sensorStore.stream_mode()
+        try:
+            if stream:
+                save_stream_iteration()
+            else:
+                save_data_iteration()
+        except Exception as e:
+            print(f"Error saving sensor data: {e}")
+            metrics.incr("persist.errors")
+            time.sleep(save_time)
+            continue
+        if not stream:
+            time.sleep(save_time)
 
 # Inicio explícito del hilo (no auto en import para facilitar tests)
 def start_save_data_thread():
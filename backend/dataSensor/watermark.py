@@ -0,0 +1,65 @@
+"""Marca de agua de las lecturas, para cachear resultados calculados sobre ``Data``.
+
+* ``dataSensor:data-latest``: fecha (epoch) de la lectura más reciente guardada.
+* ``dataSensor:data-version``: se incrementa cuando se escriben lecturas que
+  pueden caer en cualquier punto del pasado: importaciones, cambios por la API
+  o lecturas que llegan con más de ``MARGIN`` segundos de retraso.
+
+Un rango que termina antes de ``latest - MARGIN`` solo cambia con la versión,
+así que su resultado sigue en caché aunque el persistidor guarde lecturas
+nuevas cada pocos segundos; si el rango llega hasta el presente, la marca
+incluye ``latest`` y cambia con cada guardado.
+"""
+import redis
+from django.db import transaction
+
+redis_client = redis.Redis(host='redis', port=6379, db=0)
+VERSION_KEY = "dataSensor:data-version"
+LATEST_KEY = "dataSensor:data-latest"
+# Retraso máximo de una lectura "en vivo" (pendientes del stream, réplicas)
+MARGIN = 120.0
+
+# ARGV: fecha mínima y máxima de las filas, margen
+NOTE_ROWS_LUA = """
+local latest = tonumber(redis.call('GET', KEYS[2]) or '0')
+if tonumber(ARGV[1]) < latest - tonumber(ARGV[3]) then
+    redis.call('INCR', KEYS[1])
+end
+if tonumber(ARGV[2]) > latest then
+    redis.call('SET', KEYS[2], ARGV[2])
+end
+return 1
+"""
+
+
+def _note(first, last):
+    try:
+        redis_client.register_script(NOTE_ROWS_LUA)(keys=[VERSION_KEY, LATEST_KEY], args=[first, last, MARGIN])
+    except Exception as e:
+        print(f"Error updating data watermark: {e}")
+
+
+def note_rows(rows):
+    """Registra filas ``(sensor_id, value, date, fill_id)`` cuando se confirme la transacción."""
+    if not rows:
+        return
+    stamps = [date.timestamp() for _sensor_id, _value, date, _fill_id in rows]
+    first, last = min(stamps), max(stamps)
+    transaction.on_commit(lambda: _note(first, last))
+
+
+def bump():
+    """Invalida todos los resultados en caché (cambios fuera del flujo de ingesta)."""
+    try:
+        redis_client.incr(VERSION_KEY)
+    except Exception as e:
+        print(f"Error bumping data version: {e}")
+
+
+def for_range(end):
+    """Marca de los datos de un rango que termina en ``end``, para la clave de caché."""
+    version, latest = redis_client.mget(VERSION_KEY, LATEST_KEY)
+    version, latest = int(version or 0), float(latest or 0)
+    if end.timestamp() <= latest - MARGIN:
+        return f"{version}"
+    return f"{version}:{latest}"
@@ -1,7 +1,15 @@
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
+from django.conf import settings
 import json
+import msgpack
+import re
 import redis
+import threading
+import time
+import zlib
+
+from . import metrics, sensorStore
 
 channel_layer = get_channel_layer()
 redis_client = redis.Redis(host='redis', port=6379, db=0)
@@ -9,23 +17,187 @@ redis_client = redis.Redis(host='redis', port=6379, db=0)
 
 def send_sensors_data():
     """Send sensor data from Redis to WebSocket clients."""
-    data = {}
-    # Solo obtener claves que son topics MQTT (Biogestor/*)
-    for key in redis_client.keys("Biogestor/*"):
+    # El snapshot que mantiene la ingesta, ya en JSON, en un solo GET
+    try:
+        blob = sensorStore.read_snapshot(redis_client)
+        data = json.loads(blob)
+    except Exception as e:
+        print(f"Error reading Redis data: {e}")
+        return
+
+    if data:
+        _group_send(ALL_GROUPS[1], blob, packed=pack(float_history(data)))
+
+
+# Clientes sin suscripción: todos los topics en un frame por tick
+ALL_GROUPS = {1: "sensors_data", 2: "sensors_delta"}
+# Avisos de topics nuevos, para los clientes suscritos con patrones
+TOPICS_GROUP = "sensors_topics"
+_GROUP_UNSAFE = re.compile(r"[^0-9A-Za-z._-]")
+_announced = set()
+# Subprotocolo (o ?format=msgpack) de los clientes que reciben frames binarios
+BINARY_SUBPROTOCOL = "biogestor.msgpack"
+
+
+def topic_group(protocol, topic):
+    """Grupo de los clientes suscritos a ``topic`` con el protocolo ``protocol``.
+
+    Los nombres de grupo solo admiten ``[0-9A-Za-z._-]`` y menos de 100
+    caracteres; si el código hay que retocarlo se añade su crc32 para que dos
+    topics distintos no compartan grupo.
+    """
+    code = topic.removeprefix("Biogestor/")
+    slug = _GROUP_UNSAFE.sub("_", code)[:60]
+    if slug != code:
+        slug += f"-{zlib.crc32(code.encode()):08x}"
+    return f"sensors.v{protocol}.{slug}"
+
+
+def pack(frame):
+    """Frame en MessagePack (los floats van como float64)."""
+    return msgpack.packb(frame)
+
+
+def float_history(data):
+    """{topic: ["35.5", ...]} -> {topic: [35.5, ...]}; ``None`` si un valor no es numérico."""
+    history = {}
+    for topic, values in data.items():
+        floats = []
+        for value in values:
+            try:
+                floats.append(float(value))
+            except (TypeError, ValueError):
+                floats.append(None)
+        history[topic] = floats
+    return history
+
+
+def _group_send(group, text, event_type="send_data", packed=None):
+    # El frame binario viaja en el mismo evento: se codifica una vez por
+    # difusión y cada consumidor envía la versión que negoció su cliente.
+    event = {"type": event_type, "text": text}
+    if packed is not None:
+        event["bytes"] = packed
+    async_to_sync(channel_layer.group_send)(group, event)
+
+
+def send_topics_data(topics):
+    """Send the history of the given topics: one frame with all of them for
+    unsubscribed clients and one frame per topic for its subscribers."""
+    topics = sorted(topics)
+    if not topics:
+        return
+    snapshot = json.loads(sensorStore.read_snapshot(redis_client))
+    data = {topic: snapshot[topic] for topic in topics if snapshot.get(topic)}
+
+    if data:
+        floats = float_history(data)
+        _group_send(ALL_GROUPS[1], json.dumps(data), packed=pack(floats))
+        for topic, values in data.items():
+            _group_send(topic_group(1, topic), json.dumps({topic: values}), packed=pack({topic: floats[topic]}))
+
+
+def send_delta_frame(samples):
+    """Send the new (topic, value, timestamp) tuples to protocol v2 clients.
+
+    Every frame carries its ``source`` (this process) and that source's
+    sequence number, so clients can detect gaps per source and ask for a
+    resync snapshot. Per-topic frames are numbered per (source, topic).
+    """
+    rows = {}
+    for topic, payload, ts in samples:
         try:
-            # Verificar que la clave es de tipo lista antes de usar lrange
-            if redis_client.type(key) == b'list':
-                values = redis_client.lrange(key, 0, -1)
-                data[key.decode()] = [v.decode() for v in values]
-        except Exception as e:
-            print(f"Error reading key {key}: {e}")
+            row = [topic, float(payload), round(ts, 3)]
+        except (TypeError, ValueError):
             continue
-    
-    if data:
-        async_to_sync(channel_layer.group_send)(
-            "sensors_data",
-            {
-                "type": "send_data",
-                "text": json.dumps(data)
-            }
-        )
+        rows.setdefault(topic, []).append(row)
+    if not rows:
+        return
+    source = sensorStore.consumer_name()
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hincrby(sensorStore.DELTA_SEQ_KEY, source, 1)
+    for topic in rows:
+        pipe.hincrby(sensorStore.DELTA_SEQ_KEY, sensorStore.topic_seq_field(source, topic), 1)
+    seq, *topic_seqs = pipe.execute()
+    every = [row for topic_rows in rows.values() for row in topic_rows]
+    frame = {"type": "delta", "source": source, "seq": seq, "samples": every}
+    _group_send(ALL_GROUPS[2], json.dumps(frame), packed=pack(frame))
+    for (topic, topic_rows), topic_seq in zip(rows.items(), topic_seqs):
+        frame = {"type": "delta", "source": source, "topic": topic, "seq": topic_seq, "samples": topic_rows}
+        _group_send(topic_group(2, topic), json.dumps(frame), packed=pack(frame))
+
+
+def announce_topics(topics):
+    """Avisa (una vez por proceso) de los topics nuevos a los clientes con patrones."""
+    for topic in sorted(set(topics) - _announced):
+        _group_send(TOPICS_GROUP, topic, event_type="topic_added")
+        _announced.add(topic)
+
+
+def send_updates(topics, samples):
+    """Send one frame per protocol: changed histories (v1) and deltas (v2)."""
+    announce_topics(topics)
+    send_topics_data(topics)
+    send_delta_frame(samples)
+
+
+class SensorBroadcaster:
+    """Coalesce ingest batches and broadcast at most ``rate`` frames per second.
+
+    Ingest only marks topics as dirty; a background thread sends one frame
+    per tick with the dirty topics, so WebSocket traffic does not grow with
+    the MQTT message rate.
+    """
+
+    def __init__(self, rate=None, send=send_updates):
+        self.rate = rate or getattr(settings, "WS_BROADCAST_HZ", 4)
+        self.send = send
+        self._dirty = set()
+        self._samples = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def mark_dirty(self, batch):
+        with self._lock:
+            self._dirty.update(topic for topic, _payload, _ts in batch)
+            self._samples.extend(batch)
+
+    def flush(self):
+        with self._lock:
+            topics, self._dirty = self._dirty, set()
+            samples, self._samples = self._samples, []
+        if not topics:
+            return 0
+        try:
+            with metrics.timer("broadcast.flush_ms"):
+                self.send(topics, samples)
+        except Exception as e:
+            print(f"Error broadcasting sensor data: {e}")
+            return 0
+        metrics.incr("broadcast.frames")
+        metrics.observe("broadcast.topics_per_frame", len(topics))
+        return len(topics)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        self._thread = threading.Thread(target=self._run, daemon=True, name="dataSensor-broadcast")
+        self._thread.start()
+        return self._thread
+
+    def _run(self):
+        interval = 1.0 / self.rate
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+
+_broadcaster = None
+
+
+def get_broadcaster():
+    """Broadcaster compartido del proceso (se crea en el primer uso)."""
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = SensorBroadcaster()
+    return _broadcaster
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 class ProductosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventario'
+
+    def ready(self):
+        from BGProject.caching import watch
+        from .models import place
+        watch(place)
@@ -1,6 +1,7 @@
 from rest_framework import generics, status, viewsets
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from BGProject.caching import CachedReadMixin
 from .models import items, place
 from .serializers import itemsSerializer, placeSerializer
 from rest_framework.decorators import action
@@ -18,7 +19,7 @@ class itemsViewSet(viewsets.ModelViewSet):
     queryset = items.objects.all()
     serializer_class = itemsSerializer
 
-class placesViewSet(viewsets.ModelViewSet):
+class placesViewSet(CachedReadMixin, viewsets.ModelViewSet):
     queryset = place.objects.all()
     serializer_class = placeSerializer
 
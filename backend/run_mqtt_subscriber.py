@@ -15,11 +15,21 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'BGProject.settings')
 django.setup()
 
 # Now import and run the MQTT subscriber
-from dataSensor.MqttSub import mqttc, start_save_data_thread
+from dataSensor.MqttSub import mqttc, ingest_buffer, redis_client, start_save_data_thread
+from dataSensor.sensorStore import rebuild_topic_registry
+from dataSensor.websocketService import get_broadcaster
 
 if __name__ == "__main__":
+    print(f"Registered {rebuild_topic_registry(redis_client)} existing sensor topics")
+
     print("Starting data save thread...")
     start_save_data_thread()
+
+    print("Starting ingest buffer flusher...")
+    ingest_buffer.start()
+
+    print("Starting WebSocket broadcaster...")
+    get_broadcaster().start()
     
     print("Connecting to MQTT broker...")
     mqttc.connect("mosquitto", 1883, 60)
@@ -103,7 +103,7 @@ export default function LlenadosPage() {
     const grouped: Record<string, { name: string; values: number[]; dates: string[] }> = {};
     
     fillSensorData.forEach((data: SensorData) => {
-      const sensorName = data.sensor?.name || `Sensor ${data.sensor?.id}`;
+      const sensorName = data.sensor?.name || `Sensor ${data.sensor_id}`;
       if (!grouped[sensorName]) {
         grouped[sensorName] = { name: sensorName, values: [], dates: [] };
       }
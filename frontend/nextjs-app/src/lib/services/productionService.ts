@@ -1,5 +1,5 @@
 import { useQuery } from "@tanstack/react-query";
-import apiClient from "@/lib/apiClient";
+import { fetchAllSensorData } from "@/lib/services/sensorService";
 import type { RealProductionData, RealProductionSummary, SensorData } from "@/types";
 
 const PRODUCTION_KEY = "realProduction";
@@ -36,10 +36,8 @@ function mapSensorDataToRealProduction(
  * Backend actual: GET /api/sensor-data/?fill={fillId}
  */
 async function fetchRealProductionByFill(fillId: number): Promise<RealProductionData[]> {
-  const response = await apiClient.get<SensorData[]>(
-    `/api/sensor-data/?fill=${fillId}`
-  );
-  return mapSensorDataToRealProduction(fillId, response.data);
+  const sensorData = await fetchAllSensorData(`/api/sensor-data/?fill=${fillId}`);
+  return mapSensorDataToRealProduction(fillId, sensorData);
 }
 
 /**
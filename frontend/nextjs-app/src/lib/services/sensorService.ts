@@ -1,6 +1,7 @@
 import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import apiClient from "@/lib/apiClient";
 import type {
+  CursorPaginatedResponse,
   Sensor,
   SensorData,
   SensorCreateData,
@@ -67,17 +68,28 @@ async function deleteSensor(id: number): Promise<void> {
   await apiClient.delete(`/api/sensors/${id}/`);
 }
 
+// /api/sensor-data/ pagina por cursor: se siguen los enlaces `next`
+export async function fetchAllSensorData(url: string): Promise<SensorData[]> {
+  const rows: SensorData[] = [];
+  let next: string | null = url;
+  while (next) {
+    const { data }: { data: CursorPaginatedResponse<SensorData> } =
+      await apiClient.get(next);
+    rows.push(...data.results);
+    next = data.next;
+  }
+  return rows;
+}
+
 async function fetchSensorData(sensorId?: number): Promise<SensorData[]> {
   const url = sensorId
     ? `/api/sensor-data/?sensor=${sensorId}`
     : "/api/sensor-data/";
-  const response = await apiClient.get<SensorData[]>(url);
-  return response.data;
+  return fetchAllSensorData(url);
 }
 
 async function fetchSensorDataByFill(fillId: number): Promise<SensorData[]> {
-  const response = await apiClient.get<SensorData[]>(`/api/sensor-data/?fill=${fillId}`);
-  return response.data;
+  return fetchAllSensorData(`/api/sensor-data/?fill=${fillId}&expand=sensor`);
 }
 
 async function fetchMeasuredVariables(): Promise<MeasuredVariable[]> {
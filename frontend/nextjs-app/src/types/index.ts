@@ -101,9 +101,12 @@ export interface Sensor {
 
 export interface SensorData {
   id: number;
-  sensor: Sensor;
+  sensor_id: number;
   value: number;
   date: string;
+  fill_id: number | null;
+  // Solo con ?expand=sensor / ?expand=fill
+  sensor?: Sensor;
   fill?: Fill | null;
 }
 
@@ -305,6 +308,12 @@ export interface PaginatedResponse<T> {
   results: T[];
 }
 
+export interface CursorPaginatedResponse<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
 export interface ApiError {
   detail?: string;
   message?: string;